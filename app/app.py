@@ -8,6 +8,8 @@ sys.path.append(str(Path(__file__).parent))
 
 # Import our modules
 from utils.detection_utils import DetectionManager
+from utils.model_registry import model_registry
+from utils.result_cache import detection_cache
 from utils.ui_utils import apply_custom_css
 
 # Page configuration
@@ -21,7 +23,7 @@ st.set_page_config(
 # Apply custom CSS
 apply_custom_css()
 
-# Initialize session state
+# Initialize session state (the model weights themselves are shared process-wide)
 if 'detection_manager' not in st.session_state:
     st.session_state.detection_manager = DetectionManager()
 
@@ -31,6 +33,26 @@ if 'detection_results' not in st.session_state:
 if 'video_detection_active' not in st.session_state:
     st.session_state.video_detection_active = False
 
+# Shared model cache status
+with st.sidebar.expander("⚙️ Model Cache"):
+    registry_stats = model_registry.stats()
+    st.metric("Inference Backend", f"{st.session_state.detection_manager.backend} "
+              f"({st.session_state.detection_manager.precision})")
+    st.metric("Models Loaded", registry_stats['models_loaded'])
+    st.metric("Weights Memory", f"{registry_stats['memory_bytes'] / (1024 * 1024):.1f} MB")
+    st.metric("Load Count", registry_stats['load_count'])
+
+with st.sidebar.expander("🗃️ Result Cache"):
+    cache_stats = detection_cache.stats()
+    st.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}",
+              help=f"{cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    st.metric("Cached Results", cache_stats['entries'])
+    st.metric("Disk Usage", f"{cache_stats['disk_bytes'] / (1024 * 1024):.1f} / "
+              f"{cache_stats['max_bytes'] / (1024 * 1024):.0f} MB")
+    if st.button("Clear Result Cache"):
+        detection_cache.clear()
+        st.rerun()
+
 # Main home page content
 st.markdown("""
 <div class="main-header">
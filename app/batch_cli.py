@@ -0,0 +1,384 @@
+"""HeritageLens AI headless batch analysis.
+
+Runs heritage detection over a folder of images and videos without
+Streamlit, for nightly jobs over survey archives. Results stream to JSONL
+(one row per detection) or to a Parquet dataset directory. Completed
+sources are tracked in a sidecar progress file, so an interrupted run
+resumes where it stopped.
+
+Usage:
+    python batch_cli.py SURVEY_DIR --output results.jsonl --workers 4 --pdf report.pdf
+    python batch_cli.py SURVEY_DIR --output results.parquet --video-stride 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+
+# Add the current directory to Python path
+sys.path.append(str(Path(__file__).parent))
+
+from utils.detection_stats import StatisticsAggregator
+from utils.detection_utils import DetectionManager
+from utils.inference_backends import BACKENDS
+from utils.quantization import PRECISIONS
+from utils.tiled_inference import TiledDetector, open_tile_source
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv'}
+
+# Per-process detection manager, created once by the pool initializer
+_worker_manager: Optional[DetectionManager] = None
+
+
+def find_sources(input_dir: Path, recursive: bool = True) -> List[Path]:
+    """List the images and videos under input_dir in a stable order"""
+    pattern = '**/*' if recursive else '*'
+    return sorted(
+        p for p in input_dir.glob(pattern)
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+    )
+
+
+def detection_rows(source: str, media_type: str, detections, frame_index: int = 0,
+                   timestamp: float = 0.0) -> List[Dict]:
+    """Flatten detections into output rows"""
+    rows = []
+    for detection in detections:
+        x1, y1, x2, y2 = detection['bbox']
+        rows.append({
+            'source': source,
+            'media_type': media_type,
+            'frame_index': frame_index,
+            'timestamp': timestamp,
+            'class_id': detection['class_id'],
+            'class_name': detection['class_name'],
+            'confidence': detection['confidence'],
+            'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2
+        })
+    return rows
+
+
+def init_worker(torch_threads: int, backend: Optional[str] = None, precision: Optional[str] = None,
+                calibration_dir: Optional[str] = None):
+    """Pool initializer: load the model once per worker process"""
+    global _worker_manager
+    if torch_threads > 0:
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_manager = DetectionManager(backend=backend, precision=precision, calibration_dir=calibration_dir)
+
+
+def analyze_source(path: str, relative: str, options: Dict) -> Dict:
+    """Analyze one image or video; returns rows plus throughput counters"""
+    manager = _worker_manager or DetectionManager()
+    start = time.perf_counter()
+
+    if Path(path).suffix.lower() in IMAGE_EXTENSIONS:
+        rows = detection_rows(relative, 'image', analyze_image(manager, path, options))
+        frames = 1
+    else:
+        rows, frames = analyze_video(manager, path, relative, options)
+
+    return {'source': relative, 'rows': rows, 'frames': frames, 'seconds': time.perf_counter() - start}
+
+
+def analyze_image(manager: DetectionManager, path: str, options: Dict):
+    """Detect objects in one image, tiling it when it is larger than the tile size"""
+    if not options.get('tile_size'):
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Cannot decode image {path}")
+        return manager.detect_objects(image, use_cache=True)
+
+    tiled = TiledDetector(manager, tile_size=options['tile_size'], overlap=options['tile_overlap'])
+    # Rasters are read window by window, so huge orthophotos never load whole
+    source = open_tile_source(path)
+    try:
+        if tiled.needs_tiling(source.width, source.height):
+            return tiled.detect(source)
+        return manager.detect_objects(source.read(0, 0, source.width, source.height), use_cache=True)
+    finally:
+        source.close()
+
+
+def analyze_video(manager: DetectionManager, path: str, relative: str, options: Dict):
+    """Run the video pipeline without annotation and collect detection rows"""
+    from utils.video_pipeline import VideoPipeline
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    rows = []
+    frames = 0
+    pipeline = VideoPipeline(cap, manager, frame_stride=options['video_stride'], annotate=False)
+    try:
+        for item in pipeline.run():
+            frames += 1
+            rows.extend(detection_rows(relative, 'video', item.detections,
+                                       frame_index=item.frame_index, timestamp=item.frame_index / fps))
+    finally:
+        pipeline.stop()
+        cap.release()
+    return rows, frames
+
+
+class ResultSink:
+    """Streams rows to JSONL or to a Parquet dataset and records completed sources"""
+
+    def __init__(self, output: Path, parquet_rows_per_part: int = 50000):
+        self.output = output
+        self.parquet = output.suffix.lower() == '.parquet'
+        self.progress_path = output.with_name(output.name + '.done')
+        self.parquet_rows_per_part = parquet_rows_per_part
+        self.completed = self._load_completed()
+        self._pending_rows: List[Dict] = []
+        self._pending_sources: List[str] = []
+
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+            self.output.mkdir(parents=True, exist_ok=True)
+            self._drop_incomplete_parquet()
+        else:
+            self._drop_incomplete_jsonl()
+            self._jsonl = open(self.output, 'a', encoding='utf-8')
+        self._progress = open(self.progress_path, 'a', encoding='utf-8')
+
+    def _load_completed(self) -> set:
+        if not self.progress_path.exists():
+            return set()
+        with open(self.progress_path, encoding='utf-8') as f:
+            return {line.rstrip('\n') for line in f if line.strip()}
+
+    def _drop_incomplete_jsonl(self):
+        """Remove rows of sources that were interrupted before being marked complete"""
+        if not self.output.exists():
+            return
+        tmp = self.output.with_name(self.output.name + '.tmp')
+        with open(self.output, encoding='utf-8') as src, open(tmp, 'w', encoding='utf-8') as dst:
+            for line in src:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # truncated last line
+                if row.get('source') in self.completed:
+                    dst.write(line if line.endswith('\n') else line + '\n')
+        os.replace(tmp, self.output)
+
+    def _drop_incomplete_parquet(self):
+        """Remove half-written parts and rows of sources that were never marked complete.
+
+        A part is renamed into place before its sources are marked, so only
+        the newest part can hold rows of unmarked sources; it is rewritten
+        without them.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        for tmp in self.output.glob('*.parquet.tmp'):
+            tmp.unlink()
+        parts = sorted(self.output.glob('*.parquet'), key=lambda p: p.stat().st_mtime)
+        if not parts:
+            return
+        newest = parts[-1]
+        table = pq.read_table(newest)
+        keep = pc.is_in(table['source'], value_set=pa.array(sorted(self.completed), type=pa.string()))
+        if pc.all(keep).as_py():
+            return
+        table = table.filter(keep)
+        if table.num_rows:
+            self._write_part(table, newest)
+        else:
+            newest.unlink()
+
+    @staticmethod
+    def _write_part(table, part: Path):
+        """Write a Parquet part under a temporary name and rename it into place"""
+        import pyarrow.parquet as pq
+
+        tmp = part.with_name(part.name + '.tmp')
+        pq.write_table(table, tmp)
+        os.replace(tmp, part)
+
+    def write(self, source: str, rows: List[Dict]):
+        """Persist one source's rows, then mark it complete"""
+        if self.parquet:
+            self._pending_rows.extend(rows)
+            self._pending_sources.append(source)
+            if len(self._pending_rows) >= self.parquet_rows_per_part:
+                self._flush_parquet()
+            return
+
+        self._jsonl.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self._jsonl.flush()
+        self._mark_complete([source])
+
+    def _flush_parquet(self):
+        if not self._pending_sources:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._pending_rows:
+            part = self.output / f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{len(self.completed)}.parquet"
+            self._write_part(pa.Table.from_pylist(self._pending_rows), part)
+        self._mark_complete(self._pending_sources)
+        self._pending_rows = []
+        self._pending_sources = []
+
+    def _mark_complete(self, sources: Iterable[str]):
+        for source in sources:
+            self._progress.write(source + '\n')
+            self.completed.add(source)
+        self._progress.flush()
+        os.fsync(self._progress.fileno())
+
+    def close(self):
+        if self.parquet:
+            self._flush_parquet()
+        else:
+            self._jsonl.close()
+        self._progress.close()
+
+    def aggregate(self, chunk_rows: int = 65536) -> StatisticsAggregator:
+        """Statistics of every stored row (used for the PDF report), read back in chunks"""
+        aggregator = StatisticsAggregator()
+        if self.parquet:
+            import pyarrow.parquet as pq
+            for part in sorted(self.output.glob('*.parquet')):
+                for batch in pq.ParquetFile(part).iter_batches(chunk_rows, columns=['class_name', 'confidence']):
+                    aggregator.update(batch.to_pylist())
+            return aggregator
+        with open(self.output, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    aggregator.add(row['class_name'], row['confidence'])
+        return aggregator
+
+
+def write_pdf_report(aggregator: StatisticsAggregator, pdf_path: Path, sources: int):
+    """Build the standard PDF report from the statistics of the stored rows"""
+    from utils.report_utils import create_summary_text, generate_pdf_report
+
+    stats = aggregator.to_stats()
+    summary = f"Batch analysis of {sources} source file(s). " + create_summary_text(stats)
+    pdf_path.write_bytes(generate_pdf_report(stats, summary))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_dir', type=Path, help="Directory of images and/or videos")
+    parser.add_argument('--output', type=Path, default=Path('heritage_results.jsonl'),
+                        help="JSONL file, or a directory ending in .parquet for a Parquet dataset")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes (0 runs in this process)")
+    parser.add_argument('--video-stride', type=int, default=5, help="Analyze every n-th video frame")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=None,
+                        help="Inference backend (default: $HERITAGELENS_BACKEND or torch)")
+    parser.add_argument('--precision', choices=list(PRECISIONS), default=None,
+                        help="Model precision (default: $HERITAGELENS_PRECISION or fp32)")
+    parser.add_argument('--calibration-dir', type=Path, default=None,
+                        help="Images used to calibrate int8-static (default: $HERITAGELENS_CALIBRATION_DIR)")
+    parser.add_argument('--tile-size', type=int, default=0,
+                        help="Analyze images larger than this many pixels in overlapping tiles (0 disables tiling)")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Fractional overlap between tiles")
+    parser.add_argument('--pdf', type=Path, help="Also write a PDF report of all results")
+    parser.add_argument('--no-recursive', action='store_true', help="Do not descend into subdirectories")
+    parser.add_argument('--restart', action='store_true', help="Ignore previous progress and start over")
+    args = parser.parse_args(argv)
+
+    if not args.input_dir.is_dir():
+        parser.error(f"{args.input_dir} is not a directory")
+
+    if args.restart:
+        for path in (args.output, args.output.with_name(args.output.name + '.done')):
+            if path.is_dir():
+                for part in path.glob('*.parquet*'):
+                    part.unlink()
+            elif path.exists():
+                path.unlink()
+
+    sink = ResultSink(args.output)
+    sources = find_sources(args.input_dir, recursive=not args.no_recursive)
+    pending = [p for p in sources if str(p.relative_to(args.input_dir)) not in sink.completed]
+    print(f"Found {len(sources)} source(s); {len(sources) - len(pending)} already done, {len(pending)} to analyze")
+
+    options = {
+        'video_stride': max(1, args.video_stride),
+        'tile_size': max(0, args.tile_size),
+        'tile_overlap': args.tile_overlap
+    }
+    model_options = (args.backend, args.precision, str(args.calibration_dir) if args.calibration_dir else None)
+    start = time.perf_counter()
+    done = frames = detections = failed = 0
+
+    def record(result):
+        nonlocal done, frames, detections
+        sink.write(result['source'], result['rows'])
+        done += 1
+        frames += result['frames']
+        detections += len(result['rows'])
+        elapsed = time.perf_counter() - start
+        print(f"[{done}/{len(pending)}] {result['source']}: {len(result['rows'])} detections "
+              f"in {result['seconds']:.1f}s | {done / elapsed:.2f} files/s, {frames / elapsed:.1f} frames/s",
+              flush=True)
+
+    try:
+        if args.workers <= 0:
+            init_worker(0, *model_options)
+            for path in pending:
+                try:
+                    record(analyze_source(str(path), str(path.relative_to(args.input_dir)), options))
+                except Exception as e:
+                    failed += 1
+                    print(f"FAILED {path}: {e}", file=sys.stderr)
+        else:
+            # Split CPU threads between workers so they don't oversubscribe the cores
+            torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+            pool = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                       initargs=(torch_threads, *model_options))
+            try:
+                futures = {
+                    pool.submit(analyze_source, str(p), str(p.relative_to(args.input_dir)), options): p
+                    for p in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        record(future.result())
+                    except Exception as e:
+                        failed += 1
+                        print(f"FAILED {futures[future]}: {e}", file=sys.stderr)
+            finally:
+                # On interruption, drop queued work instead of waiting for it
+                pool.shutdown(wait=False, cancel_futures=True)
+    except KeyboardInterrupt:
+        print("\nInterrupted; completed sources are saved and will be skipped on the next run", file=sys.stderr)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {done} source(s), {frames} frame(s), {detections} detection(s) in {elapsed:.1f}s "
+          f"({frames / elapsed if elapsed > 0 else 0:.1f} frames/s); {failed} failed")
+
+    if args.pdf:
+        write_pdf_report(sink.aggregate(), args.pdf, len(sink.completed))
+        print(f"PDF report written to {args.pdf}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
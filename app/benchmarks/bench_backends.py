@@ -0,0 +1,69 @@
+"""Latency benchmark: PyTorch vs ONNX Runtime vs OpenVINO on CPU.
+
+Every backend analyzes the same images one at a time (as the video page
+does) and in batches. The first run of a backend exports and caches the
+model under .model_exports/; export time is reported separately.
+
+Usage:
+    python benchmarks/bench_backends.py --images path/to/folder --backends torch onnx openvino
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_batch_inference import load_images
+from utils.detection_utils import DetectionManager
+from utils.inference_backends import artifact_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of images to benchmark on")
+    parser.add_argument('--count', type=int, default=32, help="Number of images to process")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--batch-size', type=int, default=8)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    print(f"Benchmarking {len(images)} images on CPU")
+    print(f"{'backend':<10}{'setup s':>9}{'size MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'images/s':>10}{'batched/s':>11}")
+
+    for backend in args.backends:
+        start = time.perf_counter()
+        manager = DetectionManager(backend=backend)
+        setup = time.perf_counter() - start
+        if manager.model is None or manager.backend != backend:
+            print(f"{backend:<10} unavailable")
+            continue
+        manager.cache = None
+
+        # Warm up so lazy predictor setup is not measured
+        manager.detect_objects(images[0])
+        latencies = []
+        for image in images:
+            start = time.perf_counter()
+            manager.detect_objects(image)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manager.detect_batch(images, batch_size=args.batch_size)
+        batched = time.perf_counter() - start
+
+        latencies_ms = np.array(latencies) * 1000
+        print(f"{backend:<10}{setup:>9.2f}{artifact_size(manager.inference_path) / 1e6:>9.1f}"
+              f"{np.percentile(latencies_ms, 50):>9.1f}{np.percentile(latencies_ms, 95):>9.1f}"
+              f"{len(images) / sum(latencies):>10.2f}{len(images) / batched:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Throughput benchmark: per-image detect_objects vs batched detect_batch on CPU.
+
+Usage:
+    python benchmarks/bench_batch_inference.py --images path/to/folder --batch-sizes 4 8 16
+
+Without --images, the bundled sample image (1.png) is resized into a set of
+synthetic survey-like inputs of mixed resolution.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import cv2
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.detection_utils import DetectionManager
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
+
+
+def load_images(images_dir, count):
+    """Load benchmark images from a folder or synthesize them from the sample image"""
+    if images_dir:
+        paths = sorted(p for p in Path(images_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        images = [cv2.imread(str(p)) for p in paths[:count]]
+        return [img for img in images if img is not None]
+    
+    sample = cv2.imread(str(Path(__file__).parent.parent / "1.png"))
+    if sample is None:
+        raise SystemExit("Sample image 1.png not found; pass --images")
+    sizes = [(640, 480), (1280, 720), (800, 800), (1024, 768)]
+    return [cv2.resize(sample, sizes[i % len(sizes)]) for i in range(count)]
+
+
+def time_run(fn, repeats):
+    """Return the best wall-clock time over a number of repeats"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of images to benchmark on")
+    parser.add_argument('--count', type=int, default=64, help="Number of images to process")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    
+    manager = DetectionManager()
+    if manager.model is None:
+        raise SystemExit("Model failed to load; make sure best.pt is present in the app folder")
+    
+    images = load_images(args.images, args.count)
+    print(f"Benchmarking {len(images)} images on CPU")
+    
+    # Warm up the predictor so setup cost is not attributed to the first mode
+    manager.detect_objects(images[0])
+    
+    per_image = time_run(lambda: [manager.detect_objects(img) for img in images], args.repeats)
+    print(f"{'mode':<16}{'seconds':>10}{'images/s':>12}{'speedup':>10}")
+    print(f"{'per-image':<16}{per_image:>10.2f}{len(images) / per_image:>12.2f}{1.0:>10.2f}")
+    
+    for batch_size in args.batch_sizes:
+        batched = time_run(lambda: manager.detect_batch(images, batch_size=batch_size), args.repeats)
+        print(f"{f'batch={batch_size}':<16}{batched:>10.2f}{len(images) / batched:>12.2f}{per_image / batched:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Allocation benchmark: bytes copied per image on the display path, before and after Frame.
+
+Replays the pixel handling of one image upload (decode, model input,
+annotation, display, crops) and one video frame (annotation, display) the
+old way, with cv2.cvtColor at each step and a copy per annotation, and the
+new way through utils.frame.Frame. NumPy and OpenCV buffers are counted
+with tracemalloc; model inference itself is not run.
+
+Usage:
+    python benchmarks/bench_frame_copies.py --size 4000x3000 --boxes 20
+"""
+import argparse
+import io
+import sys
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.detection_results import Detections
+from utils.detection_utils import DetectionManager
+from utils.frame import Frame
+
+
+def allocated(fn):
+    """Run fn and return (result, bytes allocated at its peak)"""
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    return result, tracemalloc.get_traced_memory()[1] - start
+
+
+def legacy_image_path(manager, image, detections):
+    """The original upload path: convert to BGR, annotate a copy, convert back for display"""
+    image_array = np.array(image)
+    image_cv = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    annotated = manager.draw_detections(image_cv, detections)
+    annotated_rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+    crops = [cv2.cvtColor(c, cv2.COLOR_BGR2RGB) for c in manager.crop_detections(image_cv, detections)]
+    return image_array, annotated_rgb, crops
+
+
+def frame_image_path(manager, image, detections):
+    """The Frame path: RGB pixels, BGR view for the model, one annotation copy, views for display"""
+    frame = Frame.from_pil(image)
+    model_input = frame.bgr()
+    annotated = frame.annotated(manager, detections).rgb()
+    crops = manager.crop_detections(frame.rgb(), detections)
+    return model_input, annotated, crops
+
+
+def legacy_video_path(manager, frame, detections):
+    annotated = manager.draw_detections(frame, detections)
+    return annotated, cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+
+
+def frame_video_path(manager, frame, detections):
+    annotated = Frame(frame, 'BGR').annotated(manager, detections, inplace=True)
+    return annotated.bgr(), annotated.rgb()
+
+
+def synthetic_detections(manager, width, height, count):
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, [width * 0.8, height * 0.8], size=(count, 2))
+    wh = rng.uniform(20, [width * 0.2, height * 0.2], size=(count, 2))
+    return Detections(np.hstack([xy, xy + wh]), rng.uniform(0.3, 1.0, count), rng.integers(0, 4, count),
+                      manager.class_names, manager.class_colors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='4000x3000', help="Image size as WIDTHxHEIGHT")
+    parser.add_argument('--boxes', type=int, default=20)
+    args = parser.parse_args()
+    width, height = map(int, args.size.lower().split('x'))
+
+    manager = DetectionManager()
+    detections = synthetic_detections(manager, width, height, args.boxes)
+    sample = cv2.imread(str(Path(__file__).parent.parent / "1.png"))
+    pixels = cv2.resize(sample, (width, height)) if sample is not None else \
+        np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', pixels)
+    image_bytes = encoded.tobytes()
+
+    tracemalloc.start()
+    frame_bytes = width * height * 3
+    print(f"{width}x{height} RGB image = {frame_bytes / 1e6:.1f} MB, {args.boxes} boxes")
+    print(f"{'path':<22}{'MB allocated':>14}{'image copies':>14}")
+
+    for name, path in (('image (legacy)', legacy_image_path), ('image (Frame)', frame_image_path)):
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        _, size = allocated(lambda: path(manager, image, detections))
+        print(f"{name:<22}{size / 1e6:>14.1f}{size / frame_bytes:>14.2f}")
+
+    for name, path in (('video frame (legacy)', legacy_video_path), ('video frame (Frame)', frame_video_path)):
+        frame = pixels.copy()
+        _, size = allocated(lambda: path(manager, frame, detections))
+        print(f"{name:<22}{size / 1e6:>14.1f}{size / frame_bytes:>14.2f}")
+
+    tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Latency benchmark: latest-frame live capture vs processing every buffered frame.
+
+A local video is replayed in real time, looping, as a fake camera (the
+same replay mode the Video Detection page offers for testing). Each mode
+runs detection for a fixed wall-clock time and reports glass-to-result
+latency (capture to annotated result) and how many frames were analyzed:
+
+  - buffered: every captured frame is queued and processed in order, like
+    reading cv2.VideoCapture in a loop; when inference is slower than the
+    camera, latency grows for as long as the stream runs
+  - latest: utils.live_capture.LatestFrameCapture keeps only the newest
+    frame; stale frames are dropped and latency stays bounded
+
+Without --video a synthetic clip is generated. --simulate-ms replaces the
+model with a fixed inference delay, so the capture behaviour can be
+measured without torch installed.
+
+Usage:
+    python benchmarks/bench_live_latency.py --video path/to/clip.mp4 --seconds 20
+    python benchmarks/bench_live_latency.py --simulate-ms 80
+"""
+import argparse
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import cv2
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.detection_results import Detections
+from utils.live_capture import LatencyStats, LatestFrameCapture, LiveDetectionLoop
+
+
+class SimulatedDetector:
+    """Stands in for the model with a fixed inference time and no detections"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def detect_objects(self, frame):
+        time.sleep(self.seconds)
+        return Detections.empty({}, {})
+
+
+def synthetic_clip(fps=30, seconds=4, size=(1280, 720)):
+    """Write a short clip with a moving block and return its path"""
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4', prefix='heritagelens_live_bench_')
+    tmp.close()
+    writer = cv2.VideoWriter(tmp.name, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(fps * seconds):
+        frame = np.full((size[1], size[0], 3), 90, dtype=np.uint8)
+        x = int(i / (fps * seconds) * (size[0] - 200))
+        cv2.rectangle(frame, (x, 200), (x + 200, 500), (40, 120, 200), -1)
+        writer.write(frame)
+    writer.release()
+    return tmp.name
+
+
+def run_buffered(video, detector, seconds):
+    """Process every captured frame in order, as a plain capture loop would"""
+    capture = LatestFrameCapture(video, replay=True).start()
+    frames = queue.Queue()
+    stop = threading.Event()
+
+    def drain():
+        # Pull every frame out of the slot into an unbounded buffer, like a driver queue
+        while not stop.is_set():
+            live = capture.read(0.5)
+            if live is not None:
+                frames.put(live)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    latency = LatencyStats()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            live = frames.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        detector.detect_objects(live.frame)
+        latency.add(time.monotonic() - live.captured_at)
+    stop.set()
+    capture.stop()
+    thread.join()
+    return latency.stats(), capture.stats()
+
+
+def run_latest(video, detector, seconds, annotate):
+    """Process the newest frame only, through the live detection loop"""
+    loop = LiveDetectionLoop(LatestFrameCapture(video, replay=True), detector, annotate=annotate)
+    deadline = time.monotonic() + seconds
+    for _ in loop.run():
+        if time.monotonic() >= deadline:
+            break
+    stats = loop.stats()
+    return stats['latency'], stats['capture']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', help="Video file to replay as a live source")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Wall-clock time per mode")
+    parser.add_argument('--simulate-ms', type=float, help="Fixed inference time instead of the model")
+    args = parser.parse_args()
+
+    video = args.video or synthetic_clip()
+    if args.simulate_ms is not None:
+        detector = SimulatedDetector(args.simulate_ms / 1000)
+        label = f"simulated {args.simulate_ms:.0f} ms inference"
+    else:
+        from utils.detection_utils import DetectionManager
+        detector = DetectionManager()
+        label = "model inference on CPU"
+
+    print(f"Replaying {video} for {args.seconds:.0f}s per mode, {label}")
+    print(f"{'mode':<10}{'analyzed':>9}{'captured':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'last ms':>9}")
+    for mode in ('buffered', 'latest'):
+        if mode == 'buffered':
+            latency, capture = run_buffered(video, detector, args.seconds)
+        else:
+            latency, capture = run_latest(video, detector, args.seconds, annotate=args.simulate_ms is None)
+        print(f"{mode:<10}{latency['count']:>9}{capture['frames_captured']:>9}{latency['p50_ms']:>9.0f}"
+              f"{latency['p95_ms']:>9.0f}{latency['max_ms']:>9.0f}{latency['last_ms']:>9.0f}")
+
+    if not args.video:
+        os.unlink(video)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Scaling benchmark: shared-memory worker pool vs in-process analysis on CPU.
+
+Usage:
+    python benchmarks/bench_parallel_images.py --images path/to/folder --workers 1 2 4 8
+
+Each mode decodes, detects and annotates every image, as the Image Detection
+page does. Pool start-up (spawning workers and loading the model) is timed
+separately, since the app keeps pools warm across reruns.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import cv2
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.detection_utils import DetectionManager
+from utils.parallel_executor import SharedMemoryImagePool
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
+
+
+def load_encoded_images(images_dir, count):
+    """Encoded (name, bytes) pairs from a folder, or synthesized from the sample image"""
+    if images_dir:
+        paths = sorted(p for p in Path(images_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        return [(p.name, p.read_bytes()) for p in paths[:count]]
+
+    sample = cv2.imread(str(Path(__file__).parent.parent / "1.png"))
+    if sample is None:
+        raise SystemExit("Sample image 1.png not found; pass --images")
+    sizes = [(640, 480), (1280, 720), (800, 800), (1024, 768)]
+    images = []
+    for i in range(count):
+        ok, encoded = cv2.imencode('.jpg', cv2.resize(sample, sizes[i % len(sizes)]))
+        images.append((f"synthetic_{i}.jpg", encoded.tobytes()))
+    return images
+
+
+def run_in_process(manager, images):
+    """Baseline: decode, detect and annotate sequentially in this process"""
+    for _, data in images:
+        image_cv = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        detections = manager.detect_objects(image_cv)
+        cv2.cvtColor(manager.draw_detections(image_cv, detections), cv2.COLOR_BGR2RGB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of images to benchmark on")
+    parser.add_argument('--count', type=int, default=64, help="Number of images to process")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    manager = DetectionManager()
+    if manager.model is None:
+        raise SystemExit("Model failed to load; make sure best.pt is present in the app folder")
+
+    images = load_encoded_images(args.images, args.count)
+    print(f"Benchmarking {len(images)} images on {os.cpu_count()} CPU(s)")
+
+    run_in_process(manager, images[:1])
+    start = time.perf_counter()
+    run_in_process(manager, images)
+    baseline = time.perf_counter() - start
+
+    print(f"{'mode':<16}{'startup s':>10}{'seconds':>10}{'images/s':>12}{'speedup':>10}")
+    print(f"{'in-process':<16}{0.0:>10.2f}{baseline:>10.2f}{len(images) / baseline:>12.2f}{1.0:>10.2f}")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        pool = SharedMemoryImagePool(workers)
+        # Warm every worker so model loading is not counted as analysis time
+        list(pool.analyze(images[:1] * workers))
+        startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        list(pool.analyze(images))
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        print(f"{f'workers={workers}':<16}{startup:>10.2f}{elapsed:>10.2f}"
+              f"{len(images) / elapsed:>12.2f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
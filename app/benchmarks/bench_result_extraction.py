@@ -0,0 +1,86 @@
+"""Micro-benchmark: per-box result extraction vs columnar Detections.
+
+Compares the legacy loop (three .cpu().numpy() calls per box, one dict per
+box) with Detections.from_boxes (one transfer per tensor) at 10, 100 and
+1000 boxes per frame. Lazy dict access is timed separately so the cost for
+callers that still iterate dicts is visible.
+
+Usage:
+    python benchmarks/bench_result_extraction.py [--device cuda]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import torch
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.detection_results import Detections
+
+CLASS_NAMES = {
+    0: "Stones / Stone Pillars / Stone Structures",
+    1: "Crops / Farmland",
+    2: "Non-archaeological (deserts, water, mountains, etc.)",
+    3: "Heritage Sites (temples, palaces, forts, museums)"
+}
+CLASS_COLORS = {0: (139, 69, 19), 1: (34, 139, 34), 2: (105, 105, 105), 3: (184, 134, 11)}
+
+
+class SyntheticBoxes:
+    """Minimal stand-in for ultralytics Boxes backed by real tensors"""
+
+    def __init__(self, count, device):
+        xy = torch.rand(count, 2, device=device) * 1000
+        wh = torch.rand(count, 2, device=device) * 200 + 1
+        self.xyxy = torch.cat([xy, xy + wh], dim=1)
+        self.conf = torch.rand(count, device=device)
+        self.cls = torch.randint(0, 4, (count,), device=device).float()
+
+    def __len__(self):
+        return len(self.conf)
+
+
+def legacy_extract(boxes):
+    """The original per-box extraction loop"""
+    detections = []
+    for i in range(len(boxes)):
+        box = boxes.xyxy[i].cpu().numpy()
+        conf = boxes.conf[i].cpu().numpy()
+        cls = int(boxes.cls[i].cpu().numpy())
+        detections.append({
+            'bbox': box.tolist(),
+            'confidence': float(conf),
+            'class_id': cls,
+            'class_name': CLASS_NAMES.get(cls, f"Class {cls}"),
+            'color': CLASS_COLORS.get(cls, (255, 255, 255))
+        })
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+    
+    print(f"{'boxes':>6}{'legacy (us)':>14}{'columnar (us)':>16}{'+dicts (us)':>14}{'speedup':>10}")
+    for count in args.counts:
+        boxes = SyntheticBoxes(count, args.device)
+        number = max(5, 20000 // count)
+        
+        legacy = min(timeit.repeat(lambda: legacy_extract(boxes), number=number, repeat=5)) / number
+        columnar = min(timeit.repeat(
+            lambda: Detections.from_boxes(boxes, CLASS_NAMES, CLASS_COLORS), number=number, repeat=5
+        )) / number
+        with_dicts = min(timeit.repeat(
+            lambda: Detections.from_boxes(boxes, CLASS_NAMES, CLASS_COLORS).to_dicts(), number=number, repeat=5
+        )) / number
+        
+        print(f"{count:>6}{legacy * 1e6:>14.1f}{columnar * 1e6:>16.1f}{with_dicts * 1e6:>14.1f}{legacy / columnar:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
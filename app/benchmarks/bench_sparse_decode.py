@@ -0,0 +1,64 @@
+"""Benchmark: decode cost per analyzed frame for different strides and decode modes.
+
+Compares reading every frame ('read'), grabbing skipped frames without
+retrieve ('grab'), keyframe-aware seeking ('seek') and the automatic choice
+('auto') on a local video.
+
+Usage:
+    python benchmarks/bench_sparse_decode.py [--video 2.mp4] [--strides 1 5 30 300]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.video_decode import DECODE_MODES, SparseFrameReader
+
+
+def run(video, stride, mode, seek_threshold):
+    """Decode every stride-th frame; return (analyzed frames, seconds)"""
+    cap = cv2.VideoCapture(video)
+    reader = SparseFrameReader(cap, mode=mode, seek_threshold=seek_threshold)
+    analyzed = 0
+    start = time.perf_counter()
+    index = stride
+    while reader.read_at(index) is not None:
+        analyzed += 1
+        index += stride
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return analyzed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', default=str(Path(__file__).parent.parent / "2.mp4"))
+    parser.add_argument('--strides', type=int, nargs='+', default=[1, 5, 30, 300])
+    parser.add_argument('--seek-threshold', type=int, default=120)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {args.video}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    print(f"{args.video}: {total} frames, {width}x{height}")
+    print(f"{'stride':>7}{'mode':>7}{'frames':>8}{'total (s)':>11}{'ms/analyzed':>13}")
+    
+    for stride in args.strides:
+        for mode in DECODE_MODES:
+            results = [run(args.video, stride, mode, args.seek_threshold) for _ in range(args.repeats)]
+            analyzed, elapsed = min(results, key=lambda r: r[1])
+            per_frame = elapsed / analyzed * 1000 if analyzed else float('nan')
+            print(f"{stride:>7}{mode:>7}{analyzed:>8}{elapsed:>11.3f}{per_frame:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Parity check: exported inference backends against the PyTorch weights.
+
+Runs every image through the PyTorch model and through each requested
+backend, matches same-class boxes by IoU and fails (exit code 1) when a
+backend misses or adds boxes, or shifts a box or confidence by more than
+the tolerances.
+
+Usage:
+    python benchmarks/check_backend_parity.py --images path/to/folder --backends onnx openvino
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_batch_inference import load_images
+from utils.detection_utils import DetectionManager
+from utils.model_compare import compare_detections
+
+
+def run_backend(backend, images):
+    """Detections for every image on one backend, bypassing the result cache"""
+    manager = DetectionManager(backend=backend)
+    if manager.model is None or manager.backend != backend:
+        raise SystemExit(f"Backend '{backend}' is not available")
+    manager.cache = None
+    return [manager.detect_objects(image) for image in images]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of images to check on")
+    parser.add_argument('--count', type=int, default=16, help="Number of images to check")
+    parser.add_argument('--backends', nargs='+', default=['onnx', 'openvino'])
+    parser.add_argument('--iou', type=float, default=0.9, help="IoU needed for two boxes to match")
+    parser.add_argument('--box-tolerance', type=float, default=2.0, help="Max box coordinate error in pixels")
+    parser.add_argument('--conf-tolerance', type=float, default=0.02, help="Max confidence difference")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    reference = run_backend('torch', images)
+    print(f"PyTorch reference: {sum(len(d) for d in reference)} detections on {len(images)} images")
+
+    failed = False
+    for backend in args.backends:
+        report = compare_detections(reference, run_backend(backend, images), iou_threshold=args.iou)
+        max_conf_error = max((d['max_abs'] for d in report['class_confidence_drift'].values()), default=0.0)
+        ok = (report['matched'] == report['reference_detections'] == report['candidate_detections']
+              and report['max_box_error_px'] <= args.box_tolerance
+              and max_conf_error <= args.conf_tolerance)
+        failed |= not ok
+        print(f"{backend:<10}{'PASS' if ok else 'FAIL':>6}  matched {report['matched']}/"
+              f"{report['reference_detections']} (candidate {report['candidate_detections']}), "
+              f"mean IoU {report['mean_iou']:.4f}, max box error {report['max_box_error_px']:.2f}px, "
+              f"max confidence error {max_conf_error:.4f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
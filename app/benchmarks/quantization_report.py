@@ -0,0 +1,116 @@
+"""Accuracy-vs-speed report for quantized model variants on CPU.
+
+Runs the PyTorch FP32 weights as the baseline and every requested
+precision on the same images, then reports for each variant:
+  - detection agreement with the baseline (precision/recall of
+    same-class boxes at IoU 0.5, an mAP proxy without ground truth)
+  - mean and worst confidence drift per heritage class
+  - per-image latency and model size on disk
+
+Usage:
+    python benchmarks/quantization_report.py --images path/to/folder \\
+        --calibration-dir path/to/calibration --output quantization_report.md
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Force CPU inference before torch is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_batch_inference import load_images
+from utils.detection_utils import DetectionManager
+from utils.inference_backends import artifact_size
+from utils.model_compare import compare_detections
+
+DEFAULT_PRECISIONS = ['fp16', 'int8-dynamic', 'int8-static']
+
+
+def run_variant(precision, images, calibration_dir):
+    """Detections and per-image latencies for one precision, bypassing the result cache"""
+    manager = DetectionManager(precision=precision, calibration_dir=calibration_dir)
+    if manager.model is None or manager.precision != precision:
+        return None
+    manager.cache = None
+    manager.detect_objects(images[0])
+
+    results, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        results.append(manager.detect_objects(image))
+        latencies.append(time.perf_counter() - start)
+    return manager, results, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of evaluation images")
+    parser.add_argument('--count', type=int, default=64, help="Number of evaluation images")
+    parser.add_argument('--precisions', nargs='+', default=DEFAULT_PRECISIONS)
+    parser.add_argument('--calibration-dir', help="Calibration images for int8-static (keep apart from --images)")
+    parser.add_argument('--output', type=Path, help="Also write the report as Markdown")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    baseline = run_variant('fp32', images, None)
+    if baseline is None:
+        raise SystemExit("Model failed to load; make sure best.pt is present in the app folder")
+    base_manager, base_results, base_latency = baseline
+    base_size = artifact_size(base_manager.inference_path)
+
+    lines = [
+        f"# Quantization report ({len(images)} images, CPU)",
+        "",
+        "| variant | backend | size MB | p50 ms | speedup | precision | recall | mean IoU |",
+        "|---|---|---|---|---|---|---|---|",
+        f"| fp32 (baseline) | torch | {base_size / 1e6:.1f} | {np.median(base_latency):.1f} | 1.00 | 1.000 | 1.000 | 1.000 |"
+    ]
+    drift_lines = []
+
+    for precision in args.precisions:
+        if precision == 'int8-static' and not args.calibration_dir:
+            print("Skipping int8-static: pass --calibration-dir", file=sys.stderr)
+            continue
+        variant = run_variant(precision, images, args.calibration_dir)
+        if variant is None:
+            print(f"Skipping {precision}: variant could not be built", file=sys.stderr)
+            continue
+        manager, results, latency = variant
+        report = compare_detections(base_results, results, iou_threshold=0.5)
+        lines.append(
+            f"| {precision} | {manager.backend} | {artifact_size(manager.inference_path) / 1e6:.1f} | "
+            f"{np.median(latency):.1f} | {np.median(base_latency) / np.median(latency):.2f} | "
+            f"{report['precision']:.3f} | {report['recall']:.3f} | {report['mean_iou']:.3f} |"
+        )
+        for class_id, class_name in base_manager.class_names.items():
+            drift = report['class_confidence_drift'].get(class_id)
+            counts = report['class_counts'].get(class_id, [0, 0])
+            drift_lines.append(
+                f"| {precision} | {class_name} | {counts[0]} / {counts[1]} | "
+                + (f"{drift['mean']:+.4f} | {drift['max_abs']:.4f} |" if drift else "- | - |")
+            )
+
+    lines += [
+        "",
+        "## Confidence drift per class (variant minus baseline, matched boxes)",
+        "",
+        "| variant | class | boxes (baseline / variant) | mean drift | worst drift |",
+        "|---|---|---|---|---|"
+    ] + drift_lines
+
+    report_text = "\n".join(lines) + "\n"
+    print(report_text)
+    if args.output:
+        args.output.write_text(report_text, encoding='utf-8')
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
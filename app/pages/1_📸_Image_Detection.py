@@ -3,14 +3,20 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
 import sys
 from pathlib import Path
 
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from utils.detection_stats import StatisticsAggregator
+from utils.detection_store import detection_rows, get_detection_store
 from utils.detection_utils import DetectionManager
-from utils.ui_utils import create_detection_charts, create_summary_text, display_metrics, generate_pdf_report
+from utils.image_ingest import detect_ingested, ingest_image, memory_report
+from utils.parallel_executor import get_image_pool
+from utils.tiled_inference import MERGE_MODES, TiledDetector
+from utils.ui_utils import create_detection_charts, create_summary_text, display_metrics, generate_pdf_report, start_history_run
 
 # Page configuration
 st.set_page_config(
@@ -50,69 +56,126 @@ uploaded_files = st.file_uploader(
     help="Upload one or more images to analyze for heritage objects"
 )
 
-def process_images(uploaded_files, detection_manager):
-    """Process uploaded images and perform detection"""
+def ingest_upload(uploaded_file, detection_manager):
+    """Decode an upload at working resolution (twice the model input size)"""
+    return ingest_image(uploaded_file.name, uploaded_file.getvalue(), max_side=working_side(detection_manager))
+
+def working_side(detection_manager):
+    """Longest side kept in memory; the model letterboxes to imgsz anyway"""
+    return 2 * detection_manager.imgsz
+
+def process_images(uploaded_files, detection_manager, batch_size=8, tile_options=None):
+    """Process uploaded images and perform batched detection"""
     
     progress_bar = st.progress(0)
     status_text = st.empty()
     
     results = []
-    all_detections = []
     
-    for i, uploaded_file in enumerate(uploaded_files):
-        status_text.text(f"Processing image {i+1}/{len(uploaded_files)}: {uploaded_file.name}")
-        
-        # Read image
-        image = Image.open(uploaded_file)
-        image_array = np.array(image)
+    for start in range(0, len(uploaded_files), batch_size):
+        batch_files = uploaded_files[start:start + batch_size]
+        end = start + len(batch_files)
+        status_text.text(f"Processing images {start + 1}-{end}/{len(uploaded_files)}")
         
-        # Convert PIL to OpenCV format
-        if len(image_array.shape) == 3:
-            image_cv = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-        else:
-            image_cv = image_array
+        # Read images for this batch at working resolution
+        images = [ingest_upload(uploaded_file, detection_manager) for uploaded_file in batch_files]
         
-        # Perform detection
-        detections = detection_manager.detect_objects(image_cv)
+        # Images larger than one tile are analyzed tile by tile at full resolution
+        tiled = TiledDetector(detection_manager, **tile_options) if tile_options else None
+        large = [tiled is not None and tiled.needs_tiling(*image.full_size) for image in images]
         
-        # Debug information
-        if detections:
-            st.info(f"Found {len(detections)} objects in {uploaded_file.name}")
-        else:
-            st.warning(f"No objects detected in {uploaded_file.name}")
+        # Perform detection with one forward pass for the rest of the batch
+        batch_detections = iter(detection_manager.detect_batch(
+            [image.working for image, is_large in zip(images, large) if not is_large], batch_size=batch_size,
+            use_cache=True
+        ))
+        batch_detections = [
+            detect_ingested(detection_manager, image, tiled) if is_large else next(batch_detections)
+            for image, is_large in zip(images, large)
+        ]
         
-        # Draw detections
-        annotated_image = detection_manager.draw_detections(image_cv, detections)
+        for image, detections in zip(images, batch_detections):
+            # Debug information
+            if detections:
+                st.info(f"Found {len(detections)} objects in {image.name}")
+            else:
+                st.warning(f"No objects detected in {image.name}")
+            
+            # Store results; annotated views are drawn when displayed
+            results.append({
+                'filename': image.name,
+                'image': image,
+                'detections': detections
+            })
         
-        # Convert back to RGB for display
-        annotated_image_rgb = cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB)
+        progress_bar.progress(end / len(uploaded_files))
+    
+    store_image_results(results, detection_manager)
+    
+    status_text.text("✅ Analysis complete!")
+    progress_bar.empty()
+    status_text.empty()
+    
+    st.success(f"Successfully analyzed {len(uploaded_files)} image(s)!")
+
+def process_images_parallel(uploaded_files, detection_manager, workers=2, tile_options=None):
+    """Process uploaded images on a pool of worker processes sharing pixel buffers"""
+    
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    status_text.text(f"Starting {workers} worker process(es)...")
+    
+    pool = get_image_pool(workers)
+    images = ((uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files)
+    
+    # Keep the upload order for display
+    results = [None] * len(uploaded_files)
+    completed = 0
+    
+    # Results arrive in completion order
+    for analysis in pool.analyze(images, max_side=working_side(detection_manager), tile_options=tile_options):
+        completed += 1
+        status_text.text(f"Processed {analysis.name} ({completed}/{len(uploaded_files)}) "
+                         f"in {analysis.seconds:.2f}s on worker {analysis.pid}")
+        if analysis.detections:
+            st.info(f"Found {len(analysis.detections)} objects in {analysis.name}")
+        else:
+            st.warning(f"No objects detected in {analysis.name}")
         
-        # Store results
-        result = {
-            'filename': uploaded_file.name,
-            'original_image': image_array,
-            'annotated_image': annotated_image_rgb,
-            'detections': detections,
-            'image_cv': image_cv
+        results[analysis.index] = {
+            'filename': analysis.name,
+            'image': analysis.image,
+            'detections': analysis.detections
         }
-        results.append(result)
-        all_detections.extend(detections)
-        
-        progress_bar.progress((i + 1) / len(uploaded_files))
+        progress_bar.progress(completed / len(uploaded_files))
     
-    # Store results in session state
-    st.session_state.image_results = results
-    st.session_state.image_detections = all_detections
-    
-    # Calculate statistics
-    stats = detection_manager.get_class_statistics([all_detections])
-    st.session_state.image_stats = stats
+    store_image_results(results, detection_manager)
     
     status_text.text("✅ Analysis complete!")
     progress_bar.empty()
     status_text.empty()
     
-    st.success(f"Successfully analyzed {len(uploaded_files)} image(s)!")
+    st.success(f"Successfully analyzed {len(uploaded_files)} image(s) with {workers} worker(s)!")
+
+def store_image_results(results, detection_manager):
+    """Save results and statistics to session state and the detection history"""
+    st.session_state.image_results = results
+    
+    # One transaction for the whole upload, with boxes in original image coordinates
+    run_id = start_history_run()
+    rows = []
+    for result in results:
+        image = result['image']
+        rows.extend(detection_rows(run_id, 'image', result['filename'],
+                                   result['detections'].scaled(1 / image.scale)))
+    get_detection_store().insert_rows(rows)
+    
+    # Calculate statistics; the aggregator is kept so the dashboard can merge it without SQL
+    aggregator = StatisticsAggregator()
+    for result in results:
+        aggregator.update(result['detections'])
+    st.session_state.image_aggregator = aggregator
+    st.session_state.image_stats = aggregator.to_stats()
 
 def display_image_results():
     """Display the results of image detection"""
@@ -145,23 +208,32 @@ def display_image_results():
     st.markdown("## 🖼️ Detected Images")
     
     for i, result in enumerate(results):
+        image = result['image']
         with st.expander(f"📷 {result['filename']} - {len(result['detections'])} detections"):
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown("**Original Image**")
-                st.image(result['original_image'], use_column_width=True)
+                st.image(image.frame.rgb(), use_column_width=True)
             
             with col2:
                 st.markdown("**Detected Objects**")
-                st.image(result['annotated_image'], use_column_width=True)
+                st.image(annotate_result(result, detection_manager), use_column_width=True)
+            
+            width, height = image.full_size
+            if image.scale < 1.0 and st.checkbox(f"Show full resolution ({width}×{height})", key=f"full_res_{i}"):
+                # Decoded from the upload for this view only; nothing is kept in the session
+                full_detections = result['detections'].scaled(1 / image.scale)
+                full_annotated = image.full_resolution_frame().annotated(detection_manager, full_detections)
+                st.image(full_annotated.rgb(), use_column_width=True)
             
             # Detection details
             if result['detections']:
                 st.markdown("**Detection Details:**")
                 detection_data = []
-                for j, detection in enumerate(result['detections']):
+                # Report boxes in original image coordinates
+                for j, detection in enumerate(result['detections'].scaled(1 / image.scale)):
                     detection_data.append({
                         'Object': j + 1,
                         'Class': detection['class_name'],
@@ -172,16 +244,17 @@ def display_image_results():
                 st.table(detection_data)
                 
                 # Show cropped detections
-                crops = detection_manager.crop_detections(result['image_cv'], result['detections'])
+                crops = detection_manager.crop_detections(image.frame.rgb(), result['detections'])
                 if crops:
                     st.markdown("**Cropped Detections:**")
                     cols = st.columns(min(len(crops), 4))
                     for idx, crop in enumerate(crops):
                         if idx < len(cols):
                             with cols[idx]:
-                                # Convert BGR to RGB for display
-                                crop_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
-                                st.image(crop_rgb, caption=f"Detection {idx + 1}", use_column_width=True)
+                                # Crops are views of the RGB working frame
+                                st.image(crop, caption=f"Detection {idx + 1}", use_column_width=True)
+    
+    display_memory_usage(results)
     
     # Download options
     st.markdown("## 💾 Download Results")
@@ -196,15 +269,32 @@ def display_image_results():
         if st.button("🔄 Clear Results"):
             clear_image_results()
 
+def annotate_result(result, detection_manager):
+    """Draw a result's detections on its working-resolution image, as RGB"""
+    return result['image'].frame.annotated(detection_manager, result['detections']).rgb()
+
+def display_memory_usage(results):
+    """Show how much memory this session's images hold"""
+    report = memory_report([result['image'] for result in results])
+    mb = 1024 * 1024
+    with st.expander("🧠 Session Memory"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Held", f"{report['total'] / mb:.1f} MB")
+        col2.metric("Working Images", f"{report['working'] / mb:.1f} MB")
+        col3.metric("Source Files", f"{report['source'] / mb:.1f} MB")
+        st.caption(f"Keeping full-resolution original, annotated and BGR copies would take "
+                   f"{report['full_resolution_equivalent'] / mb:.1f} MB. Full-resolution views are "
+                   f"decoded from the source files on demand.")
+
 def generate_pdf_download(stats, summary_text):
     """Generate and download PDF report"""
     try:
         # Collect up to 6 annotated sample images to embed in PDF
         samples = []
         if 'image_results' in st.session_state:
+            detection_manager = st.session_state.detection_manager
             for res in st.session_state.image_results[:6]:
-                # annotated_image is already RGB
-                samples.append(res['annotated_image'])
+                samples.append(annotate_result(res, detection_manager))
 
         pdf_data = generate_pdf_report(stats, summary_text, samples=samples)
         
@@ -223,18 +313,69 @@ def clear_image_results():
     """Clear image detection results"""
     if 'image_results' in st.session_state:
         del st.session_state.image_results
-    if 'image_detections' in st.session_state:
-        del st.session_state.image_detections
     if 'image_stats' in st.session_state:
         del st.session_state.image_stats
+    if 'image_aggregator' in st.session_state:
+        del st.session_state.image_aggregator
     st.success("Results cleared!")
     st.rerun()
 
+def display_tiling_settings():
+    """Tiled inference controls; returns TiledDetector options or None when disabled"""
+    with st.expander("🧩 Large Image Tiling"):
+        enabled = st.checkbox(
+            "Tile large images",
+            value=False,
+            help="Analyze orthophotos and satellite images in overlapping tiles so small structures are not lost to downscaling"
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            tile_size = st.selectbox("Tile size (px)", [640, 1024, 1280, 2048], index=1, disabled=not enabled)
+        with col2:
+            overlap = st.slider("Tile overlap", min_value=0.0, max_value=0.5, value=0.2, step=0.05,
+                                disabled=not enabled)
+        with col3:
+            merge = st.selectbox("Seam merge", MERGE_MODES, disabled=not enabled,
+                                 help="nms keeps the best box; wbf averages overlapping boxes")
+    
+    if not enabled:
+        return None
+    return {'tile_size': tile_size, 'overlap': overlap, 'merge': merge}
+
 # Main execution code
 if uploaded_files:
     # Process images
+    batch_size = st.slider(
+        "Batch size",
+        min_value=1,
+        max_value=32,
+        value=8,
+        help="Number of images sent to the model in a single forward pass"
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        use_workers = st.checkbox(
+            "Use worker processes",
+            value=False,
+            help="Analyze images in parallel on separate processes, each holding its own copy of the model"
+        )
+    with col2:
+        workers = st.slider(
+            "Worker processes",
+            min_value=1,
+            max_value=max(1, os.cpu_count() or 1),
+            value=min(4, max(1, (os.cpu_count() or 2) // 2)),
+            disabled=not use_workers
+        )
+    
+    tile_options = display_tiling_settings()
+    
     if st.button("🔍 Analyze Images", type="primary"):
-        process_images(uploaded_files, detection_manager)
+        if use_workers:
+            process_images_parallel(uploaded_files, detection_manager, workers=workers, tile_options=tile_options)
+        else:
+            process_images(uploaded_files, detection_manager, batch_size=batch_size, tile_options=tile_options)
 
 # Display results if available
 if 'image_results' in st.session_state and st.session_state.image_results:
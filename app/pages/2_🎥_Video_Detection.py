@@ -14,8 +14,20 @@ from pytube import YouTube
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from utils.detection_store import get_detection_store
 from utils.detection_utils import DetectionManager
-from utils.ui_utils import create_detection_charts, create_summary_text, display_metrics, generate_pdf_report
+from utils.frame import Frame
+from utils.frame_scheduler import AdaptiveFrameScheduler
+from utils.frame_store import FrameStore
+from utils.job_manager import CANCELLED, FAILED, PAUSED, QUEUED, JobCancelled, job_manager, live_job_manager
+from utils.live_capture import REPLAY_DIR_ENV_VAR, LatestFrameCapture, LiveDetectionLoop, parse_live_source, replay_videos
+from utils.preview import DEFAULT_PREVIEW_FPS, PreviewRenderer
+from utils.recorder import DEFAULT_TRIGGER_CLASSES, DetectionRecorder
+from utils.scene_gate import SceneChangeGate
+from utils.tracker import IoUTracker
+from utils.video_pipeline import VideoPipeline
+from utils.video_writer import StreamingVideoWriter, static_url, static_video_path
+from utils.ui_utils import create_detection_charts, create_summary_text, display_metrics, generate_pdf_report, start_history_run
 
 # Page configuration
 st.set_page_config(
@@ -46,12 +58,16 @@ if detection_manager.model is None:
     st.error("❌ Model failed to load. Please check if the model file 'best.pt' exists.")
     st.stop()
 
+# How often the page re-renders a running video job
+JOB_POLL_SECONDS = 0.5
+MIN_POLL_SECONDS = 0.1
+
 # Video input options
 st.markdown("## 📹 Video Input Options")
 
 input_option = st.radio(
     "Choose video input method:",
-    ["Upload Local Video", "YouTube Link"],
+    ["Upload Local Video", "YouTube Link", "Live Camera / Stream"],
     horizontal=True
 )
 
@@ -64,12 +80,18 @@ def handle_local_video_upload():
     )
     
     if uploaded_file is not None:
-        # Save uploaded file to temporary location
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        tfile.write(uploaded_file.read())
-        tfile.close()
-        
-        return tfile.name
+        # Save uploaded file to temporary location, once per upload (the page reruns while a job is polled)
+        upload_key = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('video_upload_key') != upload_key or \
+           not os.path.exists(st.session_state.get('video_upload_path', '')):
+            tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
+            tfile.write(uploaded_file.getvalue())
+            tfile.close()
+            st.session_state.video_upload_key = upload_key
+            st.session_state.video_upload_path = tfile.name
+        
+        st.session_state.video_source = uploaded_file.name
+        return st.session_state.video_upload_path
     
     return None
 
@@ -99,327 +121,579 @@ def handle_youtube_video():
     
     return None
 
+def handle_live_source():
+    """Handle webcam index or stream URL input for live detection"""
+    videos = replay_videos()
+    live_replay = st.checkbox(
+        "Replay a server-side video as a live source",
+        disabled=not videos,
+        help=f"Videos in ${REPLAY_DIR_ENV_VAR} are played back in real time, looping, like a camera"
+    )
+    if live_replay:
+        # Chosen from the configured directory only, never typed in as a path
+        live_source = str(st.selectbox("Video to replay:", videos, format_func=lambda p: p.name))
+    else:
+        live_source = st.text_input(
+            "Camera index or stream URL:",
+            placeholder="0, rtsp://camera.local/stream or http://camera.local/video.mjpg",
+            help="A webcam index (0 is the first camera), an RTSP URL or an HTTP MJPEG URL"
+        )
+        if live_source:
+            try:
+                parse_live_source(live_source)
+            except ValueError:
+                st.error("❌ Enter a camera index (e.g. 0) or an rtsp://, http:// or https:// stream URL.")
+                live_source = None
+    
+    with st.expander("📼 Recording"):
+        st.caption("Live sources are not saved as a whole video; only frames recorded here are kept.")
+        record = st.checkbox(
+            "Save frames around detections",
+            help="Annotated frames are written as JPEGs only around detections of the trigger classes"
+        )
+        class_names = detection_manager.class_names
+        trigger_classes = st.multiselect(
+            "Trigger classes",
+            options=list(class_names),
+            default=list(DEFAULT_TRIGGER_CLASSES),
+            format_func=class_names.get,
+            disabled=not record
+        )
+        min_confidence = st.slider("Minimum trigger confidence", min_value=0.1, max_value=0.95, value=0.5, step=0.05,
+                                   disabled=not record)
+        pre_roll = st.slider("Seconds kept before a detection", min_value=0.0, max_value=10.0, value=2.0, step=0.5,
+                             disabled=not record)
+        post_roll = st.slider("Seconds kept after a detection", min_value=0.0, max_value=30.0, value=3.0, step=0.5,
+                              disabled=not record)
+        max_mb = st.number_input("Keep at most (MB of recordings)", min_value=50, max_value=100000, value=512, step=50,
+                                 disabled=not record)
+    
+
+    if live_source:
+        st.session_state.live_source = live_source
+        st.session_state.live_replay = live_replay
+        st.session_state.live_recording = {
+            'trigger_classes': trigger_classes,
+            'min_confidence': min_confidence,
+            'pre_roll': pre_roll,
+            'post_roll': post_roll,
+            'max_bytes': int(max_mb) * 1024 * 1024
+        } if record else None
+        return "live_source"
+    
+    return None
+
 def display_video_controls(video_path, detection_manager):
-    """Display video detection controls and results"""
+    """Display video detection controls and the status of the session's video job"""
     
     st.markdown("## 🎮 Detection Controls")
     
-    col1, col2, col3 = st.columns(3)
+    sampling = display_sampling_settings()
+    
+    job = st.session_state.get('video_job')
+    job_active = job is not None and not job.finished
+    
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        if st.button("▶️ Start Detection", type="primary"):
-            if video_path == "youtube_direct":
-                start_youtube_detection(detection_manager)
-            else:
-                start_video_detection(video_path, detection_manager)
+        if st.button("▶️ Start Detection", type="primary", disabled=job_active):
+            job = submit_video_job(video_path, detection_manager, sampling)
+            job_active = job is not None
     
     with col2:
-        if st.button("⏹️ Stop Detection"):
-            stop_video_detection()
+        if st.button("⏹️ Stop Detection", disabled=not job_active):
+            job.cancel()
     
     with col3:
+        if job_active and job.status == PAUSED:
+            if st.button("⏯️ Resume"):
+                job.resume()
+        elif st.button("⏸️ Pause", disabled=not job_active or job.cancel_requested):
+            job.pause()
+    
+    with col4:
         if st.button("🔄 Reset"):
             reset_video_detection()
     
-    # Display current status
-    if st.session_state.get('video_detection_active', False):
-        st.info("🔴 Detection in progress... Click 'Stop Detection' to view results.")
-        
-        # Show live detection if available
-        if 'current_frame' in st.session_state:
-            st.image(st.session_state.current_frame, caption="Live Detection", use_column_width=True)
-    
-    # Check if processing just completed
-    elif 'video_detections' in st.session_state and st.session_state.video_detections and \
-         'video_stats' not in st.session_state:
-        # Processing just finished, calculate stats
-        detection_manager = st.session_state.detection_manager
-        stats = detection_manager.get_class_statistics([st.session_state.video_detections])
-        st.session_state.video_stats = stats
-        st.session_state.video_results = True
-        
-        total_detections = len(st.session_state.video_detections)
-        st.success(f"✅ Video processing completed! Found {total_detections} objects. Results displayed below.")
+    if job is None:
+        return
+    
+    if not job.finished:
+        # The job runs on a background thread; this script run only renders its latest state
+        # and tells the job it is still watched (live jobs stop once nobody polls them)
+        job.heartbeat()
+        preview = display_job_status(job)
+        time.sleep(max(preview.interval, MIN_POLL_SECONDS) if preview else JOB_POLL_SECONDS)
+        st.rerun()
+    elif not st.session_state.get('video_job_collected', False):
+        collect_video_job(job)
+
+def display_sampling_settings():
+    """Frame-sampling controls; returns the chosen settings"""
+    with st.expander("⚙️ Sampling Settings"):
+        adaptive = st.checkbox(
+            "Adaptive sampling",
+            value=True,
+            help="Sample more densely when the scene or detections change, sparsely on static footage"
+        )
+        target_fps = st.slider(
+            "Target analyzed frames per second of footage",
+            min_value=1.0, max_value=30.0, value=6.0, step=0.5
+        )
+        time_budget = st.slider(
+            "Processing time budget (seconds per second of footage)",
+            min_value=0.25, max_value=4.0, value=1.0, step=0.25,
+            help="Caps how densely frames are sampled given the measured inference latency",
+            disabled=not adaptive
+        )
+        scene_gate = st.checkbox(
+            "Skip near-duplicate frames",
+            value=True,
+            help="Reuse the previous detections when a sampled frame is effectively unchanged"
+        )
+        gate_threshold = st.slider(
+            "Scene change threshold",
+            min_value=0.002, max_value=0.1, value=0.015, step=0.001, format="%.3f",
+            help="Mean gray-level difference (fraction of full scale) below which a frame counts as unchanged",
+            disabled=not scene_gate
+        )
+        min_hits = st.slider(
+            "Minimum sightings per object",
+            min_value=1, max_value=5, value=2,
+            help="Tracks seen in fewer analyzed frames are treated as flicker and not counted"
+        )
+        preview_fps = st.select_slider(
+            "Live preview refresh rate (frames per second)",
+            options=[0.5, 1.0, 2.0, 5.0, 10.0], value=DEFAULT_PREVIEW_FPS,
+            help="Detection runs at full speed; the preview shows the newest frame at most this often"
+        )
+    return {
+        'adaptive': adaptive,
+        'target_fps': target_fps,
+        'time_budget': time_budget,
+        'scene_gate': scene_gate,
+        'gate_threshold': gate_threshold,
+        'min_hits': min_hits,
+        'preview_fps': preview_fps
+    }
+
+def create_frame_detector(detection_manager, sampling):
+    """Wrap the detection manager in a scene-change gate if enabled"""
+    if sampling['scene_gate']:
+        return SceneChangeGate(detection_manager, threshold=sampling['gate_threshold'])
+    return detection_manager
+
+def format_gate_stats(gate_stats):
+    """Format scene-gate counters as markdown"""
+    if not gate_stats:
+        return ""
+    return (
+        f"**Scene gate:** {gate_stats['frames_inferred']} inferred, "
+        f"{gate_stats['frames_skipped']} reused ({gate_stats['skip_ratio']:.0%} skipped)"
+    )
+
+def create_frame_scheduler(fps, sampling):
+    """Build the sampling scheduler (None for a fixed stride) and the nominal stride"""
+    source_fps = fps if fps and fps > 0 else 30.0
+    if sampling['adaptive']:
+        scheduler = AdaptiveFrameScheduler(
+            source_fps, target_fps=sampling['target_fps'], time_budget=sampling['time_budget']
+        )
+        return scheduler, scheduler.nominal_stride
+    return None, max(1, int(round(source_fps / sampling['target_fps'])))
+
+def format_sampling_stats(sampling_stats):
+    """Format the sampling policy and achieved rates as markdown"""
+    if not sampling_stats:
+        return ""
+    return (
+        f"**Sampling:** {sampling_stats['policy']} policy, every {sampling_stats['stride']} frame(s) — "
+        f"{sampling_stats['effective_fps']:.1f} analyzed frames/s, "
+        f"{sampling_stats['sampling_fps']:.1f} per second of footage"
+    )
+
+def format_pipeline_stats(pipeline_stats):
+    """Format per-stage throughput and queue depth as markdown"""
+    stages = pipeline_stats['stages']
+    queues = pipeline_stats['queues']
+    throughput = " | ".join(f"{name} {s['throughput_fps']:.1f} fps" for name, s in stages.items())
+    if not queues:
+        return f"**Pipeline:** {throughput}"
+    depths = " | ".join(f"{name} {q['depth']}/{q['capacity']}" for name, q in queues.items())
+    return f"**Pipeline:** {throughput} — **Queue depth:** {depths}"
+
+def format_recorder_stats(recorder_stats):
+    """Format detection-triggered recording counters as markdown"""
+    if not recorder_stats:
+        return ""
+    return (
+        f"**Recording:** {recorder_stats['events_recorded']} events, {recorder_stats['frames_recorded']} frames saved "
+        f"({recorder_stats['bytes_on_disk'] / (1024 * 1024):.1f} MB on disk), "
+        f"{recorder_stats['frames_dropped']} dropped, {recorder_stats['pending_writes']} writes pending"
+    )
+
+def format_latency_stats(live_stats):
+    """Format glass-to-result latency and capture drops of a live source as markdown"""
+    latency = live_stats['latency']
+    capture = live_stats['capture']
+    return (
+        f"**Latency (capture to result):** {latency['last_ms']:.0f} ms now, "
+        f"p50 {latency['p50_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms — "
+        f"**Capture:** {capture['capture_fps']:.1f} fps, {capture['frames_dropped']} stale frames dropped"
+    )
+
+def format_preview_stats(preview_stats):
+    """Format live-preview throttling counters as markdown"""
+    return (
+        f"**Preview:** {preview_stats['frames_rendered']} of {preview_stats['frames_seen']} frames shown "
+        f"({preview_stats['frames_superseded']} replaced before display), "
+        f"{preview_stats['encode_ms_avg']:.1f} ms per JPEG"
+    )
+
+def submit_video_job(video_path, detection_manager, sampling):
+    """Queue a video job on the shared job manager (live sources on their own); the page polls its handle"""
+    
+    is_stream = video_path == "youtube_direct"
+    manager = job_manager
+    if video_path == "live_source":
+        manager = live_job_manager
+        source_name = st.session_state.live_source
+        replay = st.session_state.get('live_replay', False)
+        # Replayed videos were picked from the replay directory; typed-in sources are validated
+        job_args = (run_live_job, source_name if replay else parse_live_source(source_name), replay,
+                    st.session_state.get('live_recording'), detection_manager, sampling)
+    elif is_stream:
+        source = st.session_state.get('youtube_url')
+        if not source:
+            st.error("No YouTube URL provided!")
+            return None
+        source_name = source
+        job_args = (run_video_job, source, is_stream, detection_manager, sampling)
+    else:
+        if not os.path.exists(video_path):
+            st.error("Video file not found!")
+            return None
+        source = video_path
+        source_name = st.session_state.get('video_source', os.path.basename(video_path))
+        job_args = (run_video_job, source, is_stream, detection_manager, sampling)
+    
+    # Results of the previous run are replaced
+    clear_video_outputs()
+    reset_frame_store()
+    history = start_video_history(source_name)
+    
+    # Live sources are not archived as a whole (see run_live_job)
+    outputs = (history,) if manager is live_job_manager else (st.session_state.frame_store, history)
+    
+    # The job only gets plain objects; it must not touch st.session_state from its thread
+    job = manager.submit(f"Video: {source_name}", *job_args, *outputs, owner=history.run_id)
+    st.session_state.video_job = job
+    st.session_state.video_job_collected = False
+    st.session_state.video_start_time = time.time()
+    return job
 
-def start_video_detection(video_path, detection_manager):
-    """Start video detection process"""
+def resolve_youtube_stream(youtube_url, job):
+    """Direct stream URL of a YouTube video via yt-dlp"""
+    job.report(message="Connecting to YouTube video...")
+    try:
+        # First get video info
+        info_result = subprocess.run([
+            'yt-dlp', '--dump-json', '--no-playlist', youtube_url
+        ], capture_output=True, text=True, timeout=30)
+        
+        if info_result.returncode == 0:
+            import json
+            video_info = json.loads(info_result.stdout)
+            video_duration = video_info.get('duration', 0)
+            video_title = video_info.get('title', 'Unknown')
+            
+            job.report(message=f"📹 Video: {video_title} ({video_duration}s)")
+        
+        # Get video stream URL
+        result = subprocess.run([
+            'yt-dlp', '--get-url', '--format', 'best[ext=mp4]/best', youtube_url
+        ], capture_output=True, text=True, timeout=30)
     
-    if not os.path.exists(video_path):
-        st.error("Video file not found!")
-        return
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("Timeout connecting to YouTube. Please try again.")
+    except FileNotFoundError:
+        raise RuntimeError("yt-dlp not found. Please install yt-dlp: pip install yt-dlp")
+    
+    if result.returncode != 0:
+        raise RuntimeError("Failed to get video stream. Please check the URL.")
+    return result.stdout.strip()
+
+def run_video_job(job, source, is_stream, detection_manager, sampling, frame_store, history):
+    """Background video analysis: decode, detect, track and encode until done or cancelled"""
     
-    # Initialize video capture
-    cap = cv2.VideoCapture(video_path)
+    if is_stream:
+        source = resolve_youtube_stream(source, job)
     
+    cap = cv2.VideoCapture(source)
     if not cap.isOpened():
-        st.error("Error opening video file!")
-        return
+        raise RuntimeError("Failed to open video stream!" if is_stream else "Error opening video file!")
     
-    # Get video properties
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Get video properties (streams often report neither)
+    fps = cap.get(cv2.CAP_PROP_FPS) or (30 if is_stream else 0)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or (1000 if is_stream else 0)
     duration = total_frames / fps if fps > 0 else 0
     
-    st.session_state.video_detection_active = True
-    st.session_state.video_detections = []
-    st.session_state.video_start_time = time.time()
-    st.session_state.video_fps = fps
-    st.session_state.video_duration = duration
-    st.session_state.processed_frames = []
-    
-    # Create placeholders for live display
-    frame_placeholder = st.empty()
-    progress_placeholder = st.empty()
-    stats_placeholder = st.empty()
+    # Set a maximum processing time (5 minutes for YouTube videos)
+    max_processing_time = 300 if is_stream else None
+    start_time = time.time()
+    
+    scheduler, frame_stride = create_frame_scheduler(fps, sampling)
+    detector = create_frame_detector(detection_manager, sampling)
+    tracker = IoUTracker(fps, min_hits=sampling['min_hits'])
+    preview = PreviewRenderer(sampling['preview_fps'])
+    # Encode the annotated output while detection runs
+    # Written where Streamlit serves it from, so the download never passes through memory
+    video_writer = StreamingVideoWriter(fps, frame_stride=frame_stride, path=static_video_path())
+    # Tolerate brief stream stalls (~5s)
+    pipeline = VideoPipeline(cap, detector, frame_stride=frame_stride, scheduler=scheduler,
+                             max_read_failures=50 if is_stream else 0, tracker=tracker)
+    job.report(message=f"📹 Video Info: {total_frames} frames, {fps:.1f} FPS, {duration:.1f}s duration",
+               preview=preview)
     
-    frame_count = 0
     processed_frames = 0
-    
     try:
-        while st.session_state.get('video_detection_active', False) and cap.isOpened():
-            ret, frame = cap.read()
-            
-            if not ret:
+        for item in pipeline.run():
+            # Blocks while paused; raises JobCancelled once Stop is pressed
+            job.checkpoint()
+            if max_processing_time and (time.time() - start_time) >= max_processing_time:
                 break
             
-            frame_count += 1
+            # Objects that left the scene are recorded once, as tracks
+            history.add_tracks(tracker.pop_finished())
             
-            # Process every 5th frame to balance performance and accuracy
-            if frame_count % 5 == 0:
-                # Perform detection
-                annotated_frame, detections = detection_manager.process_video_frame(frame)
-                
-                # Store detections
-                st.session_state.video_detections.extend(detections)
-                
-                # Store processed frame for video output
-                st.session_state.processed_frames.append(annotated_frame)
-                
-                # Convert frame for display
-                display_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                st.session_state.current_frame = display_frame
-                
-                # Update display
-                frame_placeholder.image(display_frame, caption="Live Detection", use_column_width=True)
-                
-                processed_frames += 1
-                
-                # Update progress
-                progress = min(frame_count / max(total_frames, 1), 1.0)
-                progress_placeholder.progress(progress)
-                
-                # Update stats
-                current_time = time.time() - st.session_state.video_start_time
-                stats_text = f"""
-                **Detection Stats:**
-                - Processed Frames: {processed_frames}
-                - Total Detections: {len(st.session_state.video_detections)}
-                - Elapsed Time: {current_time:.1f}s
-                - Progress: {progress*100:.1f}%
-                """
-                stats_placeholder.markdown(stats_text)
+            # Spill processed frame to disk for samples and reports, and encode it into the output video
+            frame_store.append(item.annotated_frame)
+            video_writer.write(item.annotated_frame, item.frame_index)
+            
+            processed_frames += 1
+            progress = min(item.frame_index / max(total_frames, 1), 1.0)
+            job.report(progress=progress, processed_frames=processed_frames)
             
-            # Small delay to prevent overwhelming the system
-            time.sleep(0.01)
+            # The preview and its stats text are only built as often as the page can show them
+            if preview.due():
+                pipeline_stats = pipeline.stats()
+                preview.offer(
+                    item.annotated_frame,
+                    stats_text=f"""
+                    **Detection Stats:**
+                    - Processed Frames: {processed_frames}
+                    - Unique Objects: {tracker.track_count}
+                    - Boxes Detected: {tracker.box_count}
+                    - Elapsed Time: {time.time() - start_time:.1f}s
+                    - Progress: {progress*100:.1f}%
+                    
+                    {format_sampling_stats(pipeline_stats['sampling'])}
+                    
+                    {format_gate_stats(detector.stats() if isinstance(detector, SceneChangeGate) else None)}
+                    
+                    {format_pipeline_stats(pipeline_stats)}
+                    """
+                )
     
-    except Exception as e:
-        st.error(f"Error during video detection: {str(e)}")
+    except JobCancelled:
+        # Stopped by the user; what was analyzed so far is kept
+        pass
     
     finally:
+        pipeline.stop()
         cap.release()
-        st.session_state.video_detection_active = False
-        
-        # Calculate final statistics
-        if st.session_state.video_detections:
-            stats = detection_manager.get_class_statistics([st.session_state.video_detections])
-            st.session_state.video_stats = stats
-            st.session_state.video_results = True
-    
-    st.success("Video detection completed!")
+        tracker.close()
+        history.add_tracks(tracker.pop_finished())
+        history.flush()
+        frame_store.flush()
+        video_writer.close()
+        
+        # Published even if the pipeline failed, so partial results can still be shown
+        job.report(
+            tracker=tracker,
+            video_writer=video_writer,
+            stats=tracker.statistics() if tracker.track_count else None,
+            aggregator=tracker.aggregate(),
+            fps=fps,
+            # Streams report no reliable length; use the time spent on them instead
+            duration=time.time() - start_time if is_stream else duration,
+            pipeline_stats=pipeline.stats(),
+            gate_stats=detector.stats() if isinstance(detector, SceneChangeGate) else None
+        )
 
-def start_youtube_detection(detection_manager):
-    """Start YouTube video detection using direct stream processing"""
-    
-    youtube_url = st.session_state.get('youtube_url')
-    if not youtube_url:
-        st.error("No YouTube URL provided!")
-        return
+def run_live_job(job, source, replay, recording, detection_manager, sampling, history):
+    """Background live detection on the newest camera or stream frame until stopped.
+    
+    A live source has no end, so the stream as a whole is not archived (no
+    frame store, no output video); the detection recorder, when enabled, is
+    the only thing written to disk.
+    """
+    
+    job.report(message=f"Connecting to {source}...")
+    capture = LatestFrameCapture(source, replay=replay).start()
+    fps = capture.fps
+    start_time = time.time()
+    
+    detector = create_frame_detector(detection_manager, sampling)
+    tracker = IoUTracker(fps, min_hits=sampling['min_hits'])
+    preview = PreviewRenderer(sampling['preview_fps'])
+    loop = LiveDetectionLoop(capture, detector, tracker=tracker)
+    # Frames around trigger detections are archived on the recorder's own write threads
+    recorder = DetectionRecorder(**recording) if recording else None
+    job.report(message=f"📡 Live source: {fps:.1f} FPS", preview=preview)
     
+    processed_frames = 0
     try:
-        # Initialize video processing
-        st.session_state.video_detection_active = True
-        st.session_state.video_detections = []
-        st.session_state.video_start_time = time.time()
-        st.session_state.processed_frames = []
-        
-        # Create placeholders for live display
-        frame_placeholder = st.empty()
-        progress_placeholder = st.empty()
-        stats_placeholder = st.empty()
-        
-        # Use yt-dlp to get video stream URL and info
-        with st.spinner("Connecting to YouTube video..."):
-            try:
-                # First get video info
-                info_result = subprocess.run([
-                    'yt-dlp', '--dump-json', '--no-playlist', youtube_url
-                ], capture_output=True, text=True, timeout=30)
-                
-                if info_result.returncode == 0:
-                    import json
-                    video_info = json.loads(info_result.stdout)
-                    video_duration = video_info.get('duration', 0)
-                    video_title = video_info.get('title', 'Unknown')
-                    
-                    st.info(f"📹 Video: {video_title} ({video_duration}s)")
-                
-                # Get video stream URL
-                result = subprocess.run([
-                    'yt-dlp', '--get-url', '--format', 'best[ext=mp4]/best', youtube_url
-                ], capture_output=True, text=True, timeout=30)
-                
-                if result.returncode == 0:
-                    stream_url = result.stdout.strip()
-                    st.success("✅ Connected to YouTube video stream!")
-                else:
-                    st.error("Failed to get video stream. Please check the URL.")
-                    return
-                    
-            except subprocess.TimeoutExpired:
-                st.error("Timeout connecting to YouTube. Please try again.")
-                return
-            except FileNotFoundError:
-                st.error("yt-dlp not found. Please install yt-dlp: pip install yt-dlp")
-                return
-        
-        # Process video frames
-        frame_count = 0
-        processed_frames = 0
-        
-        # Create video capture from stream URL
-        cap = cv2.VideoCapture(stream_url)
-        
-        if not cap.isOpened():
-            st.error("Failed to open video stream!")
-            return
-        
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1000
-        duration = total_frames / fps if fps > 0 else 0
-        
-        st.info(f"📹 Video Info: {total_frames} frames, {fps:.1f} FPS, {duration:.1f}s duration")
-        
-        # Set a maximum processing time (5 minutes for YouTube videos)
-        max_processing_time = 300  # 5 minutes
-        start_time = time.time()
-        
-        try:
-            while (st.session_state.get('video_detection_active', False) and 
-                   cap.isOpened() and 
-                   (time.time() - start_time) < max_processing_time):
-                
-                ret, frame = cap.read()
-                
-                if not ret:
-                    # If we can't read more frames, try to continue for a bit longer
-                    # This handles cases where the stream might have temporary interruptions
-                    time.sleep(0.1)
-                    continue
-                
-                frame_count += 1
-                
-                # Process every 2nd frame for better coverage (changed from 3rd)
-                if frame_count % 2 == 0:
-                    # Perform detection
-                    annotated_frame, detections = detection_manager.process_video_frame(frame)
-                    
-                    # Store detections
-                    st.session_state.video_detections.extend(detections)
-                    
-                    # Store processed frame for video output
-                    st.session_state.processed_frames.append(annotated_frame)
-                    
-                    # Convert frame for display
-                    display_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                    st.session_state.current_frame = display_frame
+        for item in loop.run():
+            # Frames captured while paused are dropped; detection resumes on the newest one
+            job.checkpoint()
+            
+            history.add_tracks(tracker.pop_finished())
+            if recorder is not None:
+                recorder.offer(item.annotated_frame, item.detections, item.frame_index)
+            processed_frames += 1
+            job.report(processed_frames=processed_frames)
+            
+            if preview.due():
+                live_stats = loop.stats()
+                preview.offer(
+                    item.annotated_frame,
+                    stats_text=f"""
+                    **Live Detection Stats:**
+                    - Processed Frames: {processed_frames}
+                    - Unique Objects: {tracker.track_count}
+                    - Boxes Detected: {tracker.box_count}
+                    - Elapsed Time: {time.time() - start_time:.1f}s
                     
-                    # Update display
-                    frame_placeholder.image(display_frame, caption="Live YouTube Detection", use_column_width=True)
+                    {format_latency_stats(live_stats)}
                     
-                    processed_frames += 1
+                    {format_recorder_stats(recorder.stats() if recorder is not None else None)}
                     
-                    # Update progress (ensure it doesn't exceed 1.0)
-                    progress = min(frame_count / max(total_frames, 1), 1.0)
-                    progress_placeholder.progress(progress)
+                    {format_gate_stats(detector.stats() if isinstance(detector, SceneChangeGate) else None)}
                     
-                    # Update stats
-                    current_time = time.time() - st.session_state.video_start_time
-                    progress_percent = progress * 100
-                    stats_text = f"""
-                    **YouTube Detection Stats:**
-                    - Processed Frames: {processed_frames}
-                    - Total Detections: {len(st.session_state.video_detections)}
-                    - Elapsed Time: {current_time:.1f}s
-                    - Progress: {progress_percent:.1f}%
-                    - Video Duration: {duration:.1f}s
+                    {format_pipeline_stats(live_stats)}
                     """
-                    stats_placeholder.markdown(stats_text)
-                
-                # Small delay to prevent overwhelming the system
-                time.sleep(0.01)
-        
-        except Exception as e:
-            st.error(f"Error during YouTube video processing: {str(e)}")
-        
-        finally:
-            cap.release()
-            st.session_state.video_detection_active = False
-            
-            # Calculate final statistics
-            if st.session_state.video_detections:
-                stats = detection_manager.get_class_statistics([st.session_state.video_detections])
-                st.session_state.video_stats = stats
-                st.session_state.video_results = True
-                st.session_state.video_duration = time.time() - st.session_state.video_start_time
-                st.session_state.video_fps = fps  # Store the actual FPS
-        
-        # Show completion message with statistics
-        total_detections = len(st.session_state.video_detections)
-        processing_time = time.time() - st.session_state.video_start_time
-        st.success(f"✅ YouTube video detection completed! Found {total_detections} objects in {processing_time:.1f}s")
-        
-        # Clear the live detection display
-        frame_placeholder.empty()
-        progress_placeholder.empty()
-        stats_placeholder.empty()
-        
-    except Exception as e:
-        st.error(f"Error processing YouTube video: {str(e)}")
-        st.session_state.video_detection_active = False
-
-def stop_video_detection():
-    """Stop video detection process"""
-    st.session_state.video_detection_active = False
-    st.info("Detection stopped. Processing results...")
-    
-    # Calculate final statistics
-    if 'video_detections' in st.session_state and st.session_state.video_detections:
-        detection_manager = st.session_state.detection_manager
-        stats = detection_manager.get_class_statistics([st.session_state.video_detections])
-        st.session_state.video_stats = stats
+                )
+    
+    except JobCancelled:
+        pass
+    
+    finally:
+        loop.stop()
+        if recorder is not None:
+            recorder.close()
+        tracker.close()
+        history.add_tracks(tracker.pop_finished())
+        history.flush()
+        
+        job.report(
+            tracker=tracker,
+            stats=tracker.statistics() if tracker.track_count else None,
+            aggregator=tracker.aggregate(),
+            fps=fps,
+            duration=time.time() - start_time,
+            pipeline_stats=loop.stats(),
+            gate_stats=detector.stats() if isinstance(detector, SceneChangeGate) else None,
+            recorder_stats=recorder.stats() if recorder is not None else None
+        )
+
+def display_job_status(job):
+    """Render the live state of a queued, running or paused video job; returns its preview renderer"""
+    snapshot = job.snapshot()
+    partial = snapshot['partial']
+    
+    if snapshot['status'] == QUEUED:
+        manager = live_job_manager if job in live_job_manager.jobs(job.owner) else job_manager
+        manager_stats = manager.stats()
+        st.info(f"⏳ Waiting for a free slot: {manager.queue_position(job)} job(s) ahead, "
+                f"{manager_stats['running']}/{manager_stats['max_concurrent']} running.")
+        return None
+    
+    if snapshot['status'] == PAUSED:
+        st.warning("⏸️ Detection paused. Click 'Resume' to continue or 'Stop Detection' to view results.")
+    else:
+        st.info("🔴 Detection in progress... Click 'Stop Detection' to view results.")
+    
+    if snapshot['message']:
+        st.caption(snapshot['message'])
+    st.progress(snapshot['progress'])
+    
+    # Show live detection if available: the newest frame, downsized and JPEG-encoded once
+    preview = partial.get('preview')
+    shot = preview.render() if preview else None
+    if shot is not None:
+        st.image(shot.jpeg, caption="Live Detection", use_column_width=True)
+        st.markdown(shot.info['stats_text'])
+        st.caption(format_preview_stats(preview.stats()))
+    return preview
+
+def collect_video_job(job):
+    """Move a finished job's results into the session for display"""
+    snapshot = job.snapshot()
+    partial = snapshot['partial']
+    st.session_state.video_job_collected = True
+    
+    if snapshot['status'] == FAILED:
+        st.error(f"Error during video detection: {snapshot['error']}")
+    
+    for key, state_key in (('tracker', 'video_tracker'), ('video_writer', 'video_writer'),
+                           ('fps', 'video_fps'), ('duration', 'video_duration'),
+                           ('aggregator', 'video_aggregator'), ('gate_stats', 'video_gate_stats'),
+                           ('recorder_stats', 'video_recorder_stats')):
+        if key in partial:
+            st.session_state[state_key] = partial[key]
+    if 'pipeline_stats' in partial:
+        st.session_state.video_pipeline_stats = partial['pipeline_stats']
+        st.session_state.video_sampling_stats = partial['pipeline_stats']['sampling']
+    
+    if partial.get('stats'):
+        st.session_state.video_stats = partial['stats']
         st.session_state.video_results = True
-        
-        # Show completion message
-        total_detections = len(st.session_state.video_detections)
-        st.success(f"✅ Detection stopped! Found {total_detections} objects. Results displayed below.")
+        total_detections = partial['stats']['total_detections']
+        if snapshot['status'] == CANCELLED:
+            st.success(f"✅ Detection stopped! Found {total_detections} objects. Results displayed below.")
+        else:
+            st.success(f"✅ Video detection completed! Found {total_detections} objects in {snapshot['elapsed']:.1f}s")
+    elif snapshot['status'] != FAILED:
+        st.warning("No objects were detected in the analyzed frames.")
+
+def reset_frame_store():
+    """Replace the session's frame store with an empty one, deleting old frames from disk"""
+    if 'frame_store' in st.session_state:
+        st.session_state.frame_store.cleanup()
+    st.session_state.frame_store = FrameStore()
+
+def start_video_history(source):
+    """Batched writer recording this video's detections in the history store"""
+    return get_detection_store().batch(start_history_run(), 'video', source)
+
+def clear_video_outputs():
+    """Drop the previous run's results, deleting its output video"""
+    if 'video_writer' in st.session_state:
+        st.session_state.video_writer.discard()
+    for key in ('video_writer', 'video_tracker', 'video_stats', 'video_aggregator', 'video_results', 'video_fps',
+                'video_duration', 'video_pipeline_stats', 'video_sampling_stats', 'video_gate_stats',
+                'video_recorder_stats'):
+        st.session_state.pop(key, None)
 
 def reset_video_detection():
     """Reset video detection state"""
+    job = st.session_state.get('video_job')
+    if job is not None and not job.finished:
+        # Let the job release the frame store and writer before they are deleted
+        job.cancel()
+        job.wait(timeout=5)
+    if 'frame_store' in st.session_state:
+        st.session_state.frame_store.cleanup()
+    if 'video_writer' in st.session_state:
+        st.session_state.video_writer.discard()
+    
     keys_to_remove = [
-        'video_detection_active', 'video_detections', 'video_stats', 
-        'video_results', 'current_frame', 'video_start_time',
-        'video_fps', 'video_duration', 'youtube_url', 'processed_frames'
+        'video_job', 'video_job_collected', 'video_tracker', 'video_stats', 'video_aggregator',
+        'video_results', 'video_start_time',
+        'video_fps', 'video_duration', 'youtube_url', 'frame_store',
+        'video_writer', 'video_pipeline_stats', 'video_sampling_stats', 'video_gate_stats',
+        'video_source', 'live_source', 'live_replay', 'live_recording', 'video_recorder_stats'
     ]
     
     for key in keys_to_remove:
@@ -472,8 +746,96 @@ def display_video_results():
         st.metric("Frame Rate", f"{fps:.1f} FPS")
     
     with col3:
-        processed_frames = len(st.session_state.get('video_detections', []))
-        st.metric("Detections Found", processed_frames)
+        st.metric("Unique Objects", stats.get('total_detections', 0),
+                  delta=f"{stats.get('box_detections', 0)} boxes across frames")
+    
+    # Sampling policy
+    sampling_stats = st.session_state.get('video_sampling_stats')
+    if sampling_stats:
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Sampling Policy", sampling_stats['policy'].title(), delta=f"every {sampling_stats['stride']} frame(s)")
+        
+        with col2:
+            st.metric("Effective FPS", f"{sampling_stats['effective_fps']:.1f}", delta="analyzed frames/s")
+        
+        with col3:
+            st.metric("Analyzed Frames", sampling_stats['analyzed_frames'],
+                      delta=f"{sampling_stats['sampling_fps']:.1f} per footage second")
+    
+    # Scene-change gate counters
+    gate_stats = st.session_state.get('video_gate_stats')
+    if gate_stats:
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Frames Inferred", gate_stats['frames_inferred'])
+        
+        with col2:
+            st.metric("Frames Reused", gate_stats['frames_skipped'], delta=f"{gate_stats['skip_ratio']:.0%} skipped")
+        
+        with col3:
+            st.metric("Change Threshold", f"{gate_stats['threshold']:.3f}")
+    
+    # Detection-triggered recording
+    recorder_stats = st.session_state.get('video_recorder_stats')
+    if recorder_stats:
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Recorded Events", recorder_stats['events_recorded'],
+                      delta=f"{recorder_stats['events_deleted']} expired", delta_color="off")
+        
+        with col2:
+            st.metric("Frames Saved", recorder_stats['frames_recorded'],
+                      delta=f"{recorder_stats['frames_dropped']} dropped", delta_color="off")
+        
+        with col3:
+            st.metric("Recordings on Disk", f"{recorder_stats['bytes_on_disk'] / (1024 * 1024):.1f} MB")
+        
+        with col4:
+            st.metric("Write Throughput", f"{recorder_stats['write_mb_per_s']:.1f} MB/s",
+                      delta=f"{recorder_stats['write_ms_avg']:.1f} ms per frame", delta_color="off")
+        
+        st.caption(f"Recordings are saved under {recorder_stats['directory']}")
+    
+    # Pipeline performance
+    pipeline_stats = st.session_state.get('video_pipeline_stats')
+    if pipeline_stats:
+        with st.expander("⚙️ Pipeline Performance"):
+            stage_rows = []
+            for name, stage in pipeline_stats['stages'].items():
+                queue_info = pipeline_stats['queues'].get(name)
+                stage_rows.append({
+                    'Stage': name,
+                    'Frames': stage['items'],
+                    'Throughput (fps)': f"{stage['throughput_fps']:.1f}",
+                    'Capacity (fps)': f"{stage['capacity_fps']:.1f}",
+                    'Utilization': f"{stage['utilization']:.0%}",
+                    'Max Queue Depth': f"{queue_info['max_depth']}/{queue_info['capacity']}" if queue_info else "-"
+                })
+            st.table(stage_rows)
+            
+            # Live sources: glass-to-result latency and frames the detector had no time for
+            if pipeline_stats.get('latency'):
+                latency = pipeline_stats['latency']
+                capture = pipeline_stats['capture']
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Latency p50", f"{latency['p50_ms']:.0f} ms")
+                
+                with col2:
+                    st.metric("Latency p95", f"{latency['p95_ms']:.0f} ms", delta=f"max {latency['max_ms']:.0f} ms",
+                              delta_color="off")
+                
+                with col3:
+                    st.metric("Capture FPS", f"{capture['capture_fps']:.1f}")
+                
+                with col4:
+                    st.metric("Frames Dropped", capture['frames_dropped'],
+                              delta=f"of {capture['frames_captured']} captured", delta_color="off")
     
     # Detailed breakdown
     st.markdown("## 🔍 Detailed Detection Breakdown")
@@ -501,25 +863,46 @@ def display_video_results():
                         delta="Average confidence"
                     )
     
+    # Tracked objects
+    tracker = st.session_state.get('video_tracker')
+    if tracker is not None and tracker.track_count:
+        with st.expander(f"🧭 Tracked Objects ({tracker.track_count})"):
+            st.caption(f"Average time on screen: {stats.get('dwell_seconds_avg', 0):.1f}s")
+            st.dataframe([
+                {
+                    'Track': track['track_id'],
+                    'Class': track['class_name'],
+                    'Best Confidence': f"{track['best_confidence']:.1%}",
+                    'First Seen (s)': f"{track['first_seen']:.1f}",
+                    'Last Seen (s)': f"{track['last_seen']:.1f}",
+                    'Dwell (s)': f"{track['dwell_seconds']:.1f}"
+                }
+                for track in tracker.tracks()
+            ], use_container_width=True)
+    
     # Charts
     st.markdown("## 📈 Detection Visualizations")
     create_detection_charts(stats)
     
     # Sample detections
-    if 'processed_frames' in st.session_state and st.session_state.processed_frames:
+    frame_store = st.session_state.get('frame_store')
+    if frame_store is not None and len(frame_store) > 0:
         st.markdown("## 🎬 Sample Detection Frames")
         st.markdown("Here are some sample frames from your video showing the detected objects:")
         
-        # Show a few sample frames
-        sample_frames = st.session_state.processed_frames[::max(1, len(st.session_state.processed_frames)//6)]
+        st.caption(
+            f"{len(frame_store)} annotated frames stored on disk "
+            f"({frame_store.disk_bytes() / (1024 * 1024):.1f} MB), "
+            f"{frame_store.memory_bytes() / 1024:.0f} KB of thumbnails in memory"
+        )
+        
+        # Show a few sample frames from the in-memory thumbnails; nothing is read back from disk
+        sample_thumbnails = frame_store.sample_thumbnails(6)
         
-        cols = st.columns(min(len(sample_frames), 3))
-        for idx, frame in enumerate(sample_frames[:6]):  # Show max 6 frames
-            if idx < len(cols):
-                with cols[idx % 3]:
-                    # Convert BGR to RGB for display
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    st.image(frame_rgb, caption=f"Frame {idx + 1}", use_column_width=True)
+        cols = st.columns(min(len(sample_thumbnails), 3))
+        for idx, (frame_index, thumbnail) in enumerate(sample_thumbnails):
+            with cols[idx % 3]:
+                st.image(thumbnail, caption=f"Frame {frame_index + 1}", use_column_width=True)
     
     # Download options
     st.markdown("## 💾 Download Results")
@@ -546,12 +929,11 @@ def generate_video_pdf_download(stats, summary_text, duration):
 
         # Collect a few processed frames to embed
         samples = []
-        frames = st.session_state.get('processed_frames', [])
-        if frames:
-            # Convert BGR to RGB for embedding in PDF
-            step = max(1, len(frames)//6)
-            for f in frames[::step][:6]:
-                samples.append(cv2.cvtColor(f, cv2.COLOR_BGR2RGB))
+        frame_store = st.session_state.get('frame_store')
+        if frame_store is not None:
+            # RGB views for embedding in PDF
+            for f in frame_store.sample_frames(6):
+                samples.append(Frame(f, 'BGR').rgb())
 
         pdf_data = generate_pdf_report(stats, video_summary, samples=samples)
         
@@ -567,71 +949,44 @@ def generate_video_pdf_download(stats, summary_text, duration):
         st.error(f"Error generating PDF report: {str(e)}")
 
 def download_processed_video():
-    """Create and download processed video with detections"""
+    """Link to the processed video that was encoded during detection.
+    
+    The MP4 is written under app/static/ and served from disk by Streamlit's
+    static file serving, so the file is never loaded into the session.
+    """
     try:
-        if 'processed_frames' not in st.session_state or not st.session_state.processed_frames:
+        video_writer = st.session_state.get('video_writer')
+        if video_writer is None or video_writer.frames_written == 0:
             st.warning("No processed video frames available for download.")
             return
         
-        processed_frames = st.session_state.processed_frames
-        
-        if not processed_frames:
-            st.warning("No processed frames to create video.")
-            return
-        
-        # Create temporary video file
-        temp_video_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        temp_video_path.close()
-        
-        # Get video properties
-        height, width = processed_frames[0].shape[:2]
-        fps = 10  # Reduced FPS for processed video
+        # Normally already closed when detection ended; this only waits for queued frames
+        video_writer.close()
         
-        # Create video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(temp_video_path.name, fourcc, fps, (width, height))
-        
-        # Write frames to video
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for i, frame in enumerate(processed_frames):
-            out.write(frame)
-            progress = (i + 1) / len(processed_frames)
-            progress_bar.progress(progress)
-            status_text.text(f"Creating video: {i + 1}/{len(processed_frames)} frames")
-        
-        out.release()
-        progress_bar.empty()
-        status_text.empty()
-        
-        # Read the video file for download
-        with open(temp_video_path.name, 'rb') as video_file:
-            video_data = video_file.read()
-        
-        # Clean up temporary file
-        os.unlink(temp_video_path.name)
-        
-        # Provide download button
-        st.download_button(
-            label="📥 Download Processed Video",
-            data=video_data,
-            file_name="heritage_detection_video.mp4",
-            mime="video/mp4"
+        st.markdown(
+            f'<a href="{static_url(video_writer.path)}" download="heritage_detection_video.mp4">'
+            f'📥 Download Processed Video</a>',
+            unsafe_allow_html=True
         )
         
-        st.success("✅ Processed video ready for download!")
+        st.success(
+            f"✅ Processed video ready for download! "
+            f"({video_writer.frames_written} frames at {video_writer.output_fps:.1f} FPS, "
+            f"{video_writer.size_bytes() / (1024 * 1024):.1f} MB)"
+        )
         
     except Exception as e:
-        st.error(f"Error creating processed video: {str(e)}")
+        st.error(f"Error preparing processed video: {str(e)}")
 
 # Main execution code
 video_path = None
 
 if input_option == "Upload Local Video":
     video_path = handle_local_video_upload()
-else:
+elif input_option == "YouTube Link":
     video_path = handle_youtube_video()
+else:
+    video_path = handle_live_source()
 
 # Video detection controls
 if video_path:
@@ -10,6 +10,7 @@ from pathlib import Path
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from utils.detection_store import get_detection_store
 from utils.ui_utils import create_detection_charts, create_summary_text, display_metrics, generate_pdf_report
 
 # Page configuration
@@ -46,16 +47,16 @@ def show_no_data_message():
     </div>
     """, unsafe_allow_html=True)
 
-def show_combined_dashboard():
+def show_combined_dashboard(image_aggregate, video_aggregate, session_scope):
     """Show combined dashboard with both image and video data"""
     
     st.markdown("## 🔄 Combined Analysis")
     
-    # Combine statistics
-    image_stats = st.session_state.image_stats
-    video_stats = st.session_state.video_stats
+    image_stats = describe_statistics(image_aggregate, 'image', session_scope)
+    video_stats = describe_statistics(video_aggregate, 'video', session_scope)
     
-    combined_stats = combine_statistics(image_stats, video_stats)
+    # Combine statistics
+    combined_stats = combine_statistics(image_aggregate, video_aggregate, session_scope)
     
     # Overview metrics
     st.markdown("### 📈 Overview Metrics")
@@ -85,13 +86,11 @@ def show_combined_dashboard():
     # Download options
     show_download_options(combined_stats, summary_text, "Combined")
 
-def show_image_dashboard():
+def show_image_dashboard(stats):
     """Show dashboard for image detection results only"""
     
     st.markdown("## 📸 Image Detection Analysis")
     
-    stats = st.session_state.image_stats
-    
     # Overview metrics
     st.markdown("### 📈 Overview Metrics")
     display_metrics(stats)
@@ -115,13 +114,13 @@ def show_image_dashboard():
     # Download options
     show_download_options(stats, summary_text, "Image")
 
-def show_video_dashboard():
+def show_video_dashboard(stats, session_scope=True):
     """Show dashboard for video detection results only"""
     
     st.markdown("## 🎥 Video Detection Analysis")
     
-    stats = st.session_state.video_stats
-    duration = st.session_state.get('video_duration', 0)
+    # Duration and frame rate describe this session's video only
+    duration = st.session_state.get('video_duration', 0) if session_scope else 0
     
     # Overview metrics
     st.markdown("### 📈 Overview Metrics")
@@ -130,16 +129,20 @@ def show_video_dashboard():
     # Video-specific metrics
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        st.metric("Video Duration", f"{duration:.1f} seconds")
-    
-    with col2:
-        fps = st.session_state.get('video_fps', 0)
-        st.metric("Frame Rate", f"{fps:.1f} FPS")
-    
-    with col3:
-        detection_rate = len(st.session_state.get('video_detections', [])) / duration if duration > 0 else 0
-        st.metric("Detection Rate", f"{detection_rate:.2f} detections/sec")
+    if session_scope:
+        with col1:
+            st.metric("Video Duration", f"{duration:.1f} seconds")
+        
+        with col2:
+            fps = st.session_state.get('video_fps', 0)
+            st.metric("Frame Rate", f"{fps:.1f} FPS")
+        
+        with col3:
+            detection_rate = stats['total_detections'] / duration if duration > 0 else 0
+            st.metric("Detection Rate", f"{detection_rate:.2f} detections/sec")
+    else:
+        with col1:
+            st.metric("Videos Analyzed", stats.get('sources', 0))
     
     # Summary
     summary_text = create_summary_text(stats, duration)
@@ -160,53 +163,14 @@ def show_video_dashboard():
     # Download options
     show_download_options(stats, summary_text, "Video")
 
-def combine_statistics(image_stats, video_stats):
-    """Combine image and video statistics"""
-    
-    # Combine all detections
-    all_detections = []
-    if image_stats and image_stats.get('all_detections'):
-        all_detections.extend(image_stats['all_detections'])
-    if video_stats and video_stats.get('all_detections'):
-        all_detections.extend(video_stats['all_detections'])
-    
-    if not all_detections:
-        return {
-            'total_detections': 0,
-            'class_counts': {},
-            'confidence_avg': 0,
-            'class_confidence_avg': {}
-        }
-    
-    # Calculate combined statistics
-    class_counts = {}
-    class_confidences = {}
-    
-    for detection in all_detections:
-        class_name = detection['class_name']
-        confidence = detection['confidence']
-        
-        class_counts[class_name] = class_counts.get(class_name, 0) + 1
-        
-        if class_name not in class_confidences:
-            class_confidences[class_name] = []
-        class_confidences[class_name].append(confidence)
-    
-    # Calculate averages
-    total_confidence = sum(d['confidence'] for d in all_detections)
-    confidence_avg = total_confidence / len(all_detections)
-    
-    class_confidence_avg = {}
-    for class_name, confidences in class_confidences.items():
-        class_confidence_avg[class_name] = sum(confidences) / len(confidences)
-    
-    return {
-        'total_detections': len(all_detections),
-        'class_counts': class_counts,
-        'confidence_avg': confidence_avg,
-        'class_confidence_avg': class_confidence_avg,
-        'all_detections': all_detections
-    }
+def combine_statistics(image_aggregate, video_aggregate, session_scope):
+    """Combine image and video statistics by merging their aggregates"""
+    combined = image_aggregate.merged(video_aggregate)
+    if session_scope:
+        stats = combined.to_stats()
+        stats['sources'] = session_source_count('image') + session_source_count('video')
+        return stats
+    return get_detection_store().describe(combined)
 
 def display_combined_metrics(image_stats, video_stats, combined_stats):
     """Display combined metrics for image and video data"""
@@ -333,12 +297,15 @@ def show_detailed_insights(stats, data_type):
         performance_data = []
         for class_name, avg_conf in stats['class_confidence_avg'].items():
             count = stats['class_counts'].get(class_name, 0)
-            performance_data.append({
+            row = {
                 'Class': class_name,
                 'Detections': count,
                 'Avg Confidence': avg_conf,
                 'Performance Score': count * avg_conf  # Simple performance metric
-            })
+            }
+            if 'class_confidence_median' in stats:
+                row['Median Confidence'] = stats['class_confidence_median'].get(class_name)
+            performance_data.append(row)
         
         df_perf = pd.DataFrame(performance_data)
         df_perf = df_perf.sort_values('Performance Score', ascending=False)
@@ -346,20 +313,27 @@ def show_detailed_insights(stats, data_type):
         st.dataframe(df_perf, use_container_width=True)
     
     # Confidence analysis
-    if stats.get('all_detections'):
+    if 'confidence_median' in stats:
         st.markdown("#### 📈 Confidence Score Analysis")
         
-        confidences = [d['confidence'] for d in stats['all_detections']]
-        
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Highest Confidence", f"{max(confidences):.1%}")
-            st.metric("Lowest Confidence", f"{min(confidences):.1%}")
+            st.metric("Highest Confidence", f"{stats['confidence_max']:.1%}")
+            st.metric("Lowest Confidence", f"{stats['confidence_min']:.1%}")
         
         with col2:
-            st.metric("Median Confidence", f"{np.median(confidences):.1%}")
-            st.metric("Standard Deviation", f"{np.std(confidences):.3f}")
+            st.metric("Median Confidence", f"{stats['confidence_median']:.1%}")
+            st.metric("Standard Deviation", f"{stats['confidence_std']:.3f}")
+        
+        # Percentiles come from mergeable KLL sketches rather than a sort of every confidence
+        if 'confidence_percentiles' in stats:
+            percentile_cols = st.columns(len(stats['confidence_percentiles']))
+            for col, (percentile, value) in zip(percentile_cols, stats['confidence_percentiles'].items()):
+                with col:
+                    st.metric(f"P{percentile} Confidence", f"{value:.1%}")
+            st.caption(f"Percentiles are approximate: ranks are within ±{stats['quantile_rank_error']:.1%} "
+                       f"of the detection count with 99% confidence.")
 
 def show_download_options(stats, summary_text, data_type):
     """Show download options for reports"""
@@ -390,10 +364,14 @@ def show_download_options(stats, summary_text, data_type):
 
 def clear_all_data():
     """Clear all detection data"""
+    job = st.session_state.get('video_job')
+    if job is not None:
+        job.cancel()
+    
     keys_to_remove = [
-        'image_results', 'image_detections', 'image_stats',
-        'video_detections', 'video_stats', 'video_results',
-        'current_frame', 'video_detection_active'
+        'image_results', 'image_stats', 'image_aggregator',
+        'video_tracker', 'video_stats', 'video_aggregator', 'video_results',
+        'video_job', 'video_job_collected'
     ]
     
     for key in keys_to_remove:
@@ -403,18 +381,61 @@ def clear_all_data():
     st.success("All detection data cleared!")
     st.rerun()
 
+def load_aggregate(media_type, session_scope):
+    """Statistics aggregate for one media type, or None when there is nothing to show.
+    
+    This session's results are the aggregators the detection pages keep in
+    session state; only the whole history is aggregated in SQL.
+    """
+    if session_scope:
+        # A run with no detections still gets its (empty) dashboard
+        return st.session_state.get(f'{media_type}_aggregator')
+    aggregate = get_detection_store().aggregate(None, media_type)
+    return aggregate if aggregate.count else None
+
+def session_source_count(media_type):
+    """Images or videos behind this session's results"""
+    if media_type == 'image':
+        return len(st.session_state.get('image_results', []))
+    return 1 if 'video_aggregator' in st.session_state else 0
+
+def describe_statistics(aggregate, media_type, session_scope):
+    """Statistics dict for one media type"""
+    if session_scope:
+        stats = aggregate.to_stats()
+        stats['sources'] = session_source_count(media_type)
+        return stats
+    return get_detection_store().describe(aggregate, None, media_type)
+
 # Main execution code
+scope = st.radio(
+    "Show results from:",
+    ["This session", "All history"],
+    horizontal=True,
+    help="All history includes every image and video analyzed on this server"
+)
+session_scope = scope == "This session"
+
+if not session_scope:
+    # The history is shared by every session on this server, so clearing it takes a confirmation
+    confirm_clear = st.checkbox("I understand this deletes the detection history of all users")
+    if st.button("🗑️ Clear Detection History", disabled=not confirm_clear):
+        get_detection_store().clear()
+        st.success("Detection history cleared!")
+
 # Check for available data
-has_image_data = 'image_stats' in st.session_state and st.session_state.image_stats
-has_video_data = 'video_stats' in st.session_state and st.session_state.video_stats
+image_aggregate = load_aggregate('image', session_scope)
+video_aggregate = load_aggregate('video', session_scope)
+has_image_data = image_aggregate is not None
+has_video_data = video_aggregate is not None
 
 if not has_image_data and not has_video_data:
     show_no_data_message()
 else:
     # Display combined or individual results
     if has_image_data and has_video_data:
-        show_combined_dashboard()
+        show_combined_dashboard(image_aggregate, video_aggregate, session_scope)
     elif has_image_data:
-        show_image_dashboard()
+        show_image_dashboard(describe_statistics(image_aggregate, 'image', session_scope))
     elif has_video_data:
-        show_video_dashboard()
\ No newline at end of file
+        show_video_dashboard(describe_statistics(video_aggregate, 'video', session_scope), session_scope)
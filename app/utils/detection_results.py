@@ -0,0 +1,100 @@
+import numpy as np
+from collections.abc import Sequence
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class Detections(Sequence):
+    """Columnar detection results for one image or frame.
+
+    Boxes, confidences and class ids are held as NumPy arrays. Indexing or
+    iterating yields the legacy detection dicts ('bbox', 'confidence',
+    'class_id', 'class_name', 'color'), built lazily on access, so callers
+    that expect a list of dicts keep working unchanged.
+    """
+
+    def __init__(self, bboxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                 class_names: Dict[int, str], class_colors: Dict[int, Tuple[int, int, int]]):
+        self.bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.class_names = class_names
+        self.class_colors = class_colors
+
+    @classmethod
+    def empty(cls, class_names: Dict[int, str], class_colors: Dict[int, Tuple[int, int, int]]) -> 'Detections':
+        """Create a result with no detections"""
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), class_names, class_colors)
+
+    @classmethod
+    def from_boxes(cls, boxes, class_names: Dict[int, str],
+                   class_colors: Dict[int, Tuple[int, int, int]]) -> 'Detections':
+        """Build from an ultralytics Boxes object with one host transfer per tensor"""
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(class_names, class_colors)
+        return cls(
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+            class_names,
+            class_colors
+        )
+
+    @classmethod
+    def concatenate(cls, parts: Iterable['Detections'],
+                    class_names: Optional[Dict[int, str]] = None,
+                    class_colors: Optional[Dict[int, Tuple[int, int, int]]] = None) -> 'Detections':
+        """Join several results into one"""
+        parts = list(parts)
+        if class_names is None:
+            class_names = parts[0].class_names if parts else {}
+        if class_colors is None:
+            class_colors = parts[0].class_colors if parts else {}
+        if not parts:
+            return cls.empty(class_names, class_colors)
+        return cls(
+            np.concatenate([p.bboxes for p in parts]),
+            np.concatenate([p.confidences for p in parts]),
+            np.concatenate([p.class_ids for p in parts]),
+            class_names,
+            class_colors
+        )
+
+    def _detection_dict(self, i: int) -> Dict:
+        """Build the legacy dict view for row i"""
+        cls = int(self.class_ids[i])
+        return {
+            'bbox': self.bboxes[i].tolist(),
+            'confidence': float(self.confidences[i]),
+            'class_id': cls,
+            'class_name': self.class_names.get(cls, f"Class {cls}"),
+            'color': self.class_colors.get(cls, (255, 255, 255))
+        }
+
+    def __len__(self) -> int:
+        return len(self.class_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Detections(self.bboxes[index], self.confidences[index], self.class_ids[index],
+                              self.class_names, self.class_colors)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("detection index out of range")
+        return self._detection_dict(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._detection_dict(i)
+
+    def __repr__(self) -> str:
+        return f"Detections(n={len(self)})"
+
+    def to_dicts(self):
+        """Materialize every detection as a dict"""
+        return list(self)
+
+    def scaled(self, factor: float) -> 'Detections':
+        """Copy with boxes scaled, e.g. to map between working and full resolution"""
+        return Detections(self.bboxes * factor, self.confidences, self.class_ids,
+                          self.class_names, self.class_colors)
@@ -0,0 +1,305 @@
+import math
+import random
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+HISTOGRAM_BINS = 20
+SKETCH_K = 200
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Values enter level 0; when a level fills up it is sorted and every
+    other item (random offset) is promoted to the next level with twice
+    the weight. Level capacities shrink geometrically (factor 2/3) below
+    the top, so the sketch holds O(k) values however many it has seen.
+    With k=200 a reported quantile's rank is within about 1.65% of n of
+    the true rank with 99% probability; merging sketches keeps the bound.
+    """
+
+    def __init__(self, k: int = SKETCH_K):
+        self.k = k
+        self.n = 0
+        self.levels: List[List[float]] = [[]]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def add(self, value: float):
+        self.levels[0].append(float(value))
+        self.n += 1
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def add_array(self, values: np.ndarray):
+        """Fold in many values at once"""
+        self.levels[0].extend(np.asarray(values, dtype=np.float64).tolist())
+        self.n += len(values)
+        self._compress()
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h, items in enumerate(self.levels):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # An odd item out stays at this level
+                    keep = [items.pop()] if len(items) % 2 else []
+                    self.levels[h + 1].extend(items[random.getrandbits(1)::2])
+                    self.levels[h] = keep
+                    break
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Combine another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def copy(self) -> 'KLLSketch':
+        sketch = KLLSketch(self.k)
+        sketch.n = self.n
+        sketch.levels = [list(items) for items in self.levels]
+        return sketch
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Approximate values at the given ranks (0..1)"""
+        items = sorted((value, 1 << h) for h, values in enumerate(self.levels) for value in values)
+        if not items:
+            return [0.0 for _ in qs]
+        values = np.array([value for value, _ in items])
+        cumulative = np.cumsum([weight for _, weight in items])
+        total = cumulative[-1]
+        indices = [min(int(np.searchsorted(cumulative, q * total)), len(values) - 1) for q in qs]
+        return [float(values[i]) for i in indices]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    @property
+    def rank_error(self) -> float:
+        """Normalized rank error at 99% confidence (about 3.3/k, i.e. 1.65% for k=200)"""
+        return 3.3 / self.k
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'n': self.n, 'levels': self.levels}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'KLLSketch':
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.levels = [list(items) for items in state['levels']] or [[]]
+        return sketch
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of a stream of values.
+
+    Values are folded in with Welford's update and whole groups are merged
+    with Chan et al.'s parallel formula, so nothing is retained per value.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 minimum: float = math.inf, maximum: float = -math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_array(self, values: np.ndarray):
+        """Fold in many values at once"""
+        if len(values):
+            values = np.asarray(values, dtype=np.float64)
+            mean = float(values.mean())
+            self.merge(RunningStats(len(values), mean, float(((values - mean) ** 2).sum()),
+                                    float(values.min()), float(values.max())))
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with another stream in place"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self) -> 'RunningStats':
+        return RunningStats(self.count, self.mean, self.m2, self.min, self.max)
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        """Population variance (as np.var)"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+
+class StatisticsAggregator:
+    """Streaming detection statistics that can be merged.
+
+    Tracks the detection count, confidence mean/variance/min/max overall and
+    per class, a fixed-bin confidence histogram and a KLL quantile sketch
+    per class (merged for the overall quantiles). Updating costs O(1)
+    amortized per detection and memory is bounded by the number of classes,
+    and the statistics of two sources (e.g. images and video) are the merge
+    of their aggregators instead of a rescan of both.
+    """
+
+    def __init__(self, bins: int = HISTOGRAM_BINS):
+        self.bins = bins
+        self.overall = RunningStats()
+        self.per_class: Dict[str, RunningStats] = {}
+        self.sketches: Dict[str, KLLSketch] = {}
+        self.histogram = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return self.overall.count
+
+    def add(self, class_name: str, confidence: float):
+        """Fold in a single detection"""
+        self.overall.add(confidence)
+        self.per_class.setdefault(class_name, RunningStats()).add(confidence)
+        self.sketches.setdefault(class_name, KLLSketch()).add(confidence)
+        self.histogram[min(max(int(confidence * self.bins), 0), self.bins - 1)] += 1
+
+    def update(self, detections) -> 'StatisticsAggregator':
+        """Fold in one image's or frame's detections (a Detections result or a list of dicts)"""
+        if hasattr(detections, 'confidences'):
+            # Columnar results are folded in per class with array operations
+            confidences = detections.confidences
+            self.overall.add_array(confidences)
+            for class_id in np.unique(detections.class_ids):
+                name = detections.class_names.get(int(class_id), f"Class {int(class_id)}")
+                in_class = confidences[detections.class_ids == class_id]
+                self.per_class.setdefault(name, RunningStats()).add_array(in_class)
+                self.sketches.setdefault(name, KLLSketch()).add_array(in_class)
+            self.histogram += np.histogram(confidences, bins=self.bins, range=(0.0, 1.0))[0]
+        else:
+            for detection in detections:
+                self.add(detection['class_name'], detection['confidence'])
+        return self
+
+    def merge(self, other: 'StatisticsAggregator') -> 'StatisticsAggregator':
+        """Combine another aggregator into this one"""
+        if other.bins != self.bins:
+            raise ValueError(f"Cannot merge histograms with {other.bins} and {self.bins} bins")
+        self.overall.merge(other.overall)
+        for name, stats in other.per_class.items():
+            self.per_class.setdefault(name, RunningStats()).merge(stats)
+        for name, sketch in other.sketches.items():
+            self.sketches.setdefault(name, KLLSketch(sketch.k)).merge(sketch)
+        self.histogram += other.histogram
+        return self
+
+    def merged(self, other: 'StatisticsAggregator') -> 'StatisticsAggregator':
+        """New aggregator covering both, leaving the inputs unchanged"""
+        return self.copy().merge(other)
+
+    def copy(self) -> 'StatisticsAggregator':
+        aggregator = StatisticsAggregator(self.bins)
+        aggregator.overall = self.overall.copy()
+        aggregator.per_class = {name: stats.copy() for name, stats in self.per_class.items()}
+        aggregator.sketches = {name: sketch.copy() for name, sketch in self.sketches.items()}
+        aggregator.histogram = self.histogram.copy()
+        return aggregator
+
+    @classmethod
+    def from_class_moments(cls, rows: Iterable, histogram: Optional[List[int]] = None,
+                           sketches: Optional[Dict[str, KLLSketch]] = None,
+                           bins: int = HISTOGRAM_BINS) -> 'StatisticsAggregator':
+        """Build from (class name, count, mean, m2, min, max) rows, e.g. stored per run and class.
+
+        Rows of the same class are merged with Chan's formula, so the
+        variance never comes from the cancellation-prone mean of squares.
+        """
+        aggregator = cls(bins)
+        aggregator.sketches = dict(sketches or {})
+        for name, count, mean, m2, minimum, maximum in rows:
+            stats = RunningStats(count, mean, m2, minimum, maximum)
+            aggregator.per_class.setdefault(name, RunningStats()).merge(stats)
+            aggregator.overall.merge(stats)
+        if histogram is not None:
+            aggregator.histogram = np.asarray(histogram, dtype=np.int64)
+        return aggregator
+
+    def has_quantiles(self) -> bool:
+        """Whether the sketches cover every detection counted"""
+        return sum(sketch.n for sketch in self.sketches.values()) == self.count
+
+    def quantile_sketch(self) -> KLLSketch:
+        """Sketch of all confidences, merged from the per-class sketches"""
+        overall = KLLSketch()
+        for sketch in self.sketches.values():
+            overall.merge(sketch)
+        return overall
+
+    def to_stats(self) -> Dict:
+        """Statistics dict in the shape returned by DetectionManager.get_class_statistics"""
+        if not self.count:
+            return {
+                'total_detections': 0,
+                'class_counts': {},
+                'confidence_avg': 0,
+                'class_confidence_avg': {}
+            }
+        stats = {
+            'total_detections': self.count,
+            'class_counts': {name: running.count for name, running in self.per_class.items()},
+            'confidence_avg': self.overall.mean,
+            'class_confidence_avg': {name: running.mean for name, running in self.per_class.items()},
+            'confidence_min': self.overall.min,
+            'confidence_max': self.overall.max,
+            'confidence_std': self.overall.std,
+            'confidence_histogram': {
+                'edges': [i / self.bins for i in range(self.bins + 1)],
+                'counts': self.histogram.tolist()
+            }
+        }
+        if self.has_quantiles():
+            overall = self.quantile_sketch()
+            values = overall.quantiles([p / 100 for p in PERCENTILES])
+            stats['confidence_percentiles'] = dict(zip(PERCENTILES, values))
+            stats['confidence_median'] = stats['confidence_percentiles'][50]
+            stats['class_confidence_median'] = {name: sketch.quantile(0.5) for name, sketch in self.sketches.items()}
+            stats['quantile_rank_error'] = overall.rank_error
+        return stats
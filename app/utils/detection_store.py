@@ -0,0 +1,249 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.detection_stats import HISTOGRAM_BINS, KLLSketch, RunningStats, StatisticsAggregator
+
+DEFAULT_DB_PATH = Path(__file__).parent.parent / ".detection_history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    frame_index INTEGER NOT NULL DEFAULT 0,
+    timestamp REAL NOT NULL DEFAULT 0,
+    recorded_at REAL NOT NULL,
+    class_id INTEGER NOT NULL,
+    class_name TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    x1 REAL NOT NULL,
+    y1 REAL NOT NULL,
+    x2 REAL NOT NULL,
+    y2 REAL NOT NULL,
+    track_id INTEGER,
+    dwell_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_detections_class ON detections (class_name);
+CREATE INDEX IF NOT EXISTS idx_detections_source ON detections (source, frame_index);
+CREATE INDEX IF NOT EXISTS idx_detections_run ON detections (run_id);
+CREATE TABLE IF NOT EXISTS confidence_sketches (
+    run_id TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (run_id, class_name)
+);
+CREATE TABLE IF NOT EXISTS class_moments (
+    run_id TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    class_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    min_confidence REAL NOT NULL,
+    max_confidence REAL NOT NULL,
+    PRIMARY KEY (run_id, class_name)
+);
+"""
+
+INSERT_SQL = """
+INSERT INTO detections (run_id, media_type, source, frame_index, timestamp, recorded_at,
+                        class_id, class_name, confidence, x1, y1, x2, y2, track_id, dwell_seconds)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def detection_rows(run_id: str, media_type: str, source: str, detections,
+                   frame_index: int = 0, timestamp: float = 0.0) -> List[Tuple]:
+    """Insert-ready rows for one image's or frame's detections"""
+    now = time.time()
+    rows = []
+    for detection in detections:
+        x1, y1, x2, y2 = detection['bbox']
+        rows.append((run_id, media_type, source, frame_index, timestamp, now,
+                     detection['class_id'], detection['class_name'], detection['confidence'],
+                     x1, y1, x2, y2, None, 0.0))
+    return rows
+
+
+def track_rows(run_id: str, media_type: str, source: str, tracks: List[Dict]) -> List[Tuple]:
+    """One row per tracked object, at the frame where it was seen with the best confidence"""
+    now = time.time()
+    rows = []
+    for track in tracks:
+        x1, y1, x2, y2 = track['bbox']
+        rows.append((run_id, media_type, source, track['best_frame_index'], track['first_seen'], now,
+                     track['class_id'], track['class_name'], track['best_confidence'],
+                     x1, y1, x2, y2, track['track_id'], track['dwell_seconds']))
+    return rows
+
+
+class DetectionStore:
+    """Embedded SQLite history of every detection, shared by all sessions.
+
+    One row per detection with its source, frame index, video timestamp,
+    class, confidence and box (for tracked video, one row per track with
+    its best sighting and dwell time), tagged with the analysis run (one image
+    upload or one video) that produced it. The database runs in WAL mode
+    so the dashboard can read while a page is writing. Aggregates are
+    computed in SQL, scoped to a set of runs or to the whole history
+    (run_ids=None) and optionally to one media type. Each run also keeps a
+    KLL confidence sketch and the running moments (count, mean, m2, min,
+    max) per class, updated as rows are inserted, so percentiles and
+    spread come from merging a few small summaries instead of scanning
+    every row.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DEFAULT_DB_PATH
+        self._lock = threading.Lock()
+        # Streamlit runs each session on its own thread; access is serialized by _lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def insert_rows(self, rows: List[Tuple]):
+        """Insert many rows in a single transaction"""
+        if not rows:
+            return
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[(row[0], row[1], row[7], row[6])].append(row[8])
+        with self._lock, self._conn:
+            self._conn.executemany(INSERT_SQL, rows)
+            for (run_id, media_type, class_name, class_id), confidences in grouped.items():
+                self._update_sketch(run_id, media_type, class_name, confidences)
+                self._update_moments(run_id, media_type, class_name, class_id, confidences)
+
+    def _update_sketch(self, run_id: str, media_type: str, class_name: str, confidences: List[float]):
+        found = self._conn.execute("SELECT sketch FROM confidence_sketches WHERE run_id = ? AND class_name = ?",
+                                   (run_id, class_name)).fetchone()
+        sketch = KLLSketch.from_dict(json.loads(found[0])) if found else KLLSketch()
+        sketch.add_array(confidences)
+        self._conn.execute("INSERT OR REPLACE INTO confidence_sketches VALUES (?, ?, ?, ?)",
+                           (run_id, media_type, class_name, json.dumps(sketch.to_dict())))
+
+    def _update_moments(self, run_id: str, media_type: str, class_name: str, class_id: int,
+                        confidences: List[float]):
+        found = self._conn.execute("SELECT count, mean, m2, min_confidence, max_confidence FROM class_moments "
+                                   "WHERE run_id = ? AND class_name = ?", (run_id, class_name)).fetchone()
+        stats = RunningStats(*found) if found else RunningStats()
+        stats.add_array(np.asarray(confidences))
+        self._conn.execute("INSERT OR REPLACE INTO class_moments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (run_id, media_type, class_name, class_id, stats.count, stats.mean, stats.m2,
+                            stats.min, stats.max))
+
+    def batch(self, run_id: str, media_type: str, source: str, batch_size: int = 500) -> 'DetectionBatch':
+        """Buffered writer for a stream of frames from one source"""
+        return DetectionBatch(self, run_id, media_type, source, batch_size)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _scope(run_ids: Optional[List[str]], media_type: Optional[str]) -> Tuple[str, Tuple]:
+        clauses, params = [], []
+        if run_ids is not None:
+            clauses.append(f"run_id IN ({', '.join('?' * len(run_ids))})" if run_ids else "0")
+            params.extend(run_ids)
+        if media_type is not None:
+            clauses.append("media_type = ?")
+            params.append(media_type)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", tuple(params)
+
+    def aggregate(self, run_ids: Optional[List[str]] = None, media_type: Optional[str] = None) -> StatisticsAggregator:
+        """Mergeable statistics for the selected rows, merged from the stored per-run class moments"""
+        where, params = self._scope(run_ids, media_type)
+        rows = self._query(
+            "SELECT class_name, count, mean, m2, min_confidence, max_confidence FROM class_moments" + where +
+            " ORDER BY class_id", params)
+        histogram = self.confidence_histogram(run_ids, media_type)['counts'] if rows else None
+        return StatisticsAggregator.from_class_moments(rows, histogram, self.sketches(run_ids, media_type))
+
+    def sketches(self, run_ids: Optional[List[str]] = None, media_type: Optional[str] = None) -> Dict[str, KLLSketch]:
+        """Per-class confidence sketches of the selected runs, merged"""
+        where, params = self._scope(run_ids, media_type)
+        merged: Dict[str, KLLSketch] = {}
+        for class_name, state in self._query("SELECT class_name, sketch FROM confidence_sketches" + where, params):
+            sketch = KLLSketch.from_dict(json.loads(state))
+            if class_name in merged:
+                merged[class_name].merge(sketch)
+            else:
+                merged[class_name] = sketch
+        return merged
+
+    def describe(self, aggregator: StatisticsAggregator, run_ids: Optional[List[str]] = None,
+                 media_type: Optional[str] = None) -> Dict:
+        """Statistics dict of an aggregate plus the distinct source count"""
+        stats = aggregator.to_stats()
+        if stats['total_detections']:
+            where, params = self._scope(run_ids, media_type)
+            stats['sources'] = self._query("SELECT COUNT(DISTINCT source) FROM detections" + where, params)[0][0]
+        return stats
+
+    def confidence_histogram(self, run_ids: Optional[List[str]] = None, media_type: Optional[str] = None,
+                             bins: int = HISTOGRAM_BINS) -> Dict[str, List]:
+        """Counts of confidences in equal-width bins over 0..1"""
+        where, params = self._scope(run_ids, media_type)
+        counts = [0] * bins
+        rows = self._query(
+            f"SELECT MIN(CAST(confidence * {bins} AS INTEGER), {bins - 1}), COUNT(*) FROM detections"
+            + where + " GROUP BY 1", params)
+        for index, count in rows:
+            counts[index] += count
+        return {'edges': [i / bins for i in range(bins + 1)], 'counts': counts}
+
+    def clear(self, run_ids: Optional[List[str]] = None, media_type: Optional[str] = None):
+        """Delete the rows of some runs (optionally of one media type), or the whole history"""
+        where, params = self._scope(run_ids, media_type)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM detections" + where, params)
+            self._conn.execute("DELETE FROM confidence_sketches" + where, params)
+            self._conn.execute("DELETE FROM class_moments" + where, params)
+
+
+class DetectionBatch:
+    """Accumulates summaries of finished tracks and inserts them in batches"""
+
+    def __init__(self, store: DetectionStore, run_id: str, media_type: str, source: str,
+                 batch_size: int = 500):
+        self.store = store
+        self.run_id = run_id
+        self.media_type = media_type
+        self.source = source
+        self.batch_size = batch_size
+        self._rows: List[Tuple] = []
+
+    def add_tracks(self, tracks: List[Dict]):
+        """Queue summaries of finished tracks (see IoUTracker.pop_finished)"""
+        self._rows.extend(track_rows(self.run_id, self.media_type, self.source, tracks))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self._rows = self._rows, []
+        self.store.insert_rows(rows)
+
+
+_store: Optional[DetectionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_detection_store() -> DetectionStore:
+    """Process-wide store, opened on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DetectionStore()
+        return _store
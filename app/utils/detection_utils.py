@@ -1,16 +1,49 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from PIL import Image
 import torch
 from typing import List, Dict, Tuple, Optional
+import logging
 import os
+import sys
 from pathlib import Path
 
+from utils.detection_results import Detections
+from utils.detection_stats import StatisticsAggregator
+from utils.inference_backends import default_backend, resolve_model_path
+from utils.quantization import backend_for_precision, default_calibration_dir, default_precision
+from utils.model_registry import model_registry
+from utils.result_cache import detection_cache, model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+def report_error(message: str):
+    """Log an error and, when running inside the Streamlit app, also show it in the UI.
+    
+    Streamlit is never imported here, so the detection core works headless.
+    """
+    logger.error(message)
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        try:
+            st.error(message)
+        except Exception:
+            pass
+
 class DetectionManager:
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, precision: Optional[str] = None,
+                 calibration_dir: Optional[str] = None):
         self.model_path = str(Path(__file__).parent.parent / "best.pt")
-        self.model = None
+        # 'torch', 'onnx' or 'openvino'; defaults to $HERITAGELENS_BACKEND
+        self.backend = backend or default_backend()
+        # 'fp32', 'fp16', 'int8-dynamic' or 'int8-static'; defaults to $HERITAGELENS_PRECISION
+        self.precision = precision or default_precision()
+        # Images used to calibrate 'int8-static'; defaults to $HERITAGELENS_CALIBRATION_DIR
+        self.calibration_dir = calibration_dir or default_calibration_dir()
+        # File actually loaded for inference (best.pt or its exported copy)
+        self.inference_path = self.model_path
+        # Fingerprint of the best.pt that inference_path was exported from
+        self._weights_fingerprint = None
         self.class_names = {
             0: "Stones / Stone Pillars / Stone Structures",
             1: "Crops / Farmland", 
@@ -23,61 +56,199 @@ class DetectionManager:
             2: (105, 105, 105),  # Dim gray for non-archaeological
             3: (184, 134, 11)    # Dark goldenrod for heritage sites
         }
+        # Inference parameters; they are part of the result cache key
+        self.conf_threshold = 0.25
+        self.imgsz = 640
+        # Persistent result cache; set to None to always run the model
+        self.cache = detection_cache
         self.load_model()
     
+    @property
+    def model(self):
+        """Shared YOLOv11 model from the process-wide registry (None if unavailable)"""
+        self._refresh_export()
+        try:
+            return model_registry.get_model(self.inference_path, task='detect')
+        except Exception:
+            return None
+    
     def load_model(self):
-        """Load the YOLOv11 model"""
+        """Load the YOLOv11 model into the shared registry, exporting it for the backend if needed"""
         try:
             if os.path.exists(self.model_path):
-                self.model = YOLO(self.model_path)
+                try:
+                    self.backend = backend_for_precision(self.backend, self.precision)
+                    self._weights_fingerprint = model_fingerprint(self.model_path)
+                    self.inference_path = resolve_model_path(self.model_path, self.backend, self.imgsz,
+                                                             self.precision, self.calibration_dir)
+                except Exception as e:
+                    report_error(f"Could not prepare the {self.backend} backend at {self.precision} "
+                                 f"({str(e)}); using PyTorch FP32 instead")
+                    self.backend = 'torch'
+                    self.precision = 'fp32'
+                    self.inference_path = self.model_path
+                model_registry.get_entry(self.inference_path, task='detect')
                 return True
             else:
-                st.error(f"Model file not found at {self.model_path}")
+                report_error(f"Model file not found at {self.model_path}")
                 return False
         except Exception as e:
-            st.error(f"Error loading model: {str(e)}")
+            report_error(f"Error loading model: {str(e)}")
             return False
     
-    def detect_objects(self, image: np.ndarray) -> List[Dict]:
-        """Detect objects in a single image"""
+    def _refresh_export(self):
+        """Re-resolve the exported model once best.pt has changed.
+        
+        The registry reloads best.pt itself when its mtime changes, but an
+        exported backend is a separate file: the first manager to see new
+        weights builds a new export and purges the old one, so every manager
+        must switch to the new path rather than keep pointing at a deleted file.
+        """
+        if self.inference_path == self.model_path:
+            return
+        try:
+            fingerprint = model_fingerprint(self.model_path)
+        except OSError:
+            return
+        if fingerprint != self._weights_fingerprint:
+            self.load_model()
+    
+    def detect_objects(self, image: np.ndarray, use_cache: bool = False) -> Detections:
+        """Detect objects in a single image.
+        
+        use_cache looks the image up in (and adds it to) the persistent result
+        cache. Only whole images that may be analyzed again (uploads, batch
+        runs) should use it; video frames and tiles never repeat and would
+        only pay for hashing and evict useful entries.
+        """
         if self.model is None:
-            return []
+            return self._empty_detections()
+        
+        key = self._cache_key(image) if use_cache else None
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached
         
         try:
-            results = self.model(image)
-            detections = []
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for i in range(len(boxes)):
-                        box = boxes.xyxy[i].cpu().numpy()
-                        conf = boxes.conf[i].cpu().numpy()
-                        cls = int(boxes.cls[i].cpu().numpy())
-                        
-                        detection = {
-                            'bbox': box.tolist(),
-                            'confidence': float(conf),
-                            'class_id': cls,
-                            'class_name': self.class_names.get(cls, f"Class {cls}"),
-                            'color': self.class_colors.get(cls, (255, 255, 255))
-                        }
-                        detections.append(detection)
-            
-            return detections
+            results = self._predict(image)
+            detections = Detections.concatenate(
+                [self._extract_detections(result) for result in results],
+                self.class_names, self.class_colors
+            )
         except Exception as e:
-            st.error(f"Error during detection: {str(e)}")
-            return []
+            report_error(f"Error during detection: {str(e)}")
+            return self._empty_detections()
+        
+        self._cache_store(key, detections)
+        return detections
     
-    def draw_detections(self, image: np.ndarray, detections: List[Dict]) -> np.ndarray:
-        """Draw bounding boxes and labels on image"""
-        annotated_image = image.copy()
+    def detect_batch(self, images: List[np.ndarray], batch_size: int = 8,
+                     use_cache: bool = False) -> List[Detections]:
+        """Detect objects in a list of images, one forward pass per batch.
+        
+        Each batch is letterboxed by the model's predictor into a single
+        input tensor; boxes are scaled back to every image's own resolution.
+        With use_cache, cached images are skipped, so batches only hold cache
+        misses.
+        Returns one Detections result per input image, in input order.
+        """
+        if self.model is None:
+            return [self._empty_detections() for _ in images]
+        
+        batch_size = max(1, int(batch_size))
+        all_detections: List[Optional[Detections]] = []
+        keys = []
+        for image in images:
+            key = self._cache_key(image) if use_cache else None
+            keys.append(key)
+            all_detections.append(self._cache_lookup(key))
+        
+        pending = [i for i, detections in enumerate(all_detections) if detections is None]
+        for start in range(0, len(pending), batch_size):
+            indices = pending[start:start + batch_size]
+            batch = [images[i] for i in indices]
+            try:
+                results = self._predict(batch)
+                for i, result in zip(indices, results):
+                    all_detections[i] = self._extract_detections(result)
+                    self._cache_store(keys[i], all_detections[i])
+            except Exception as e:
+                report_error(f"Error during batch detection: {str(e)}")
+                for i in indices:
+                    all_detections[i] = self._empty_detections()
+        
+        return all_detections
+    
+    def _predict(self, source):
+        """Run the shared model, serializing calls that use the same weights"""
+        entry = model_registry.get_entry(self.inference_path, task='detect')
+        with entry.lock:
+            return entry.model(source, conf=self.conf_threshold, imgsz=self.imgsz)
+    
+    def _cache_key(self, image: np.ndarray) -> Optional[str]:
+        """Result cache key for an image, or None when caching is off"""
+        if self.cache is None:
+            return None
+        try:
+            fingerprint = model_fingerprint(self.model_path)
+        except OSError:
+            return None
+        params = {
+            'conf': self.conf_threshold,
+            'imgsz': self.imgsz,
+            'backend': self.backend,
+            'precision': self.precision
+        }
+        return self.cache.make_key(image, fingerprint, params)
+    
+    def _cache_lookup(self, key: Optional[str]) -> Optional[Detections]:
+        """Cached detections for a key, or None on a miss"""
+        if key is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        return Detections(*cached, self.class_names, self.class_colors)
+    
+    def _cache_store(self, key: Optional[str], detections: Detections):
+        if key is None:
+            return
+        try:
+            self.cache.put(key, detections.bboxes, detections.confidences, detections.class_ids)
+        except OSError as e:
+            logger.warning(f"Could not write detection cache: {e}")
+    
+    def _extract_detections(self, result) -> Detections:
+        """Convert one ultralytics result into columnar detections"""
+        return Detections.from_boxes(result.boxes, self.class_names, self.class_colors)
+    
+    def _empty_detections(self) -> Detections:
+        """Detections object with no boxes"""
+        return Detections.empty(self.class_names, self.class_colors)
+    
+    def draw_detections(self, image: np.ndarray, detections: List[Dict], inplace: bool = False,
+                        channel_order: str = 'BGR') -> np.ndarray:
+        """Draw bounding boxes and labels on image.
+        
+        With inplace=True the image itself is drawn on (it must be a writable,
+        contiguous array) instead of a copy. channel_order says whether the
+        image is 'BGR' or 'RGB', so class colors come out right without
+        converting the pixels.
+        """
+        if inplace:
+            if not (image.flags.c_contiguous and image.flags.writeable):
+                raise ValueError("In-place drawing needs a writable, contiguous image")
+            annotated_image = image
+        else:
+            annotated_image = image.copy()
         
         for detection in detections:
             bbox = detection['bbox']
             conf = detection['confidence']
             class_name = detection['class_name']
             color = detection['color']
+            if channel_order == 'RGB':
+                color = color[::-1]
             
             # Draw bounding box
             x1, y1, x2, y2 = map(int, bbox)
@@ -106,52 +277,16 @@ class DetectionManager:
                 crops.append(crop)
         return crops
     
-    def process_video_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+    def process_video_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, Detections]:
         """Process a single video frame"""
         detections = self.detect_objects(frame)
         annotated_frame = self.draw_detections(frame, detections)
         return annotated_frame, detections
     
-    def get_class_statistics(self, detections_list: List[List[Dict]]) -> Dict:
+    @staticmethod
+    def get_class_statistics(detections_list: List[List[Dict]]) -> Dict:
         """Calculate statistics from multiple detection results"""
-        all_detections = []
+        aggregator = StatisticsAggregator()
         for detections in detections_list:
-            all_detections.extend(detections)
-        
-        if not all_detections:
-            return {
-                'total_detections': 0,
-                'class_counts': {},
-                'confidence_avg': 0,
-                'class_confidence_avg': {}
-            }
-        
-        # Count detections per class
-        class_counts = {}
-        class_confidences = {}
-        
-        for detection in all_detections:
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            
-            class_counts[class_name] = class_counts.get(class_name, 0) + 1
-            
-            if class_name not in class_confidences:
-                class_confidences[class_name] = []
-            class_confidences[class_name].append(confidence)
-        
-        # Calculate averages
-        total_confidence = sum(d['confidence'] for d in all_detections)
-        confidence_avg = total_confidence / len(all_detections) if all_detections else 0
-        
-        class_confidence_avg = {}
-        for class_name, confidences in class_confidences.items():
-            class_confidence_avg[class_name] = sum(confidences) / len(confidences)
-        
-        return {
-            'total_detections': len(all_detections),
-            'class_counts': class_counts,
-            'confidence_avg': confidence_avg,
-            'class_confidence_avg': class_confidence_avg,
-            'all_detections': all_detections
-        }
+            aggregator.update(detections)
+        return aggregator.to_stats()
@@ -0,0 +1,95 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+CHANNEL_ORDERS = ('BGR', 'RGB', 'GRAY')
+
+
+class Frame:
+    """Image pixels tagged with their channel order.
+
+    OpenCV and the model expect BGR while PIL, Streamlit and reportlab work
+    in RGB. Instead of converting with cv2.cvtColor at every step, a Frame
+    keeps the pixels in whatever order they were decoded in and hands out
+    channel-reversed views (no copy) when another order is asked for.
+    Pixels are only materialized where a library needs a contiguous buffer,
+    e.g. OpenCV drawing or encoding.
+    """
+
+    def __init__(self, pixels: np.ndarray, order: str = 'BGR'):
+        if order not in CHANNEL_ORDERS:
+            raise ValueError(f"Unknown channel order '{order}', expected one of {CHANNEL_ORDERS}")
+        if pixels.ndim == 2 and order != 'GRAY':
+            raise ValueError("2-D pixel arrays must use the 'GRAY' channel order")
+        self.pixels = pixels
+        self.order = order
+
+    @classmethod
+    def from_pil(cls, image: Image.Image) -> 'Frame':
+        """Wrap a PIL image without a color conversion (palette/alpha images become RGB)"""
+        if image.mode == 'L':
+            return cls(np.asarray(image), 'GRAY')
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return cls(np.asarray(image), 'RGB')
+
+    @property
+    def shape(self):
+        return self.pixels.shape
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.pixels.nbytes
+
+    def view(self, order: str) -> np.ndarray:
+        """Pixels in the requested order; a view unless gray must be expanded to color"""
+        if order == self.order:
+            return self.pixels
+        if self.order == 'GRAY':
+            code = cv2.COLOR_GRAY2BGR if order == 'BGR' else cv2.COLOR_GRAY2RGB
+            return cv2.cvtColor(self.pixels, code)
+        if order == 'GRAY':
+            code = cv2.COLOR_BGR2GRAY if self.order == 'BGR' else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(self.pixels, code)
+        # BGR <-> RGB is a reversed view of the channel axis
+        return self.pixels[..., ::-1]
+
+    def bgr(self) -> np.ndarray:
+        return self.view('BGR')
+
+    def rgb(self) -> np.ndarray:
+        return self.view('RGB')
+
+    def contiguous(self, order: Optional[str] = None) -> np.ndarray:
+        """Pixels in a C-contiguous buffer, copying only when the view is not one"""
+        return np.ascontiguousarray(self.view(order or self.order))
+
+    def copy(self) -> 'Frame':
+        return Frame(self.pixels.copy(), self.order)
+
+    def annotated(self, detection_manager, detections, inplace: bool = False) -> 'Frame':
+        """Draw detections in this frame's own channel order.
+
+        With inplace=True the pixels are drawn on directly (they must be a
+        writable contiguous array); otherwise a single copy is made.
+        """
+        frame = self if inplace else self.copy()
+        if frame.order == 'GRAY':
+            frame = Frame(frame.view('BGR'), 'BGR')
+        detection_manager.draw_detections(frame.pixels, detections, inplace=True, channel_order=frame.order)
+        return frame
+
+    def crop(self, bbox) -> 'Frame':
+        """Region of the frame as a view"""
+        x1, y1, x2, y2 = map(int, bbox)
+        return Frame(self.pixels[max(0, y1):y2, max(0, x1):x2], self.order)
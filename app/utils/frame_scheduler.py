@@ -0,0 +1,149 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+# Sampling policies, from densest to sparsest, with their stride multipliers
+POLICY_MULTIPLIERS = {
+    'dense': 0.5,
+    'balanced': 1.0,
+    'sparse': 3.0
+}
+
+
+def frame_signature(frame: np.ndarray, size: tuple = (32, 18)) -> np.ndarray:
+    """Tiny grayscale thumbnail used to compare frames cheaply"""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def scene_change_score(previous: Optional[np.ndarray], current: np.ndarray) -> float:
+    """Mean absolute difference between two signatures, scaled to 0..1"""
+    if previous is None:
+        return 1.0
+    return float(np.mean(np.abs(current - previous)) / 255.0)
+
+
+def detection_summary(detections) -> tuple:
+    """Box count and class set of one frame's detections"""
+    class_ids = getattr(detections, 'class_ids', None)
+    if class_ids is None:
+        class_ids = [d['class_id'] for d in detections]
+    return len(detections), {int(c) for c in class_ids}
+
+
+def detection_churn(previous: Optional[tuple], current: tuple) -> float:
+    """How much the detections changed between two analyzed frames, 0..1"""
+    if previous is None:
+        return 1.0
+    prev_count, prev_classes = previous
+    curr_count, curr_classes = current
+    change = abs(curr_count - prev_count) + len(prev_classes ^ curr_classes)
+    return min(1.0, change / max(1, prev_count, curr_count))
+
+
+class AdaptiveFrameScheduler:
+    """Choose the video sampling stride from latency, scene change and detection churn.
+
+    The nominal stride analyzes target_fps frames per second of footage.
+    Measured inference latency sets a lower bound on the stride, so analysis
+    takes at most time_budget seconds per second of footage. Within that
+    bound the stride is halved while the scene or the detections are
+    changing ('dense') and tripled on static footage ('sparse').
+    """
+
+    def __init__(self, source_fps: float, target_fps: float = 6.0, time_budget: float = 1.0,
+                 min_stride: int = 1, max_stride: Optional[int] = None,
+                 activity_high: float = 0.25, activity_low: float = 0.03, smoothing: float = 0.3):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.target_fps = max(0.1, target_fps)
+        self.time_budget = max(0.01, time_budget)
+        self.min_stride = max(1, int(min_stride))
+        # By default analyze at least one frame every two seconds of footage
+        self.max_stride = max_stride or max(self.min_stride, int(self.source_fps * 2))
+        self.activity_high = activity_high
+        self.activity_low = activity_low
+        self.smoothing = smoothing
+
+        self.nominal_stride = max(self.min_stride, int(round(self.source_fps / self.target_fps)))
+        self.policy = 'balanced'
+        self.stride = self.nominal_stride
+        self.latency_ema: Optional[float] = None
+        self.activity_ema = 1.0
+
+        self.analyzed_frames = 0
+        self.policy_frames = {name: 0 for name in POLICY_MULTIPLIERS}
+        self.last_frame_index = 0
+        self.started_at: Optional[float] = None
+        self._previous_signature = None
+        self._previous_detections = None
+        self._lock = threading.Lock()
+
+    def next_stride(self) -> int:
+        """Number of source frames to advance before the next analyzed frame"""
+        return self.stride
+
+    def observe(self, frame: np.ndarray, detections, latency: Optional[float], frame_index: int = 0):
+        """Update the policy after analyzing a frame; latency is None when no inference ran"""
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.time()
+            self.analyzed_frames += 1
+            self.policy_frames[self.policy] += 1
+            self.last_frame_index = max(self.last_frame_index, frame_index)
+
+            signature = frame_signature(frame)
+            # Scene differences of a few percent are already significant motion
+            scene = min(1.0, scene_change_score(self._previous_signature, signature) * 10)
+            summary = detection_summary(detections)
+            churn = detection_churn(self._previous_detections, summary)
+            self._previous_signature = signature
+            self._previous_detections = summary
+
+            if latency is not None:
+                self.latency_ema = latency if self.latency_ema is None else \
+                    self.smoothing * latency + (1 - self.smoothing) * self.latency_ema
+            self.activity_ema = self.smoothing * max(scene, churn) + (1 - self.smoothing) * self.activity_ema
+
+            if self.activity_ema >= self.activity_high:
+                self.policy = 'dense'
+            elif self.activity_ema <= self.activity_low:
+                self.policy = 'sparse'
+            else:
+                self.policy = 'balanced'
+            self.stride = self._stride_for(self.policy)
+
+    def _stride_for(self, policy: str) -> int:
+        stride = int(round(self.nominal_stride * POLICY_MULTIPLIERS[policy]))
+        stride = min(max(stride, self.min_stride), self.max_stride)
+        # Never analyze more often than the time budget allows
+        return max(stride, self.latency_floor())
+
+    def latency_floor(self) -> int:
+        """Smallest stride that keeps processing within the time budget"""
+        if not self.latency_ema:
+            return self.min_stride
+        return max(self.min_stride, int(math.ceil(self.latency_ema * self.source_fps / self.time_budget)))
+
+    def stats(self) -> Dict:
+        """Current policy plus achieved processing and sampling rates"""
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        footage_seconds = self.last_frame_index / self.source_fps
+        return {
+            'policy': self.policy,
+            'stride': self.stride,
+            'nominal_stride': self.nominal_stride,
+            'latency_floor': self.latency_floor(),
+            'latency_ms': (self.latency_ema or 0.0) * 1000,
+            'activity': self.activity_ema,
+            'analyzed_frames': self.analyzed_frames,
+            'policy_frames': dict(self.policy_frames),
+            # Analyzed frames per wall-clock second
+            'effective_fps': self.analyzed_frames / elapsed if elapsed > 0 else 0.0,
+            # Analyzed frames per second of footage
+            'sampling_fps': self.analyzed_frames / footage_seconds if footage_seconds > 0 else 0.0
+        }
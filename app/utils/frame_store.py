@@ -0,0 +1,180 @@
+import bisect
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.frame import Frame
+
+
+class FrameStore:
+    """Disk-backed store for annotated video frames.
+
+    Frames are appended to Motion-JPEG segments of chunk_size frames each.
+    Every MJPG frame is a keyframe, so any stored frame can be read back with
+    an exact seek. Only the segment paths and a bounded set of thumbnails are
+    kept in memory, no matter how many frames are stored.
+    """
+
+    def __init__(self, directory: Optional[str] = None, chunk_size: int = 120,
+                 thumbnail_width: int = 320, max_thumbnails: int = 24, jpeg_quality: int = 90):
+        self.directory = directory or tempfile.mkdtemp(prefix="heritagelens_frames_")
+        os.makedirs(self.directory, exist_ok=True)
+        self.chunk_size = max(1, int(chunk_size))
+        self.thumbnail_width = thumbnail_width
+        self.max_thumbnails = max(2, int(max_thumbnails))
+        self.jpeg_quality = jpeg_quality
+
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.segments: List[str] = []
+        # Index of the first frame in each segment (segments can end early on flush)
+        self.segment_starts: List[int] = []
+        self.thumbnails: List[Tuple[int, np.ndarray]] = []
+        self._thumbnail_stride = 1
+        self._count = 0
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._writer_frames = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, frame: np.ndarray) -> int:
+        """Store a BGR frame and return its index"""
+        with self._lock:
+            height, width = frame.shape[:2]
+            if self.frame_size is None:
+                self.frame_size = (width, height)
+            elif (width, height) != self.frame_size:
+                frame = cv2.resize(frame, self.frame_size)
+
+            if self._writer is None or self._writer_frames >= self.chunk_size:
+                self._open_segment()
+            self._writer.write(frame)
+            self._writer_frames += 1
+
+            index = self._count
+            self._count += 1
+            if index % self._thumbnail_stride == 0:
+                self._add_thumbnail(index, frame)
+            return index
+
+    def read(self, index: int) -> Optional[np.ndarray]:
+        """Read one stored frame (BGR) back from disk"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("frame index out of range")
+
+        segment = bisect.bisect_right(self.segment_starts, index) - 1
+        offset = index - self.segment_starts[segment]
+        with self._lock:
+            # The segment being written must be finalized before it can be read
+            if segment == len(self.segments) - 1 and self._writer is not None:
+                self._close_segment()
+
+        cap = cv2.VideoCapture(self.segments[segment])
+        try:
+            if offset:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, offset)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
+
+    def iter_frames(self, step: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+        """Stream (index, frame) pairs sequentially, one segment open at a time"""
+        self.flush()
+        step = max(1, int(step))
+        for path, base in zip(self.segments, self.segment_starts):
+            cap = cv2.VideoCapture(path)
+            try:
+                offset = 0
+                while True:
+                    index = base + offset
+                    if index % step == 0:
+                        ret, frame = cap.read()
+                        if not ret:
+                            break
+                        yield index, frame
+                    elif not cap.grab():
+                        break
+                    offset += 1
+            finally:
+                cap.release()
+
+    def sample_indices(self, count: int) -> List[int]:
+        """Evenly spaced frame indices across the store"""
+        if self._count == 0 or count <= 0:
+            return []
+        step = max(1, self._count // count)
+        return list(range(0, self._count, step))[:count]
+
+    def sample_frames(self, count: int) -> List[np.ndarray]:
+        """Read evenly spaced frames (BGR) from disk"""
+        frames = [self.read(i) for i in self.sample_indices(count)]
+        return [f for f in frames if f is not None]
+
+    def sample_thumbnails(self, count: int) -> List[Tuple[int, np.ndarray]]:
+        """Evenly spaced (index, RGB thumbnail) pairs, straight from memory"""
+        if count <= 0 or not self.thumbnails:
+            return []
+        with self._lock:
+            thumbnails = list(self.thumbnails)
+        step = max(1, len(thumbnails) // count)
+        return thumbnails[::step][:count]
+
+    def flush(self):
+        """Finalize the segment being written so every frame is readable"""
+        with self._lock:
+            self._close_segment()
+
+    def disk_bytes(self) -> int:
+        """Total size of the stored segments"""
+        return sum(os.path.getsize(p) for p in self.segments if os.path.exists(p))
+
+    def memory_bytes(self) -> int:
+        """Memory held by thumbnails"""
+        return sum(thumb.nbytes for _, thumb in self.thumbnails)
+
+    def cleanup(self):
+        """Close the writer and delete all stored segments"""
+        with self._lock:
+            self._close_segment()
+            self.segments = []
+            self.segment_starts = []
+            self.thumbnails = []
+            self._count = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _open_segment(self):
+        self._close_segment()
+        path = os.path.join(self.directory, f"segment_{len(self.segments):05d}.avi")
+        fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+        # Segment FPS only matters for playback; frames are addressed by index
+        self._writer = cv2.VideoWriter(path, fourcc, 10, self.frame_size)
+        self._writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.jpeg_quality)
+        self.segments.append(path)
+        self.segment_starts.append(self._count)
+        self._writer_frames = 0
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def _add_thumbnail(self, index: int, frame: np.ndarray):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.thumbnail_width / float(width))
+        thumb = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        self.thumbnails.append((index, Frame(thumb, 'BGR').rgb()))
+
+        # Keep the thumbnail set bounded by halving its density
+        if len(self.thumbnails) > self.max_thumbnails:
+            self._thumbnail_stride *= 2
+            self.thumbnails = [(i, t) for i, t in self.thumbnails if i % self._thumbnail_stride == 0]
@@ -0,0 +1,93 @@
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.frame import Frame
+
+
+class IngestedImage:
+    """An uploaded image held at inference resolution.
+
+    Only two things are kept per image: the compressed source bytes and a
+    working Frame no larger than max_side (what the model and the
+    annotated view use). The working frame stays
+    in PIL's RGB order; the model gets a BGR view of it. Full-resolution
+    pixels are decoded again from the source bytes when a view needs them.
+    """
+
+    def __init__(self, name: str, data: bytes, frame: Frame, full_size: Tuple[int, int]):
+        self.name = name
+        self.data = data
+        self.frame = frame
+        # (width, height) of the original image
+        self.full_size = full_size
+
+    @property
+    def working(self) -> np.ndarray:
+        """BGR view of the working frame, as the model expects"""
+        return self.frame.bgr()
+
+    @property
+    def scale(self) -> float:
+        """Working resolution relative to the original (1.0 when not downscaled)"""
+        return self.frame.width / self.full_size[0]
+
+    def full_resolution_frame(self) -> Frame:
+        """Decode the original pixels again; the result is not retained"""
+        return Frame.from_pil(Image.open(io.BytesIO(self.data)).convert('RGB'))
+
+    def full_resolution_bgr(self) -> np.ndarray:
+        return self.full_resolution_frame().bgr()
+
+    def memory_bytes(self) -> Dict[str, int]:
+        return {
+            'source': len(self.data),
+            'working': self.frame.nbytes
+        }
+
+    def full_resolution_bytes(self) -> int:
+        """Size of one decoded full-resolution RGB copy"""
+        return self.full_size[0] * self.full_size[1] * 3
+
+
+def ingest_image(name: str, data: bytes, max_side: Optional[int] = 1280) -> IngestedImage:
+    """Decode an image directly at (about) the resolution it is needed at.
+
+    For JPEGs, PIL's draft mode makes libjpeg scale by 1/2, 1/4 or 1/8
+    during DCT decoding, so a 40 MP photo is never expanded to full size;
+    other formats are decoded and then reduced.
+    """
+    image = Image.open(io.BytesIO(data))
+    full_size = image.size
+    if max_side and max(full_size) > max_side:
+        # thumbnail() applies draft() first, then resamples the remainder
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+    image = image.convert('RGB')
+    return IngestedImage(name, data, Frame.from_pil(image), full_size)
+
+
+def memory_report(images: List[IngestedImage]) -> Dict[str, int]:
+    """Bytes held by a session's ingested images, by buffer type.
+
+    'full_resolution_equivalent' is what keeping the original, annotated and
+    BGR full-resolution copies of each image would cost, for comparison.
+    """
+    report = {'source': 0, 'working': 0, 'full_resolution_equivalent': 0}
+    for image in images:
+        for key, size in image.memory_bytes().items():
+            report[key] += size
+        report['full_resolution_equivalent'] += 3 * image.full_resolution_bytes()
+    report['total'] = report['source'] + report['working']
+    return report
+
+
+def detect_ingested(detection_manager, image: IngestedImage, tiled=None):
+    """Detect on the working copy, or tile the full-resolution pixels for large images.
+
+    Boxes are returned in working-resolution coordinates either way.
+    """
+    if tiled is not None and tiled.needs_tiling(*image.full_size):
+        return tiled.detect_image(image.full_resolution_bgr()).scaled(image.scale)
+    return detection_manager.detect_objects(image.working, use_cache=True)
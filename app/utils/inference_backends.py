@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.quantization import backend_for_precision, calibration_fingerprint, quantize_onnx
+from utils.result_cache import model_fingerprint
+
+# Backend name -> ultralytics export format (None: run the .pt weights directly)
+BACKENDS: Dict[str, Optional[str]] = {
+    'torch': None,
+    'onnx': 'onnx',
+    'openvino': 'openvino'
+}
+
+DEFAULT_EXPORT_DIR = Path(__file__).parent.parent / ".model_exports"
+BACKEND_ENV_VAR = 'HERITAGELENS_BACKEND'
+
+# Reentrant: INT8 builds first resolve the FP32 export
+_export_lock = threading.RLock()
+
+
+def default_backend() -> str:
+    """Backend chosen at startup through the HERITAGELENS_BACKEND environment variable"""
+    return os.environ.get(BACKEND_ENV_VAR, 'torch').strip().lower() or 'torch'
+
+
+def artifact_name(model_path: str, backend: str) -> str:
+    """File or directory name ultralytics gives an exported model"""
+    stem = Path(model_path).stem
+    return {'onnx': f"{stem}.onnx", 'openvino': f"{stem}_openvino_model"}[backend]
+
+
+def resolve_model_path(model_path: str, backend: str, imgsz: int = 640, precision: str = 'fp32',
+                       calibration_dir: Optional[str] = None, export_dir: Optional[Path] = None) -> str:
+    """Path of the model file to load for a backend and precision, building it on first use.
+
+    Exports are cached under export_dir/<weights fingerprint>/, so they are
+    reused across restarts and rebuilt when best.pt changes. Exporting runs
+    on a private copy of the weights in a temporary directory and the result
+    is moved into place atomically, so concurrent processes never load a
+    half-written artifact. INT8 variants are quantized from the FP32 ONNX
+    export; static INT8 artifacts are also keyed by the calibration set.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {tuple(BACKENDS)}")
+    if backend_for_precision(backend, precision) != backend:
+        raise ValueError(f"{precision} cannot run on the {backend} backend")
+    if BACKENDS[backend] is None:
+        return model_path
+
+    export_dir = Path(export_dir) if export_dir else DEFAULT_EXPORT_DIR
+    fingerprint = model_fingerprint(model_path)
+    variant = precision
+    if precision == 'int8-static':
+        if not calibration_dir:
+            raise ValueError("int8-static needs a calibration image folder")
+        variant = f"{precision}-{calibration_fingerprint(calibration_dir)}"
+    target = export_dir / fingerprint / f"{imgsz}" / variant / artifact_name(model_path, backend)
+    if target.exists():
+        return str(target)
+
+    with _export_lock:
+        if target.exists():
+            return str(target)
+        _purge_stale_exports(export_dir, fingerprint)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=target.parent) as work_dir:
+            if precision.startswith('int8'):
+                fp32_model = resolve_model_path(model_path, backend, imgsz, 'fp32', export_dir=export_dir)
+                built = str(Path(work_dir) / target.name)
+                quantize_onnx(fp32_model, built, precision, calibration_dir, imgsz)
+            else:
+                from ultralytics import YOLO
+
+                weights = Path(work_dir) / Path(model_path).name
+                shutil.copy2(model_path, weights)
+                # dynamic=True keeps the batch dimension free for detect_batch
+                built = YOLO(str(weights)).export(format=BACKENDS[backend], imgsz=imgsz, dynamic=True,
+                                                  half=precision == 'fp16')
+            try:
+                os.replace(built, target)
+            except OSError:
+                # Another process finished the same export first
+                if not target.exists():
+                    raise
+    return str(target)
+
+
+def _purge_stale_exports(export_dir: Path, fingerprint: str):
+    """Remove exports built from earlier versions of the weights"""
+    if not export_dir.exists():
+        return
+    for path in export_dir.iterdir():
+        if path.is_dir() and path.name != fingerprint:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def artifact_size(path: str) -> int:
+    """Size on disk of a model file or exported model directory"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+    return path.stat().st_size if path.exists() else 0
@@ -0,0 +1,245 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+MAX_JOBS_ENV_VAR = 'HERITAGELENS_MAX_VIDEO_JOBS'
+MAX_LIVE_JOBS_ENV_VAR = 'HERITAGELENS_MAX_LIVE_JOBS'
+MAX_PAUSE_ENV_VAR = 'HERITAGELENS_MAX_PAUSE_SECONDS'
+DEFAULT_MAX_PAUSE_SECONDS = 600.0
+LIVE_HEARTBEAT_ENV_VAR = 'HERITAGELENS_LIVE_HEARTBEAT_SECONDS'
+DEFAULT_LIVE_HEARTBEAT_SECONDS = 120.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+FINISHED_STATES = (COMPLETED, CANCELLED, FAILED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at a checkpoint after cancel() was requested"""
+
+
+class JobHandle:
+    """Shared state of one background job.
+
+    The job function receives its handle and calls report() to publish
+    progress and partial results and checkpoint() between units of work;
+    pages keep the handle and poll snapshot(), or call pause(), resume()
+    and cancel(). Everything is guarded by one lock, so the page never sees
+    a half-updated state. A job left paused for max_pause_seconds is
+    cancelled, so an abandoned session cannot hold a slot forever. Jobs
+    that never finish on their own also get heartbeat_seconds: the page
+    calls heartbeat() whenever it polls, and a job whose page stopped
+    polling for that long is cancelled at its next checkpoint.
+    """
+
+    def __init__(self, job_id: int, name: str, owner: Optional[str] = None,
+                 max_pause_seconds: Optional[float] = None, heartbeat_seconds: Optional[float] = None):
+        self.job_id = job_id
+        self.name = name
+        self.owner = owner
+        # None waits for resume() or cancel() indefinitely
+        self.max_pause_seconds = max_pause_seconds
+        # None keeps the job running without a watching page
+        self.heartbeat_seconds = heartbeat_seconds
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ''
+        self.partial: Dict = {}
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_heartbeat = self.created_at
+
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._done = threading.Event()
+
+    # Page side
+
+    def cancel(self):
+        """Request cancellation; a paused job is woken up so it can stop"""
+        with self._lock:
+            self._cancel.set()
+            self._running.set()
+
+    def pause(self):
+        """Pause at the next checkpoint; ignored once cancellation was requested"""
+        with self._lock:
+            if self.status == RUNNING and not self._cancel.is_set():
+                self.status = PAUSED
+                self._running.clear()
+
+    def resume(self):
+        with self._lock:
+            if self.status == PAUSED:
+                self.status = RUNNING
+                self._running.set()
+
+    def heartbeat(self):
+        """Mark the job as still watched by a page"""
+        with self._lock:
+            self.last_heartbeat = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> Dict:
+        """Consistent copy of status, progress and partial results"""
+        with self._lock:
+            now = self.finished_at or time.time()
+            return {
+                'job_id': self.job_id,
+                'name': self.name,
+                'status': self.status,
+                'progress': self.progress,
+                'message': self.message,
+                'partial': dict(self.partial),
+                'error': str(self.error) if self.error else None,
+                'elapsed': now - self.started_at if self.started_at else 0.0
+            }
+
+    # Job side
+
+    def report(self, progress: Optional[float] = None, message: Optional[str] = None, **partial):
+        """Publish progress (0..1), a status message and partial results"""
+        with self._lock:
+            if progress is not None:
+                self.progress = min(max(progress, 0.0), 1.0)
+            if message is not None:
+                self.message = message
+            self.partial.update(partial)
+
+    def checkpoint(self):
+        """Wait while paused; raise JobCancelled if cancellation was requested"""
+        if not self._running.wait(self.max_pause_seconds):
+            with self._lock:
+                self.message = f"Cancelled after {self.max_pause_seconds:.0f}s paused"
+            self.cancel()
+        if self.heartbeat_seconds is not None and time.time() - self.last_heartbeat > self.heartbeat_seconds:
+            with self._lock:
+                self.message = f"Cancelled after {self.heartbeat_seconds:.0f}s without a page watching"
+            self.cancel()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _start(self):
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def _finish(self, status: str, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+        self._done.set()
+
+
+class JobManager:
+    """Runs jobs on a fixed number of background threads, shared by all sessions.
+
+    Jobs beyond max_concurrent wait in submission order. A job function is
+    called as fn(handle, *args, **kwargs); its return value becomes the
+    handle's result. Raising JobCancelled (e.g. from handle.checkpoint())
+    ends it as cancelled; a job that notices cancel_requested itself and
+    returns partial results also ends as cancelled, with its result kept.
+    """
+
+    def __init__(self, max_concurrent: int = 2, keep_finished: int = 50,
+                 max_pause_seconds: Optional[float] = DEFAULT_MAX_PAUSE_SECONDS,
+                 heartbeat_seconds: Optional[float] = None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.keep_finished = keep_finished
+        # Paused jobs still occupy a slot; they are cancelled after this long
+        self.max_pause_seconds = max_pause_seconds
+        # Jobs nobody polls for this long are cancelled (None: never)
+        self.heartbeat_seconds = heartbeat_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='job')
+        self._jobs: Dict[int, JobHandle] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable, *args, owner: Optional[str] = None, **kwargs) -> JobHandle:
+        """Queue a job and return its handle immediately"""
+        with self._lock:
+            handle = JobHandle(next(self._ids), name, owner, self.max_pause_seconds, self.heartbeat_seconds)
+            self._jobs[handle.job_id] = handle
+            self._prune()
+        self._executor.submit(self._run, handle, fn, args, kwargs)
+        return handle
+
+    def _run(self, handle: JobHandle, fn: Callable, args, kwargs):
+        if handle.cancel_requested:
+            handle._finish(CANCELLED)
+            return
+        handle._start()
+        try:
+            result = fn(handle, *args, **kwargs)
+        except JobCancelled:
+            handle._finish(CANCELLED)
+        except BaseException as e:
+            handle._finish(FAILED, error=e)
+        else:
+            handle._finish(CANCELLED if handle.cancel_requested else COMPLETED, result)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond keep_finished"""
+        finished = [h for h in self._jobs.values() if h.finished]
+        for handle in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[handle.job_id]
+
+    def get(self, job_id: int) -> Optional[JobHandle]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner: Optional[str] = None) -> List[JobHandle]:
+        """Known jobs in submission order, optionally only one owner's"""
+        with self._lock:
+            return [h for h in self._jobs.values() if owner is None or h.owner == owner]
+
+    def queue_position(self, handle: JobHandle) -> int:
+        """Number of queued jobs ahead of this one (0 once it has started)"""
+        if handle.status != QUEUED:
+            return 0
+        with self._lock:
+            return sum(1 for h in self._jobs.values() if h.status == QUEUED and h.job_id < handle.job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses = [h.status for h in self._jobs.values()]
+        return {
+            'max_concurrent': self.max_concurrent,
+            'running': sum(s in (RUNNING, PAUSED) for s in statuses),
+            'queued': statuses.count(QUEUED)
+        }
+
+
+_max_pause_seconds = float(os.environ.get(MAX_PAUSE_ENV_VAR, DEFAULT_MAX_PAUSE_SECONDS) or DEFAULT_MAX_PAUSE_SECONDS)
+job_manager = JobManager(int(os.environ.get(MAX_JOBS_ENV_VAR, '2') or 2), max_pause_seconds=_max_pause_seconds)
+# Live sources run until stopped, so they get their own slots instead of starving video jobs,
+# and stop once their page is closed
+live_job_manager = JobManager(int(os.environ.get(MAX_LIVE_JOBS_ENV_VAR, '2') or 2),
+                              max_pause_seconds=_max_pause_seconds,
+                              heartbeat_seconds=float(os.environ.get(LIVE_HEARTBEAT_ENV_VAR, DEFAULT_LIVE_HEARTBEAT_SECONDS)
+                                                      or DEFAULT_LIVE_HEARTBEAT_SECONDS))
@@ -0,0 +1,307 @@
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from utils.frame import Frame
+from utils.video_pipeline import FrameResult, StageStats
+
+# Camera drivers sometimes report 0 or nonsense frame rates
+DEFAULT_LIVE_FPS = 30.0
+# Only videos in this directory can be replayed as a live source from the app
+REPLAY_DIR_ENV_VAR = 'HERITAGELENS_REPLAY_DIR'
+REPLAY_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv'}
+# Typed-in live sources must be one of these stream URLs (or a webcam index)
+LIVE_URL_SCHEMES = ('rtsp://', 'http://', 'https://')
+
+
+def parse_live_source(text: str) -> Union[int, str]:
+    """Webcam index for a bare number, otherwise an RTSP or HTTP(S) stream URL.
+
+    Anything else (local paths, image-sequence patterns like frame_%d.png)
+    would let a user open arbitrary server files, so it is rejected with a
+    ValueError; server-side videos are only played through replay_videos().
+    """
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    if text.lower().startswith(LIVE_URL_SCHEMES):
+        return text
+    raise ValueError(f"Not a camera index or rtsp/http(s) stream URL: {text!r}")
+
+
+def replay_videos() -> List[Path]:
+    """Videos that may be replayed as live sources; empty unless $HERITAGELENS_REPLAY_DIR is set"""
+    directory = os.environ.get(REPLAY_DIR_ENV_VAR)
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(p for p in Path(directory).iterdir() if p.is_file() and p.suffix.lower() in REPLAY_EXTENSIONS)
+
+
+class LiveFrame:
+    """A captured frame, numbered in capture order and stamped when it was read"""
+
+    __slots__ = ('frame', 'sequence', 'captured_at')
+
+    def __init__(self, frame: np.ndarray, sequence: int, captured_at: float):
+        self.frame = frame
+        self.sequence = sequence
+        self.captured_at = captured_at
+
+
+class LatestFrameCapture:
+    """Reads a live source on a background thread, keeping only the newest frame.
+
+    A consumer slower than the camera would otherwise work through
+    cv2.VideoCapture's internal buffer and fall further and further behind.
+    Here one thread reads continuously into a single slot and read() returns
+    the newest frame not seen yet; frames the consumer had no time for are
+    dropped. Each frame is stamped with time.monotonic() when it was read,
+    the reference point for glass-to-result latency (time already spent in
+    the camera, driver or network buffer is not visible to us, so the
+    backend buffer is asked to hold a single frame).
+
+    Sources are a webcam index, an RTSP or HTTP MJPEG URL, or a file path.
+    With replay=True a local video is played back at its own frame rate,
+    looping, as a stand-in for a camera in tests and benchmarks. Lost network
+    sources are reopened up to max_reconnects times in a row.
+    """
+
+    def __init__(self, source: Union[int, str], replay: bool = False, loop: bool = True,
+                 reconnect_delay: float = 1.0, max_reconnects: int = 5):
+        self.source = source
+        self.replay = replay
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.fps = DEFAULT_LIVE_FPS
+
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.reconnects = 0
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._latest: Optional[LiveFrame] = None
+        self._delivered = 0
+        self._ended = False
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _open(self) -> cv2.VideoCapture:
+        cap = cv2.VideoCapture(self.source)
+        # Keep the backend's own queue short so frames are not stale on arrival
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def start(self) -> 'LatestFrameCapture':
+        """Open the source and start the capture thread"""
+        if self.replay and not (isinstance(self.source, str) and os.path.isfile(self.source)):
+            raise ValueError(f"Replay needs a local video file, got {self.source!r}")
+        self._cap = self._open()
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Cannot open live source {self.source!r}")
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps <= 240 else DEFAULT_LIVE_FPS
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        replayed = 0
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                ok, frame = self._cap.read()
+                if not ok:
+                    if self.replay:
+                        # Rewind to loop the file; a file that yields nothing ends the replay
+                        if not self.loop or replayed == 0 or not self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                            break
+                        continue
+                    failures += 1
+                    if failures > self.max_reconnects:
+                        raise RuntimeError(f"Lost live source {self.source!r}")
+                    self._cap.release()
+                    self._stop_event.wait(self.reconnect_delay)
+                    self._cap = self._open()
+                    self.reconnects += 1
+                    continue
+                failures = 0
+
+                if self.replay:
+                    # Deliver frames when a camera would have, not as fast as the file decodes
+                    delay = self.started_at + replayed / self.fps - time.monotonic()
+                    replayed += 1
+                    if delay > 0 and self._stop_event.wait(delay):
+                        break
+
+                captured_at = time.monotonic()
+                with self._condition:
+                    self.frames_captured += 1
+                    self._latest = LiveFrame(frame, self.frames_captured, captured_at)
+                    self._condition.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._cap.release()
+            with self._condition:
+                self._ended = True
+                self._condition.notify_all()
+
+    def read(self, timeout: float = 1.0) -> Optional[LiveFrame]:
+        """Newest frame not returned before; None on timeout or once the source has ended"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._ended and (self._latest is None or self._latest.sequence <= self._delivered):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            if self._latest is None or self._latest.sequence <= self._delivered:
+                return None
+            self._delivered = self._latest.sequence
+            self.frames_delivered += 1
+            return self._latest
+
+    @property
+    def ended(self) -> bool:
+        return self._ended
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the capture thread and release the source"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'source_fps': self.fps,
+            'frames_captured': self.frames_captured,
+            'frames_delivered': self.frames_delivered,
+            # Frames replaced in the slot before anyone read them
+            'frames_dropped': max(self.frames_captured - self.frames_delivered, 0),
+            'capture_fps': self.frames_captured / elapsed if elapsed > 0 else 0.0,
+            'reconnects': self.reconnects
+        }
+
+
+class LatencyStats:
+    """Glass-to-result latencies: running mean and maximum plus percentiles over a recent window"""
+
+    def __init__(self, window: int = 300):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def stats(self) -> Dict:
+        if not self.count:
+            return {'count': 0, 'last_ms': 0.0, 'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        p50, p95 = np.percentile(np.array(self.recent), [50, 95])
+        return {
+            'count': self.count,
+            'last_ms': 1000 * self.recent[-1],
+            'avg_ms': 1000 * self.total / self.count,
+            'p50_ms': 1000 * float(p50),
+            'p95_ms': 1000 * float(p95),
+            'max_ms': 1000 * self.max
+        }
+
+
+class LiveDetectionLoop:
+    """Detection on the newest frame of a LatestFrameCapture, as fast as inference allows.
+
+    Runs on the caller's thread: take the newest frame, detect, track,
+    annotate and yield it. Meanwhile the capture thread keeps replacing the
+    slot, so throughput settles at whatever inference sustains and latency
+    stays around one frame's processing time instead of accumulating. The
+    latency of each result (capture to annotated result) is recorded on the
+    FrameResult and in latency_stats.
+    """
+
+    def __init__(self, capture: LatestFrameCapture, detection_manager, tracker=None,
+                 annotate: bool = True, read_timeout: float = 1.0):
+        self.capture = capture
+        self.detection_manager = detection_manager
+        self.tracker = tracker
+        self.annotate = annotate
+        self.read_timeout = read_timeout
+        self.latency_stats = LatencyStats()
+        self.stage_stats = {name: StageStats(name) for name in ('inference', 'annotate', 'display')}
+        self._stop_event = threading.Event()
+
+    def run(self) -> Iterator[FrameResult]:
+        """Yield results until stopped or the source ends"""
+        if self.capture.started_at is None:
+            self.capture.start()
+        for stats in self.stage_stats.values():
+            stats.started_at = time.time()
+        try:
+            while not self._stop_event.is_set():
+                live = self.capture.read(self.read_timeout)
+                if live is None:
+                    if self.capture.ended:
+                        break
+                    # Stalled source; the capture thread reconnects if needed
+                    continue
+
+                item = FrameResult(live.sequence, live.frame)
+                start = time.perf_counter()
+                item.detections = self.detection_manager.detect_objects(live.frame)
+                self.stage_stats['inference'].record(time.perf_counter() - start)
+                if self.tracker is not None:
+                    item.track_ids = self.tracker.update(item.detections, live.sequence)
+
+                if self.annotate:
+                    start = time.perf_counter()
+                    # Each read returns a new buffer, so draw on it directly
+                    frame = Frame(live.frame, 'BGR').annotated(self.detection_manager, item.detections,
+                                                               inplace=live.frame.flags.writeable)
+                    item.annotated_frame = frame.bgr()
+                    self.stage_stats['annotate'].record(time.perf_counter() - start)
+                item.frame = None
+
+                item.latency = time.monotonic() - live.captured_at
+                self.latency_stats.add(item.latency)
+
+                start = time.perf_counter()
+                yield item
+                self.stage_stats['display'].record(time.perf_counter() - start)
+        finally:
+            for stats in self.stage_stats.values():
+                stats.finished_at = time.time()
+            self.stop()
+
+        if self.capture.error is not None:
+            raise self.capture.error
+
+    def stop(self):
+        self._stop_event.set()
+        self.capture.stop()
+
+    def stats(self) -> Dict:
+        """Stage throughput, capture counters and latency, shaped like VideoPipeline.stats()"""
+        capture = self.capture.stats()
+        return {
+            'frames_read': capture['frames_captured'],
+            'sampling': None,
+            'stages': {name: s.to_dict() for name, s in self.stage_stats.items()},
+            'queues': {},
+            'capture': capture,
+            'latency': self.latency_stats.stats()
+        }
@@ -0,0 +1,88 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy box arrays"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def match_detections(reference, candidate, iou_threshold: float = 0.5) -> List[Tuple[int, int, float]]:
+    """Greedily pair same-class boxes of two results by descending IoU.
+
+    Returns (reference index, candidate index, IoU) for every matched pair.
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return []
+    iou = box_iou(reference.bboxes, candidate.bboxes)
+    iou[reference.class_ids[:, None] != candidate.class_ids[None, :]] = 0.0
+
+    matches = []
+    used_ref, used_cand = set(), set()
+    for flat in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        if i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+        matches.append((int(i), int(j), float(iou[i, j])))
+    return matches
+
+
+def compare_detections(reference_results: List, candidate_results: List,
+                       iou_threshold: float = 0.5) -> Dict:
+    """Agreement between two models' detections over the same images.
+
+    The reference model's boxes are treated as ground truth, so precision
+    and recall act as an mAP proxy for the candidate. Also reports box and
+    confidence deviations of matched pairs, per class.
+    """
+    matched = reference_total = candidate_total = 0
+    ious, box_errors = [], []
+    class_drift: Dict[int, List[float]] = {}
+    class_counts: Dict[int, List[int]] = {}
+
+    for reference, candidate in zip(reference_results, candidate_results):
+        reference_total += len(reference)
+        candidate_total += len(candidate)
+        for class_id in reference.class_ids:
+            class_counts.setdefault(int(class_id), [0, 0])[0] += 1
+        for class_id in candidate.class_ids:
+            class_counts.setdefault(int(class_id), [0, 0])[1] += 1
+
+        for i, j, iou in match_detections(reference, candidate, iou_threshold):
+            matched += 1
+            ious.append(iou)
+            box_errors.append(float(np.abs(reference.bboxes[i] - candidate.bboxes[j]).max()))
+            class_id = int(reference.class_ids[i])
+            class_drift.setdefault(class_id, []).append(
+                float(candidate.confidences[j] - reference.confidences[i]))
+
+    return {
+        'reference_detections': reference_total,
+        'candidate_detections': candidate_total,
+        'matched': matched,
+        'precision': matched / candidate_total if candidate_total else 1.0,
+        'recall': matched / reference_total if reference_total else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'max_box_error_px': max(box_errors) if box_errors else 0.0,
+        'class_counts': class_counts,
+        'class_confidence_drift': {
+            class_id: {
+                'mean': float(np.mean(drift)),
+                'max_abs': float(np.max(np.abs(drift)))
+            }
+            for class_id, drift in class_drift.items()
+        }
+    }
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from ultralytics import YOLO
+
+from utils.inference_backends import artifact_size
+
+
+class ModelEntry:
+    """A loaded model together with the file state it was loaded from"""
+
+    def __init__(self, model, model_path: str, mtime: float):
+        self.model = model
+        self.model_path = model_path
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        # Ultralytics predictors keep per-call state, so inference on a shared
+        # model is serialized through this lock
+        self.lock = threading.Lock()
+        # Exported backends hold no torch parameters; use their size on disk
+        self.memory_bytes = estimate_model_memory(model) or artifact_size(model_path)
+
+
+def estimate_model_memory(model) -> int:
+    """Estimate the memory held by a model's parameters and buffers in bytes"""
+    module = getattr(model, 'model', None)
+    if module is None or not hasattr(module, 'parameters'):
+        return 0
+
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models shared across Streamlit sessions.
+
+    Models are keyed by their resolved path and the weights file's mtime, so
+    each file is loaded once per process and reloaded when it changes on disk.
+    Exported backends (ONNX, OpenVINO) are separate files, so each backend
+    gets its own entry.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+        self.hit_count = 0
+
+    def get_entry(self, model_path: str, task: Optional[str] = None) -> Optional[ModelEntry]:
+        """Return the entry for a weights file, loading or reloading it as needed"""
+        path = os.path.abspath(model_path)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.mtime == mtime:
+            self.hit_count += 1
+            return entry
+
+        with self._lock:
+            # Another thread may have loaded it while we waited for the lock
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == mtime:
+                self.hit_count += 1
+                return entry
+
+            # Exported models carry no task metadata, so it is passed explicitly
+            entry = ModelEntry(YOLO(path, task=task), path, mtime)
+            self._entries[path] = entry
+            self.load_count += 1
+            return entry
+
+    def get_model(self, model_path: str, task: Optional[str] = None):
+        """Return the shared model for a weights file, or None if it is missing"""
+        entry = self.get_entry(model_path, task)
+        return entry.model if entry is not None else None
+
+    def evict(self, model_path: str):
+        """Drop a cached model so the next access reloads it"""
+        with self._lock:
+            self._entries.pop(os.path.abspath(model_path), None)
+
+    def stats(self) -> Dict:
+        """Report cache contents, memory use and load counters"""
+        entries = list(self._entries.values())
+        return {
+            'models_loaded': len(entries),
+            'memory_bytes': sum(entry.memory_bytes for entry in entries),
+            'load_count': self.load_count,
+            'hit_count': self.hit_count,
+            'models': [
+                {
+                    'path': entry.model_path,
+                    'mtime': entry.mtime,
+                    'loaded_at': entry.loaded_at,
+                    'memory_bytes': entry.memory_bytes
+                }
+                for entry in entries
+            ]
+        }
+
+
+# Module-level singleton: utils modules are imported once per process, so
+# every session and page shares this registry
+model_registry = ModelRegistry()
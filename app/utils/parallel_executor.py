@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from utils.frame import Frame
+from utils.image_ingest import IngestedImage, detect_ingested, ingest_image
+from utils.tiled_inference import TiledDetector
+
+# Per-process detection manager, created once by the pool initializer
+_worker_manager = None
+
+
+def _init_worker(torch_threads: int):
+    """Pool initializer: limit torch threads and load the model once per worker"""
+    global _worker_manager
+    if torch_threads > 0:
+        import torch
+        torch.set_num_threads(torch_threads)
+    from utils.detection_utils import DetectionManager
+    _worker_manager = DetectionManager()
+
+
+def _analyze_image(name: str, data: bytes, shm_name: str, max_side: int,
+                   tile_options: Optional[Dict] = None) -> Dict:
+    """Worker: ingest and detect one image, writing its working copy into shared memory"""
+    start = time.perf_counter()
+    image = ingest_image(name, data, max_side)
+    tiled = TiledDetector(_worker_manager, **tile_options) if tile_options else None
+    detections = detect_ingested(_worker_manager, image, tiled)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = image.frame.pixels
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=shm.buf)[:] = pixels
+    finally:
+        shm.close()
+    return {
+        'detections': detections,
+        'shape': image.frame.shape,
+        'full_size': image.full_size,
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid()
+    }
+
+
+class ImageAnalysis:
+    """Result of analyzing one image in a worker process"""
+
+    def __init__(self, index: int, image: IngestedImage, detections, seconds: float, pid: int):
+        self.index = index
+        self.name = image.name
+        self.image = image
+        self.detections = detections
+        self.seconds = seconds
+        self.pid = pid
+
+
+class SharedMemoryImagePool:
+    """Fan image analysis out to worker processes that each hold the model.
+
+    Only the compressed file bytes are pickled to a worker. The worker
+    ingests the image at working resolution (see image_ingest) and writes
+    the working copy into a shared-memory block the parent
+    sized for max_side; only detections and shapes travel back by pickle.
+    At most max_in_flight images (twice the workers by default) are
+    submitted at a time, so shared memory and queued work stay bounded
+    however many images are passed. Results are yielded in completion order.
+    """
+
+    def __init__(self, workers: int, max_in_flight: Optional[int] = None):
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(1, int(max_in_flight or 2 * self.workers))
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn avoids forking a multi-threaded server process
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(torch_threads,)
+        )
+
+    def analyze(self, images: Iterable[Tuple[str, bytes]], max_side: int = 1280,
+                tile_options: Optional[Dict] = None) -> Iterator[ImageAnalysis]:
+        """Analyze (name, encoded bytes) pairs; yields results as workers finish.
+
+        tile_options, if given, are TiledDetector arguments used for images
+        larger than one tile.
+        """
+        # Upper bound for one image's working copy
+        block_size = 3 * max_side * max_side
+        pending = {}
+        images = iter(enumerate(images))
+        try:
+            while True:
+                # Top up the window of submitted images
+                for index, (name, data) in images:
+                    shm = shared_memory.SharedMemory(create=True, size=block_size)
+                    future = self._executor.submit(_analyze_image, name, data, shm.name, max_side,
+                                                   tile_options)
+                    pending[future] = (index, name, data, shm)
+                    if len(pending) >= self.max_in_flight:
+                        break
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, name, data, shm = pending.pop(future)
+                    try:
+                        result = future.result()
+                        # Copy out so the shared block can be released right away
+                        buffer = np.ndarray(result['shape'], dtype=np.uint8, buffer=shm.buf)
+                        pixels = buffer.copy()
+                        del buffer
+                    finally:
+                        self._release(shm)
+                    image = IngestedImage(name, data, Frame(pixels, 'RGB'), result['full_size'])
+                    yield ImageAnalysis(index, image, result['detections'], result['seconds'], result['pid'])
+        finally:
+            for future, (_, _, _, shm) in pending.items():
+                future.cancel()
+                self._release(shm)
+
+    @staticmethod
+    def _release(shm: shared_memory.SharedMemory):
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self, cancel_futures: bool = True):
+        self._executor.shutdown(wait=False, cancel_futures=cancel_futures)
+
+
+_pool: Optional[SharedMemoryImagePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_image_pool(workers: int) -> SharedMemoryImagePool:
+    """The process-wide pool, kept warm across Streamlit reruns.
+
+    Only one pool (and so one set of loaded models) exists at a time. Asking
+    for a different worker count replaces it; the old pool finishes the work
+    already submitted to it, then its processes exit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.workers != max(1, int(workers)):
+            if _pool is not None:
+                _pool.shutdown(cancel_futures=False)
+            _pool = SharedMemoryImagePool(workers)
+        return _pool
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_PREVIEW_FPS = 2.0
+DEFAULT_PREVIEW_WIDTH = 640
+DEFAULT_PREVIEW_QUALITY = 80
+
+
+class Preview:
+    """One rendered preview: a display-sized JPEG plus the info offered with it"""
+
+    def __init__(self, sequence: int, jpeg: bytes, width: int, height: int, info: Dict):
+        self.sequence = sequence
+        self.jpeg = jpeg
+        self.width = width
+        self.height = height
+        self.info = info
+
+
+class PreviewRenderer:
+    """Throttled live preview of a running video analysis.
+
+    The detection loop asks due() before building anything for the preview
+    and hands over at most max_fps frames per second with offer(), which
+    only keeps a reference to the newest one. The page calls render() when
+    it redraws: the pending frame is downsized to max_width and JPEG-encoded
+    once, and the encoded preview is reused until a newer frame arrives.
+    Frames offered faster than the page redraws are replaced without ever
+    being encoded, so a slow browser never holds detection back.
+    """
+
+    def __init__(self, max_fps: float = DEFAULT_PREVIEW_FPS, max_width: int = DEFAULT_PREVIEW_WIDTH,
+                 quality: int = DEFAULT_PREVIEW_QUALITY):
+        self.interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self.max_width = max_width
+        self.quality = quality
+
+        self.frames_seen = 0
+        self.frames_offered = 0
+        self.frames_rendered = 0
+        self.frames_superseded = 0
+        self.encode_seconds = 0.0
+        self._next_due = 0.0
+        self._sequence = 0
+        self._pending = None
+        self._latest: Optional[Preview] = None
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """Whether the refresh interval has passed; counts every frame asked about"""
+        self.frames_seen += 1
+        return time.monotonic() >= self._next_due
+
+    def offer(self, frame: np.ndarray, **info):
+        """Make a BGR frame (and e.g. stats text) the newest preview, replacing an unrendered one"""
+        self._next_due = time.monotonic() + self.interval
+        with self._lock:
+            if self._pending is not None:
+                self.frames_superseded += 1
+            self._sequence += 1
+            self._pending = (self._sequence, frame, info)
+            self.frames_offered += 1
+
+    def render(self) -> Optional[Preview]:
+        """Newest preview, encoding the pending frame if there is one"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return self._latest
+
+        sequence, frame, info = pending
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            height = max(1, round(height * self.max_width / width))
+            width = self.max_width
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        elapsed = time.perf_counter() - start
+        if not ok:
+            return self._latest
+
+        preview = Preview(sequence, encoded.tobytes(), width, height, info)
+        with self._lock:
+            self.encode_seconds += elapsed
+            self.frames_rendered += 1
+            # A render racing with a newer one must not replace it
+            if self._latest is None or self._latest.sequence < sequence:
+                self._latest = preview
+            return self._latest
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'frames_seen': self.frames_seen,
+                'frames_offered': self.frames_offered,
+                'frames_rendered': self.frames_rendered,
+                'frames_superseded': self.frames_superseded,
+                'frames_skipped': self.frames_seen - self.frames_rendered,
+                'encode_ms_avg': 1000 * self.encode_seconds / self.frames_rendered if self.frames_rendered else 0.0
+            }
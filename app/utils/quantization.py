@@ -0,0 +1,128 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Precision -> the backend able to run it on CPU (None: any backend)
+PRECISIONS: Dict[str, Optional[str]] = {
+    'fp32': None,
+    'fp16': 'openvino',
+    'int8-dynamic': 'onnx',
+    'int8-static': 'onnx'
+}
+
+PRECISION_ENV_VAR = 'HERITAGELENS_PRECISION'
+CALIBRATION_ENV_VAR = 'HERITAGELENS_CALIBRATION_DIR'
+CALIBRATION_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+
+
+def default_precision() -> str:
+    """Precision chosen at startup through the HERITAGELENS_PRECISION environment variable"""
+    return os.environ.get(PRECISION_ENV_VAR, 'fp32').strip().lower() or 'fp32'
+
+
+def default_calibration_dir() -> Optional[str]:
+    return os.environ.get(CALIBRATION_ENV_VAR) or None
+
+
+def backend_for_precision(backend: str, precision: str) -> str:
+    """Backend that will run a precision; PyTorch is swapped for the one that supports it"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {tuple(PRECISIONS)}")
+    required = PRECISIONS[precision]
+    if required is None or backend == required:
+        return backend
+    if backend == 'torch':
+        return required
+    raise ValueError(f"{precision} is only supported with the {required} backend, not {backend}")
+
+
+def calibration_images(calibration_dir: str, limit: int = 200) -> List[Path]:
+    """Image files used for static calibration, in a stable order"""
+    paths = sorted(p for p in Path(calibration_dir).rglob('*') if p.suffix.lower() in CALIBRATION_EXTENSIONS)
+    if not paths:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+    return paths[:limit]
+
+
+def calibration_fingerprint(calibration_dir: str, limit: int = 200) -> str:
+    """Identify a calibration set by its file names, sizes and modification times"""
+    digest = hashlib.blake2b(digest_size=6)
+    for path in calibration_images(calibration_dir, limit):
+        stat = path.stat()
+        digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def letterbox_input(image: np.ndarray, imgsz: int = 640) -> np.ndarray:
+    """Preprocess a BGR image like the ultralytics predictor: letterbox, RGB, CHW, 0..1"""
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return np.ascontiguousarray(canvas[..., ::-1].transpose(2, 0, 1), dtype=np.float32)[None] / 255.0
+
+
+class ImageFolderCalibrationReader:
+    """onnxruntime CalibrationDataReader feeding letterboxed survey images"""
+
+    def __init__(self, calibration_dir: str, input_name: str, imgsz: int = 640, limit: int = 200):
+        self.paths = calibration_images(calibration_dir, limit)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iterator = iter(self.paths)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        for path in self._iterator:
+            image = cv2.imread(str(path))
+            if image is not None:
+                return {self.input_name: letterbox_input(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._iterator = iter(self.paths)
+
+
+def quantize_onnx(onnx_path: str, output_path: str, precision: str,
+                  calibration_dir: Optional[str] = None, imgsz: int = 640):
+    """Write an INT8 copy of an FP32 ONNX model with onnxruntime quantization.
+
+    'int8-dynamic' quantizes weights ahead of time and activations at run
+    time. 'int8-static' also fixes activation ranges from calibration images,
+    using per-channel QDQ quantization, which keeps box regression accurate.
+    """
+    import onnxruntime
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepared = os.path.join(work_dir, 'prepared.onnx')
+        try:
+            # Shape inference and graph cleanup recommended before quantizing
+            quant_pre_process(onnx_path, prepared)
+        except Exception:
+            shutil.copy2(onnx_path, prepared)
+
+        quantized = os.path.join(work_dir, 'quantized.onnx')
+        if precision == 'int8-dynamic':
+            quantize_dynamic(prepared, quantized, weight_type=QuantType.QUInt8)
+        elif precision == 'int8-static':
+            if not calibration_dir:
+                raise ValueError(f"int8-static needs a calibration image folder (set {CALIBRATION_ENV_VAR})")
+            session = onnxruntime.InferenceSession(prepared, providers=['CPUExecutionProvider'])
+            reader = ImageFolderCalibrationReader(calibration_dir, session.get_inputs()[0].name, imgsz)
+            del session
+            quantize_static(prepared, quantized, reader, quant_format=QuantFormat.QDQ,
+                            per_channel=True, activation_type=QuantType.QUInt8,
+                            weight_type=QuantType.QInt8)
+        else:
+            raise ValueError(f"{precision} is not an ONNX Runtime quantization mode")
+        shutil.move(quantized, output_path)
@@ -0,0 +1,245 @@
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_RECORDINGS_DIR = Path(__file__).parent.parent / ".recordings"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Raw frames held for the pre-roll; about 20 frames at 1080p
+DEFAULT_MAX_BUFFERED_BYTES = 128 * 1024 * 1024
+# Longest single event directory; longer events continue in a new one
+DEFAULT_MAX_EVENT_SECONDS = 60.0
+# Stones / stone structures and heritage sites (see DetectionManager.class_names)
+DEFAULT_TRIGGER_CLASSES = (0, 3)
+
+
+class DetectionRecorder:
+    """Saves JPEG frames around detections of chosen classes, written off the capture thread.
+
+    Every offered frame enters a pre-roll ring buffer covering the last
+    pre_roll seconds, so its length follows the observed frame rate; the
+    raw frames it holds never exceed max_buffered_bytes, beyond which the
+    pre-roll gets shorter instead. A frame with a detection of a trigger class at or
+    above min_confidence opens an event: the buffered frames and the frame
+    itself are written, and so is every frame for post_roll seconds after
+    the last trigger. Each recorder writes into its own run directory under
+    directory, so concurrent live jobs never see each other's files, and
+    each event gets its own directory inside it; an event longer than
+    max_event_seconds or larger than max_event_bytes (a quarter of
+    max_bytes by default), e.g. a site that stays in view, continues in a
+    new directory, so no single event can outgrow retention.
+
+    Encoding and writing run on a thread pool. When more than max_pending
+    frames are waiting, new frames are dropped and counted, so a slow disk
+    never stalls detection. The run's events are deleted oldest first to
+    keep its recordings within max_bytes and max_events; other runs' folders
+    are never touched. The event being recorded counts towards the limits,
+    but the newest event is never deleted, so a run always keeps its latest
+    recording.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, trigger_classes: Optional[Iterable[int]] = DEFAULT_TRIGGER_CLASSES,
+                 min_confidence: float = 0.5, pre_roll: float = 2.0, post_roll: float = 3.0,
+                 max_buffered_bytes: int = DEFAULT_MAX_BUFFERED_BYTES, workers: int = 2, max_pending: int = 64,
+                 jpeg_quality: int = 90, max_bytes: int = DEFAULT_MAX_BYTES, max_events: Optional[int] = None,
+                 max_event_seconds: float = DEFAULT_MAX_EVENT_SECONDS, max_event_bytes: Optional[int] = None):
+        root = Path(directory) if directory else DEFAULT_RECORDINGS_DIR
+        # Names sort in start order; the suffix keeps runs started in the same second apart
+        self.directory = root / f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.directory.mkdir(parents=True)
+        # None records around detections of any class
+        self.trigger_classes = None if trigger_classes is None else np.array(sorted(trigger_classes))
+        self.min_confidence = min_confidence
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.max_buffered_bytes = max_buffered_bytes
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        self.max_events = max_events
+        self.max_event_seconds = max_event_seconds
+        self.max_event_bytes = max_event_bytes or max(1, max_bytes // 4)
+
+        self.frames_offered = 0
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+        self.events_recorded = 0
+        self.events_deleted = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.started_at = time.monotonic()
+
+        # (timestamp, frame_index, frame), newest last
+        self._buffer = deque()
+        self._buffered_bytes = 0
+        self._event: Optional[str] = None
+        self._event_started = -np.inf
+        self._record_until = -np.inf
+        self._pending = 0
+        # Event directory name -> bytes on disk, oldest first
+        self._events: 'OrderedDict[str, int]' = OrderedDict()
+        self._pending_per_event: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='recorder')
+
+    def triggered(self, detections) -> bool:
+        """Whether detections include a trigger class at or above min_confidence"""
+        confident = detections.confidences >= self.min_confidence
+        if self.trigger_classes is not None:
+            confident &= np.isin(detections.class_ids, self.trigger_classes)
+        return bool(confident.any())
+
+    def offer(self, frame: np.ndarray, detections, frame_index: int, timestamp: Optional[float] = None) -> bool:
+        """Consider one BGR frame; returns whether it is being recorded.
+
+        The frame is kept by reference until written, so callers must not
+        reuse its buffer.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        self.frames_offered += 1
+        while self._buffer and timestamp - self._buffer[0][0] > self.pre_roll:
+            self._pop_buffered()
+
+        if self.triggered(detections):
+            if self._event is None:
+                self._start_event(timestamp)
+            self._record_until = timestamp + self.post_roll
+
+        if self._event is not None and timestamp <= self._record_until:
+            if self._event_full(timestamp):
+                # Continue in a new directory so the finished part can be retired
+                self._start_event(timestamp)
+            self._submit(frame, frame_index)
+            return True
+
+        self._event = None
+        self._buffer.append((timestamp, frame_index, frame))
+        self._buffered_bytes += frame.nbytes
+        while self._buffered_bytes > self.max_buffered_bytes:
+            self._pop_buffered()
+        return False
+
+    def _pop_buffered(self):
+        entry = self._buffer.popleft()
+        self._buffered_bytes -= entry[2].nbytes
+        return entry
+
+    def _event_full(self, timestamp: float) -> bool:
+        if timestamp - self._event_started >= self.max_event_seconds:
+            return True
+        with self._lock:
+            return self._events.get(self._event, 0) >= self.max_event_bytes
+
+    def _start_event(self, timestamp: float):
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        # Names sort in recording order
+        for attempt in range(1000):
+            name = f"{stamp}_{attempt:03d}"
+            try:
+                (self.directory / name).mkdir(parents=True)
+                break
+            except FileExistsError:
+                continue
+        with self._lock:
+            self._events[name] = 0
+        self._event = name
+        self._event_started = timestamp
+        self.events_recorded += 1
+        # The pre-roll goes out first, in capture order
+        while self._buffer:
+            _, index, buffered = self._pop_buffered()
+            self._submit(buffered, index)
+
+    def _submit(self, frame: np.ndarray, frame_index: int):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.frames_dropped += 1
+                return
+            self._pending += 1
+            self._pending_per_event[self._event] = self._pending_per_event.get(self._event, 0) + 1
+        self._executor.submit(self._write, self._event, frame, frame_index)
+
+    def _write(self, event: str, frame: np.ndarray, frame_index: int):
+        start = time.perf_counter()
+        size = 0
+        try:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if ok:
+                path = self.directory / event / f"frame_{frame_index:07d}.jpg"
+                with open(path, 'wb') as f:
+                    f.write(encoded.tobytes())
+                size = len(encoded)
+        except OSError:
+            # The event was deleted by retention or the disk is full; the frame is lost
+            size = 0
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                self._pending_per_event[event] -= 1
+                if size:
+                    self.frames_recorded += 1
+                    self.bytes_written += size
+                    if event in self._events:
+                        self._events[event] += size
+                        self._total_bytes += size
+                else:
+                    self.frames_dropped += 1
+                self.write_seconds += elapsed
+                self._enforce_retention()
+
+    def _enforce_retention(self):
+        """Delete the oldest events until within limits (lock held)"""
+        names = list(self._events)
+        for name in names[:-1]:
+            over_bytes = self._total_bytes > self.max_bytes
+            over_count = self.max_events is not None and len(self._events) > self.max_events
+            if not (over_bytes or over_count):
+                break
+            if self._pending_per_event.get(name):
+                # Still being written
+                continue
+            self._total_bytes -= self._events.pop(name)
+            self._pending_per_event.pop(name, None)
+            shutil.rmtree(self.directory / name, ignore_errors=True)
+            self.events_deleted += 1
+
+    def close(self):
+        """Wait for queued writes and apply retention once more"""
+        self._event = None
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._enforce_retention()
+
+    @property
+    def recording(self) -> bool:
+        return self._event is not None
+
+    def stats(self) -> Dict:
+        elapsed = time.monotonic() - self.started_at
+        with self._lock:
+            return {
+                'directory': str(self.directory),
+                'frames_offered': self.frames_offered,
+                'frames_recorded': self.frames_recorded,
+                'frames_dropped': self.frames_dropped,
+                'events_recorded': self.events_recorded,
+                'events_deleted': self.events_deleted,
+                'events_on_disk': len(self._events),
+                'bytes_on_disk': self._total_bytes,
+                'pending_writes': self._pending,
+                # Bytes per second of write work, i.e. what the pool sustains per worker
+                'write_mb_per_s': self.bytes_written / self.write_seconds / 1e6 if self.write_seconds > 0 else 0.0,
+                'write_ms_avg': 1000 * self.write_seconds / self.frames_recorded if self.frames_recorded else 0.0,
+                'recorded_fps': self.frames_recorded / elapsed if elapsed > 0 else 0.0
+            }
@@ -0,0 +1,187 @@
+from typing import Dict, List, Optional, Tuple
+from io import BytesIO
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+import tempfile
+import os
+from PIL import Image as PILImage
+import matplotlib
+# Render charts off-screen; reports are also generated from headless processes
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+def confidence_histogram(stats: Dict) -> Optional[Tuple[List[float], List[int]]]:
+    """(bin edges, counts) of detection confidences"""
+    if stats.get('confidence_histogram'):
+        return stats['confidence_histogram']['edges'], stats['confidence_histogram']['counts']
+    return None
+
+def create_summary_text(stats: Dict, duration: float = None) -> str:
+    """Generate a summary text from detection statistics"""
+    if not stats or stats['total_detections'] == 0:
+        return "No objects were detected in the provided content."
+    
+    total = stats['total_detections']
+    avg_conf = stats['confidence_avg']
+    
+    # Find most common class
+    most_common = max(stats['class_counts'].items(), key=lambda x: x[1]) if stats['class_counts'] else None
+    
+    summary = f"In the analyzed content"
+    if duration:
+        minutes = int(duration // 60)
+        seconds = int(duration % 60)
+        summary += f" ({minutes}m {seconds}s of footage)"
+    
+    summary += f", {total} heritage objects were detected with an average confidence of {avg_conf:.1%}."
+    
+    if most_common:
+        percentage = (most_common[1] / total) * 100
+        summary += f" The most common detection was {most_common[0]} ({percentage:.0f}% of all detections)."
+    
+    # Add class breakdown
+    if len(stats['class_counts']) > 1:
+        summary += " The detection breakdown includes: "
+        class_breakdown = []
+        for class_name, count in stats['class_counts'].items():
+            percentage = (count / total) * 100
+            class_breakdown.append(f"{class_name} ({percentage:.0f}%)")
+        summary += ", ".join(class_breakdown) + "."
+    
+    return summary
+
+def generate_pdf_report(stats: Dict, summary_text: str, samples: List = None):
+    """Generate a PDF report of the detection results with charts and sample images.
+
+    Args:
+        stats: statistics dict from DetectionManager.get_class_statistics
+        summary_text: formatted summary paragraph
+        samples: optional list of numpy RGB arrays (sample annotated images/frames)
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    
+    # Title
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#8b4513'),
+        alignment=1  # Center alignment
+    )
+    story.append(Paragraph("HeritageLens AI Detection Report", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Summary
+    story.append(Paragraph("Executive Summary", styles['Heading2']))
+    story.append(Paragraph(summary_text, styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Statistics table
+    if stats and stats['total_detections'] > 0:
+        story.append(Paragraph("Detection Statistics", styles['Heading2']))
+        
+        data = [['Metric', 'Value']]
+        data.append(['Total Detections', str(stats['total_detections'])])
+        data.append(['Average Confidence', f"{stats['confidence_avg']:.1%}"])
+        
+        for class_name, count in stats['class_counts'].items():
+            data.append([f'{class_name} Count', str(count)])
+        
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b4513')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        story.append(table)
+        story.append(Spacer(1, 20))
+
+    # Charts section (generated with matplotlib to avoid extra deps)
+    if stats and stats.get('class_counts'):
+        story.append(Paragraph("Visualizations", styles['Heading2']))
+
+        temp_imgs = []
+        try:
+            # Bar chart - class counts
+            fig1, ax1 = plt.subplots(figsize=(6, 3))
+            classes = list(stats['class_counts'].keys())
+            counts = list(stats['class_counts'].values())
+            ax1.bar(range(len(classes)), counts, color="#b8860b")
+            ax1.set_title('Detection Count by Class')
+            ax1.set_ylabel('Count')
+            ax1.set_xticks(range(len(classes)))
+            ax1.set_xticklabels([c[:18] + ('…' if len(c) > 18 else '') for c in classes], rotation=45, ha='right')
+            fig1.tight_layout()
+            tmp1 = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+            fig1.savefig(tmp1.name, dpi=160)
+            plt.close(fig1)
+            temp_imgs.append(tmp1.name)
+            story.append(RLImage(tmp1.name, width=6*inch, height=3*inch))
+            story.append(Spacer(1, 12))
+
+            # Pie chart - distribution
+            if len(classes) > 1:
+                fig2, ax2 = plt.subplots(figsize=(4.5, 4.5))
+                ax2.pie(counts, labels=[c[:22] + ('…' if len(c) > 22 else '') for c in classes], autopct='%1.0f%%', startangle=140)
+                ax2.set_title('Detection Distribution')
+                fig2.tight_layout()
+                tmp2 = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+                fig2.savefig(tmp2.name, dpi=160)
+                plt.close(fig2)
+                temp_imgs.append(tmp2.name)
+                story.append(RLImage(tmp2.name, width=4.5*inch, height=4.5*inch))
+                story.append(Spacer(1, 12))
+
+            # Confidence histogram
+            histogram = confidence_histogram(stats)
+            if histogram:
+                edges, bin_counts = histogram
+                if sum(bin_counts):
+                    fig3, ax3 = plt.subplots(figsize=(6, 3))
+                    ax3.hist(edges[:-1], bins=edges, weights=bin_counts, color="#8b4513")
+                    ax3.set_title('Confidence Score Distribution')
+                    ax3.set_xlabel('Confidence')
+                    ax3.set_ylabel('Frequency')
+                    fig3.tight_layout()
+                    tmp3 = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+                    fig3.savefig(tmp3.name, dpi=160)
+                    plt.close(fig3)
+                    temp_imgs.append(tmp3.name)
+                    story.append(RLImage(tmp3.name, width=6*inch, height=3*inch))
+                    story.append(Spacer(1, 12))
+        except Exception:
+            # If chart generation fails, continue without charts
+            pass
+
+    # Sample detections section
+    if samples:
+        story.append(Paragraph("Sample Detections", styles['Heading2']))
+        # Add up to 6 sample images
+        for idx, np_img in enumerate(samples[:6]):
+            try:
+                # Ensure image is RGB numpy array; convert to PIL and save
+                pil_img = PILImage.fromarray(np_img)
+                tmp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+                pil_img.save(tmp_img.name)
+                story.append(RLImage(tmp_img.name, width=6*inch, height=3.375*inch))  # 16:9-ish block
+                story.append(Spacer(1, 8))
+            except Exception:
+                continue
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    
+    return buffer.getvalue()
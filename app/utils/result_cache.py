@@ -0,0 +1,183 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".detection_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def model_fingerprint(model_path: str) -> str:
+    """Identify a weights file by path, size and modification time"""
+    path = os.path.abspath(model_path)
+    stat = os.stat(path)
+    raw = f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def image_digest(image: np.ndarray) -> str:
+    """Content hash of an image's pixels, shape and dtype.
+
+    The pixels are hashed in their logical (BGR, C-order) layout, so the
+    same image gets the same key whether it is a contiguous array or a
+    channel-reversed view of an RGB buffer (see utils.frame); views are
+    copied once for hashing.
+    """
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.shape}|{image.dtype}".encode())
+    digest.update(memoryview(image).cast('B'))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """Persistent detection cache keyed by image content and inference settings.
+
+    Entries live under directory/<model fingerprint>/ as small compressed
+    .npz files holding boxes, confidences and class ids. When the weights
+    file changes its fingerprint changes, so old entries are never returned
+    and their directories are purged. The total size on disk is bounded by
+    max_bytes, evicting the least recently used entries; file mtimes record
+    recency, so the order survives restarts.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory) if directory else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._fingerprint: Optional[str] = None
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, image: np.ndarray, fingerprint: str, params: Dict) -> str:
+        """Cache key for an image under a model fingerprint and inference parameters"""
+        settings = '|'.join(f"{name}={params[name]}" for name in sorted(params))
+        return f"{fingerprint}-{image_digest(image)}-" + \
+            hashlib.blake2b(settings.encode(), digest_size=4).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Return cached (bboxes, confidences, class_ids), or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            self._activate(key.split('-', 1)[0])
+
+        # Read the file even if it is not indexed: other processes (e.g. the
+        # image worker pool) share the same directory
+        try:
+            with np.load(path) as data:
+                result = (data['bboxes'], data['confidences'], data['class_ids'])
+            os.utime(path)
+            size = path.stat().st_size
+        except (OSError, KeyError, ValueError):
+            # Not cached, evicted by another process, or a damaged file
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self.hits += 1
+        return result
+
+    def put(self, key: str, bboxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray):
+        """Store detections for a key, evicting old entries beyond the size limit"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, bboxes=bboxes.astype(np.float32),
+                                confidences=confidences.astype(np.float32),
+                                class_ids=class_ids.astype(np.int16))
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._activate(key.split('-', 1)[0])
+            self._forget(key)
+            size = path.stat().st_size
+            self._entries[key] = size
+            self._total_bytes += size
+            self.writes += 1
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        fingerprint, name = key.split('-', 1)
+        return self.directory / fingerprint / name[:2] / f"{name}.npz"
+
+    def _activate(self, fingerprint: str):
+        """Switch to a model fingerprint, dropping entries for any other weights"""
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+        self._purge_other_models(fingerprint)
+        self._load_index(fingerprint)
+
+    def _purge_other_models(self, fingerprint: str):
+        if not self.directory.exists():
+            return
+        for model_dir in self.directory.iterdir():
+            if model_dir.is_dir() and model_dir.name != fingerprint:
+                shutil.rmtree(model_dir, ignore_errors=True)
+
+    def _load_index(self, fingerprint: str):
+        """Rebuild the LRU index from the files on disk, oldest first"""
+        files = []
+        for path in (self.directory / fingerprint).glob('*/*.npz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, f"{fingerprint}-{path.stem}", stat.st_size))
+        files.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in files)
+        self._total_bytes = sum(self._entries.values())
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._path(key).unlink(missing_ok=True)
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and disk usage"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'disk_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'writes': self.writes,
+            'evictions': self.evictions
+        }
+
+
+# Module-level singleton shared by every session in the process
+detection_cache = DetectionCache()
@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+from utils.detection_results import Detections
+from utils.frame_scheduler import frame_signature, scene_change_score
+
+
+class SceneChangeGate:
+    """Skip inference on frames that are near-duplicates of the last analyzed one.
+
+    Each frame is reduced to a tiny grayscale signature. If its mean absolute
+    difference from the last inferred frame is below threshold (0..1, as a
+    fraction of the 255 gray levels), the previous detections are reused.
+    After max_reuse consecutive reuses, inference runs again regardless, so
+    slow drifts are never missed.
+
+    The gate exposes the same detect_objects / draw_detections /
+    process_video_frame methods as DetectionManager, so it can stand in
+    for the manager anywhere frames are processed.
+    """
+
+    def __init__(self, detection_manager, threshold: float = 0.015, max_reuse: int = 30):
+        self.detection_manager = detection_manager
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        # Whether the last detect_objects call reused the previous result instead of running the model
+        self.last_reused = False
+        self._reference_signature = None
+        self._reference_detections = None
+        self._reuse_streak = 0
+        self._lock = threading.Lock()
+
+    def should_infer(self, frame: np.ndarray) -> Tuple[bool, np.ndarray]:
+        """Decide whether a frame needs inference; also returns its signature"""
+        signature = frame_signature(frame)
+        if self._reference_detections is None or self._reuse_streak >= self.max_reuse:
+            return True, signature
+        return scene_change_score(self._reference_signature, signature) >= self.threshold, signature
+
+    def detect_objects(self, frame: np.ndarray) -> Detections:
+        """Detect objects, reusing the previous result for unchanged frames"""
+        with self._lock:
+            infer, signature = self.should_infer(frame)
+            self.last_reused = not infer
+            if not infer:
+                self.frames_skipped += 1
+                self._reuse_streak += 1
+                return self._reference_detections
+
+        detections = self.detection_manager.detect_objects(frame)
+
+        with self._lock:
+            self.frames_inferred += 1
+            self._reuse_streak = 0
+            self._reference_signature = signature
+            self._reference_detections = detections
+        return detections
+
+    def draw_detections(self, image: np.ndarray, detections, **kwargs) -> np.ndarray:
+        return self.detection_manager.draw_detections(image, detections, **kwargs)
+
+    def process_video_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, Detections]:
+        """Gated equivalent of DetectionManager.process_video_frame"""
+        detections = self.detect_objects(frame)
+        return self.draw_detections(frame, detections), detections
+
+    def reset(self):
+        """Forget the reference frame, e.g. when switching videos"""
+        with self._lock:
+            self._reference_signature = None
+            self._reference_detections = None
+            self._reuse_streak = 0
+
+    def stats(self) -> Dict:
+        total = self.frames_inferred + self.frames_skipped
+        return {
+            'threshold': self.threshold,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': self.frames_skipped / total if total else 0.0
+        }
@@ -0,0 +1,342 @@
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.detection_results import Detections
+
+MERGE_MODES = ('nms', 'wbf')
+MATCH_METRICS = ('iou', 'ios')
+# Percentiles of a raster's values mapped to 0 and 255 for non-8-bit data
+STRETCH_PERCENTILES = (0.5, 99.5)
+# Longest side of the decimated read the stretch range is computed from
+STRETCH_SAMPLE_SIDE = 1024
+
+
+class ArrayTileSource:
+    """Tiles from an image already in memory (BGR or grayscale)"""
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        # One stretch for the whole image, so every tile gets the same contrast
+        self.value_range = None
+        if image.dtype != np.uint8:
+            step = max(1, int(np.ceil(max(self.width, self.height) / STRETCH_SAMPLE_SIDE)))
+            self.value_range = stretch_range(image[::step, ::step])
+
+    def read(self, x: int, y: int, w: int, h: int) -> np.ndarray:
+        return _to_bgr(_to_uint8(self.image[y:y + h, x:x + w], self.value_range))
+
+    def read_overview(self, max_side: int) -> Tuple[np.ndarray, float]:
+        """Whole image shrunk to fit max_side, with the scale applied"""
+        scale = min(1.0, max_side / max(self.width, self.height))
+        if scale == 1.0:
+            return _to_bgr(_to_uint8(self.image, self.value_range)), 1.0
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        image = _to_uint8(self.image, self.value_range)
+        return _to_bgr(cv2.resize(image, size, interpolation=cv2.INTER_AREA)), scale
+
+    def close(self):
+        pass
+
+
+class NpyTileSource(ArrayTileSource):
+    """Tiles from a .npy file mapped into memory; only touched pages are read"""
+
+    def __init__(self, path: str):
+        super().__init__(np.load(path, mmap_mode='r'))
+
+    def read_overview(self, max_side: int) -> Tuple[np.ndarray, float]:
+        # Decimate before resizing so the full array is never materialized
+        step = max(1, int(np.ceil(max(self.width, self.height) / (max_side * 2))))
+        decimated = _to_uint8(np.ascontiguousarray(self.image[::step, ::step]), self.value_range)
+        overview, scale = ArrayTileSource(decimated).read_overview(max_side)
+        return overview, scale / step
+
+    def close(self):
+        mmap = getattr(self.image, '_mmap', None)
+        self.image = None
+        if mmap is not None:
+            mmap.close()
+
+
+class RasterioTileSource:
+    """Tiles read with rasterio windows from GeoTIFF and other GDAL rasters"""
+
+    def __init__(self, path: str):
+        import rasterio
+
+        self._dataset = rasterio.open(path)
+        self.width = self._dataset.width
+        self.height = self._dataset.height
+        # RGB(A) rasters use the first three bands; single-band rasters are gray
+        self._bands = [1, 2, 3] if self._dataset.count >= 3 else [1]
+        # One stretch for the whole raster, from a decimated read (served from overviews when present)
+        self.value_range = None
+        if self._dataset.dtypes[0] != 'uint8':
+            scale = min(1.0, STRETCH_SAMPLE_SIDE / max(self.width, self.height))
+            shape = (len(self._bands), max(1, round(self.height * scale)), max(1, round(self.width * scale)))
+            self.value_range = stretch_range(self._dataset.read(self._bands, out_shape=shape))
+
+    def read(self, x: int, y: int, w: int, h: int) -> np.ndarray:
+        from rasterio.windows import Window
+
+        data = self._dataset.read(self._bands, window=Window(x, y, w, h))
+        return _to_bgr(_to_uint8(np.moveaxis(data, 0, -1), self.value_range), rgb=True)
+
+    def read_overview(self, max_side: int) -> Tuple[np.ndarray, float]:
+        scale = min(1.0, max_side / max(self.width, self.height))
+        shape = (len(self._bands), max(1, round(self.height * scale)), max(1, round(self.width * scale)))
+        # GDAL serves this from internal overviews when the file has them
+        data = self._dataset.read(self._bands, out_shape=shape)
+        return _to_bgr(_to_uint8(np.moveaxis(data, 0, -1), self.value_range), rgb=True), scale
+
+    def close(self):
+        self._dataset.close()
+
+
+def stretch_range(sample: np.ndarray) -> Tuple[float, float]:
+    """Values mapped to 0 and 255, from the STRETCH_PERCENTILES of a (decimated) sample"""
+    low, high = np.percentile(sample, STRETCH_PERCENTILES)
+    return float(low), float(high)
+
+
+def _to_uint8(data: np.ndarray, value_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """Stretch non-8-bit raster data (e.g. 16-bit orthophotos) to 0..255.
+
+    value_range should be the whole raster's (see stretch_range); without it
+    the data's own range is used, which gives each tile different contrast.
+    """
+    if data.dtype == np.uint8:
+        return data
+    low, high = value_range if value_range is not None else stretch_range(data)
+    data = (data.astype(np.float32) - low) * (255.0 / max(high - low, 1e-6))
+    return np.clip(data, 0, 255).astype(np.uint8)
+
+
+def _to_bgr(tile: np.ndarray, rgb: bool = False) -> np.ndarray:
+    if tile.ndim == 2 or tile.shape[2] == 1:
+        return cv2.cvtColor(np.ascontiguousarray(tile), cv2.COLOR_GRAY2BGR)
+    if rgb:
+        return cv2.cvtColor(np.ascontiguousarray(tile), cv2.COLOR_RGB2BGR)
+    return np.ascontiguousarray(tile)
+
+
+def open_tile_source(path: str):
+    """Open an image file for tiled reading.
+
+    .npy files are memory-mapped and rasters are read through rasterio
+    windows when it is installed, so only the tiles being processed are in
+    memory. Other formats fall back to a single full decode.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.npy':
+        return NpyTileSource(path)
+    if suffix in ('.tif', '.tiff', '.jp2', '.img', '.vrt'):
+        try:
+            return RasterioTileSource(path)
+        except ImportError:
+            pass
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Cannot decode image {path}")
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return ArrayTileSource(image)
+
+
+def iter_tiles(width: int, height: int, tile_size: int, overlap: float) -> Iterator[Tuple[int, int, int, int]]:
+    """(x, y, w, h) windows covering the image; the last row and column are flush with the edge"""
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    for y in starts(height):
+        for x in starts(width):
+            yield x, y, min(tile_size, width - x), min(tile_size, height - y)
+
+
+def _pair_overlaps(boxes: np.ndarray, first: np.ndarray, second: np.ndarray, metric: str) -> np.ndarray:
+    """IoU, or intersection over the smaller box ('ios'), of the given box pairs"""
+    a, b = boxes[first], boxes[second]
+    size = np.clip(np.minimum(a[:, 2:], b[:, 2:]) - np.maximum(a[:, :2], b[:, :2]), 0, None)
+    intersection = size[:, 0] * size[:, 1]
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    if metric == 'ios':
+        denominator = np.minimum(area_a, area_b)
+    else:
+        denominator = area_a + area_b - intersection
+    return intersection / np.maximum(denominator, 1e-9)
+
+
+def _nearby_pairs(boxes: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Index pairs (i < j) of boxes sharing a grid cell; all intersecting pairs are among them.
+
+    Each box is registered in every cell of cell_size pixels it touches, so
+    only boxes in the same neighbourhood are compared and the work grows
+    with local density instead of with the square of all boxes in the image.
+    """
+    if len(boxes) < 2:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    cells = np.floor(boxes / cell_size).astype(np.int64)
+    box_index, cell_x, cell_y = [], [], []
+    for i, (cx1, cy1, cx2, cy2) in enumerate(cells):
+        xs, ys = np.meshgrid(np.arange(cx1, cx2 + 1), np.arange(cy1, cy2 + 1))
+        box_index.append(np.full(xs.size, i))
+        cell_x.append(xs.ravel())
+        cell_y.append(ys.ravel())
+    box_index = np.concatenate(box_index)
+    keys = np.stack([np.concatenate(cell_x), np.concatenate(cell_y)], axis=1)
+    _, cell_of, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    order = np.argsort(cell_of.ravel(), kind='stable')
+    groups = np.split(box_index[order], np.cumsum(counts)[:-1])
+
+    first, second = [], []
+    for members in groups:
+        if len(members) > 1:
+            i, j = np.triu_indices(len(members), k=1)
+            first.append(members[i])
+            second.append(members[j])
+    if not first:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    pairs = np.unique(np.stack([np.concatenate(first), np.concatenate(second)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def merge_detections(bboxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                     mode: str = 'nms', threshold: float = 0.5, metric: str = 'ios',
+                     cell_size: float = 1024.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Class-aware merge of overlapping boxes from neighbouring tiles.
+
+    'nms' keeps the highest-confidence box of each overlapping group; 'wbf'
+    replaces the group with the confidence-weighted average box. The 'ios'
+    metric also merges a box cut off at a tile seam with the full box from
+    the neighbouring tile, which IoU alone would keep as a duplicate.
+    Boxes are only compared with boxes in the same cell_size grid cells
+    (see _nearby_pairs), so large images do not need an N x N matrix.
+    """
+    if mode not in MERGE_MODES:
+        raise ValueError(f"Unknown merge mode '{mode}', expected one of {MERGE_MODES}")
+    if metric not in MATCH_METRICS:
+        raise ValueError(f"Unknown match metric '{metric}', expected one of {MATCH_METRICS}")
+
+    keep_boxes, keep_conf, keep_cls = [], [], []
+    for class_id in np.unique(class_ids):
+        in_class = np.flatnonzero(class_ids == class_id)
+        order = in_class[np.argsort(-confidences[in_class])]
+        boxes = bboxes[order]
+        scores = confidences[order]
+
+        # Overlapping neighbours of each box, from the nearby pairs only
+        first, second = _nearby_pairs(boxes, cell_size)
+        matched = _pair_overlaps(boxes, first, second, metric) >= threshold
+        neighbours = [[] for _ in range(len(order))]
+        for i, j in zip(first[matched].tolist(), second[matched].tolist()):
+            neighbours[i].append(j)
+            neighbours[j].append(i)
+
+        remaining = np.ones(len(order), dtype=bool)
+        for i in range(len(order)):
+            if not remaining[i]:
+                continue
+            group = [i] + [j for j in neighbours[i] if remaining[j]]
+            remaining[group] = False
+            if mode == 'wbf':
+                weights = scores[group]
+                keep_boxes.append((boxes[group] * weights[:, None]).sum(axis=0) / weights.sum())
+            else:
+                keep_boxes.append(boxes[i])
+            keep_conf.append(scores[i])
+            keep_cls.append(class_id)
+
+    if not keep_boxes:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+    return np.array(keep_boxes, np.float32), np.array(keep_conf, np.float32), np.array(keep_cls, np.int64)
+
+
+class TiledDetector:
+    """Detect objects in very large images tile by tile.
+
+    Tiles of tile_size pixels overlapping by a fraction of their size are
+    read lazily from a tile source and sent to the model in batches, so
+    peak memory is set by tile_size and batch_size rather than the image.
+    Boxes are shifted back to image coordinates and merged across seams.
+    An optional downscaled overview pass catches objects larger than a tile.
+    """
+
+    def __init__(self, detection_manager, tile_size: int = 1024, overlap: float = 0.2,
+                 batch_size: int = 4, merge: str = 'nms', merge_threshold: float = 0.5,
+                 match_metric: str = 'ios', include_overview: bool = True):
+        self.detection_manager = detection_manager
+        self.tile_size = max(64, int(tile_size))
+        self.overlap = min(max(overlap, 0.0), 0.9)
+        self.batch_size = max(1, int(batch_size))
+        self.merge = merge
+        self.merge_threshold = merge_threshold
+        self.match_metric = match_metric
+        self.include_overview = include_overview
+        self.last_stats: Dict = {}
+
+    def needs_tiling(self, width: int, height: int) -> bool:
+        """Whether an image is larger than a single tile"""
+        return max(width, height) > self.tile_size
+
+    def detect(self, source) -> Detections:
+        """Detect objects over a tile source (see open_tile_source / ArrayTileSource)"""
+        start = time.perf_counter()
+        manager = self.detection_manager
+        windows = list(iter_tiles(source.width, source.height, self.tile_size, self.overlap))
+
+        parts: List[Detections] = []
+        offsets: List[Tuple[int, int]] = []
+        peak_tile_bytes = 0
+        for batch_start in range(0, len(windows), self.batch_size):
+            batch_windows = windows[batch_start:batch_start + self.batch_size]
+            tiles = [source.read(*window) for window in batch_windows]
+            peak_tile_bytes = max(peak_tile_bytes, sum(tile.nbytes for tile in tiles))
+            parts.extend(manager.detect_batch(tiles, batch_size=self.batch_size))
+            offsets.extend((x, y) for x, y, _, _ in batch_windows)
+
+        bboxes = [p.bboxes + np.array([x, y, x, y], np.float32) for p, (x, y) in zip(parts, offsets)]
+        confidences = [p.confidences for p in parts]
+        class_ids = [p.class_ids for p in parts]
+
+        if self.include_overview and len(windows) > 1:
+            overview, scale = source.read_overview(self.tile_size)
+            found = manager.detect_objects(overview)
+            bboxes.append(found.bboxes / scale)
+            confidences.append(found.confidences)
+            class_ids.append(found.class_ids)
+
+        raw_count = sum(len(c) for c in confidences)
+        merged = merge_detections(np.concatenate(bboxes), np.concatenate(confidences), np.concatenate(class_ids),
+                                  self.merge, self.merge_threshold, self.match_metric, self.tile_size)
+
+        self.last_stats = {
+            'tiles': len(windows),
+            'raw_detections': raw_count,
+            'merged_detections': len(merged[1]),
+            'peak_tile_bytes': peak_tile_bytes,
+            'seconds': time.perf_counter() - start
+        }
+        return Detections(*merged, manager.class_names, manager.class_colors)
+
+    def detect_image(self, image: np.ndarray) -> Detections:
+        """Tiled detection on an in-memory image"""
+        return self.detect(ArrayTileSource(image))
+
+    def detect_file(self, path: str) -> Detections:
+        """Tiled detection reading tiles lazily from a file"""
+        source = open_tile_source(path)
+        try:
+            return self.detect(source)
+        finally:
+            source.close()
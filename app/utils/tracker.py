@@ -0,0 +1,195 @@
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from utils.detection_stats import StatisticsAggregator
+from utils.model_compare import box_iou
+
+
+class Track:
+    """One object followed across sampled video frames"""
+
+    def __init__(self, track_id: int, detection: Dict, frame_index: int, timestamp: float):
+        self.track_id = track_id
+        self.class_id = detection['class_id']
+        self.class_name = detection['class_name']
+        self.bbox = np.asarray(detection['bbox'], dtype=np.float32)
+        # Per-frame box motion, smoothed, used to predict where the object moves next
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.best_confidence = detection['confidence']
+        self.best_bbox = self.bbox.copy()
+        self.best_frame_index = frame_index
+        self.first_frame_index = self.last_frame_index = frame_index
+        self.first_seen = self.last_seen = timestamp
+        self.hits = 1
+
+    def predicted_bbox(self, frame_index: int) -> np.ndarray:
+        return self.bbox + self.velocity * (frame_index - self.last_frame_index)
+
+    def update(self, detection: Dict, frame_index: int, timestamp: float):
+        bbox = np.asarray(detection['bbox'], dtype=np.float32)
+        gap = max(1, frame_index - self.last_frame_index)
+        self.velocity = 0.5 * self.velocity + 0.5 * (bbox - self.bbox) / gap
+        self.bbox = bbox
+        if detection['confidence'] > self.best_confidence:
+            self.best_confidence = detection['confidence']
+            self.best_bbox = bbox.copy()
+            self.best_frame_index = frame_index
+        self.last_frame_index = frame_index
+        self.last_seen = timestamp
+        self.hits += 1
+
+    @property
+    def dwell_seconds(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def to_dict(self) -> Dict:
+        return {
+            'track_id': self.track_id,
+            'class_id': self.class_id,
+            'class_name': self.class_name,
+            'best_confidence': float(self.best_confidence),
+            'bbox': self.best_bbox.tolist(),
+            'best_frame_index': self.best_frame_index,
+            'first_frame_index': self.first_frame_index,
+            'last_frame_index': self.last_frame_index,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'dwell_seconds': self.dwell_seconds,
+            'hits': self.hits
+        }
+
+
+class IoUTracker:
+    """Greedy IoU tracker assigning persistent ids to detections across frames.
+
+    Each frame's boxes are matched to live tracks of the same class by
+    descending IoU against the track's motion-predicted box. Unmatched boxes
+    start new tracks; tracks unseen for max_age seconds of footage, or
+    for two sampling gaps when frames are analyzed further apart, are
+    closed. Tracks with fewer than min_hits sightings are treated as
+    flicker and dropped when they close. Only one summary per track is kept
+    (best confidence and box, first/last seen), so memory grows with the
+    number of distinct objects rather than with the number of boxes.
+    """
+
+    def __init__(self, fps: float = 30.0, iou_threshold: float = 0.3, max_age: float = 2.0,
+                 min_hits: int = 2):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = max(1, int(min_hits))
+
+        self.box_count = 0
+        self._next_id = 1
+        self._active: List[Track] = []
+        self._finished: List[Track] = []
+        self._unreported: List[Track] = []
+        self._last_timestamp = None
+        # Statistics of closed tracks, folded in once per track
+        self._aggregator = StatisticsAggregator()
+        self._lock = threading.Lock()
+
+    def update(self, detections, frame_index: int) -> List[int]:
+        """Assign detections of one frame to tracks; returns their track ids in order"""
+        timestamp = frame_index / self.fps
+        detections = list(detections)
+        with self._lock:
+            self.box_count += len(detections)
+            self._expire(timestamp, self._max_age_for(timestamp))
+            self._last_timestamp = timestamp
+
+            track_ids = [0] * len(detections)
+            unmatched = set(range(len(detections)))
+            if detections and self._active:
+                predicted = np.array([t.predicted_bbox(frame_index) for t in self._active])
+                iou = box_iou(np.array([d['bbox'] for d in detections]), predicted)
+                same_class = (np.array([d['class_id'] for d in detections])[:, None] ==
+                              np.array([t.class_id for t in self._active])[None, :])
+                iou = np.where(same_class, iou, 0.0)
+                free_tracks = set(range(len(self._active)))
+                for flat in np.argsort(-iou, axis=None):
+                    d, t = np.unravel_index(flat, iou.shape)
+                    if iou[d, t] < self.iou_threshold:
+                        break
+                    if d in unmatched and t in free_tracks:
+                        self._active[t].update(detections[d], frame_index, timestamp)
+                        track_ids[d] = self._active[t].track_id
+                        unmatched.discard(d)
+                        free_tracks.discard(t)
+
+            for d in sorted(unmatched):
+                track = Track(self._next_id, detections[d], frame_index, timestamp)
+                self._next_id += 1
+                self._active.append(track)
+                track_ids[d] = track.track_id
+            return track_ids
+
+    def _max_age_for(self, timestamp: float) -> float:
+        # Latency-bound strides and slow live loops can sample less often than max_age;
+        # a track must survive at least one missed sample to reach min_hits
+        if self._last_timestamp is None:
+            return self.max_age
+        return max(self.max_age, 2 * (timestamp - self._last_timestamp))
+
+    def _expire(self, timestamp: float, max_age: float):
+        still_active = []
+        for track in self._active:
+            if timestamp - track.last_seen > max_age:
+                self._finish(track)
+            else:
+                still_active.append(track)
+        self._active = still_active
+
+    def _finish(self, track: Track):
+        if track.hits < self.min_hits:
+            return
+        self._finished.append(track)
+        self._unreported.append(track)
+        self._aggregator.add(track.class_name, track.best_confidence)
+
+    def close(self):
+        """Close all live tracks at the end of the video"""
+        with self._lock:
+            for track in self._active:
+                self._finish(track)
+            self._active = []
+
+    def pop_finished(self) -> List[Dict]:
+        """Summaries of tracks closed since the last call"""
+        with self._lock:
+            finished, self._unreported = self._unreported, []
+        return [track.to_dict() for track in finished]
+
+    @property
+    def track_count(self) -> int:
+        """Distinct objects so far, counting live tracks that already qualify"""
+        with self._lock:
+            return len(self._finished) + sum(1 for t in self._active if t.hits >= self.min_hits)
+
+    def tracks(self) -> List[Dict]:
+        """Summaries of all closed and live tracks, in order of appearance"""
+        with self._lock:
+            tracks = self._finished + [t for t in self._active if t.hits >= self.min_hits]
+            return [track.to_dict() for track in sorted(tracks, key=lambda t: t.track_id)]
+
+    def aggregate(self) -> StatisticsAggregator:
+        """Mergeable statistics over distinct objects (one per track, at its best confidence)"""
+        with self._lock:
+            aggregator = self._aggregator.copy()
+            for track in self._active:
+                if track.hits >= self.min_hits:
+                    aggregator.add(track.class_name, track.best_confidence)
+        return aggregator
+
+    def statistics(self) -> Dict:
+        """Statistics over distinct objects (one per track, at its best confidence)"""
+        aggregator = self.aggregate()
+        with self._lock:
+            dwell = [t.dwell_seconds for t in self._finished + self._active if t.hits >= self.min_hits]
+            box_count = self.box_count
+        stats = aggregator.to_stats()
+        stats['box_detections'] = box_count
+        stats['dwell_seconds_avg'] = float(np.mean(dwell)) if dwell else 0.0
+        return stats
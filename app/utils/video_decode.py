@@ -0,0 +1,83 @@
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+DECODE_MODES = ('read', 'grab', 'seek', 'auto')
+
+
+class SparseFrameReader:
+    """Read only the frames that will be analyzed from a cv2.VideoCapture.
+
+    Frames are addressed by 1-based index. Skipped frames are handled
+    according to mode:
+      - 'read': decode and convert every frame (the original behaviour)
+      - 'grab': grab() skipped frames without retrieve(), avoiding the
+        color conversion and copy into a BGR array
+      - 'seek': jump with CAP_PROP_POS_FRAMES; the backend decodes only from
+        the nearest keyframe
+      - 'auto': grab for short gaps, seek once a gap reaches seek_threshold
+    Seeking is only used on seekable sources (local files with a known
+    frame count); network streams always fall back to grabbing.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, mode: str = 'auto', seek_threshold: int = 120):
+        if mode not in DECODE_MODES:
+            raise ValueError(f"Unknown decode mode '{mode}', expected one of {DECODE_MODES}")
+        self.cap = cap
+        self.mode = mode
+        self.seek_threshold = max(1, int(seek_threshold))
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.seekable = self.frame_count > 0
+        # Index of the last frame consumed from the capture (0 = nothing read yet)
+        self.position = 0
+
+        self.frames_decoded = 0
+        self.frames_grabbed = 0
+        self.seeks = 0
+
+    def read_at(self, index: int) -> Optional[np.ndarray]:
+        """Advance to frame index (1-based) and return it, or None at end of stream"""
+        skip = index - self.position - 1
+        if self.seekable and index > self.frame_count:
+            return None
+        if skip >= 0 and self._use_seek(skip):
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, index - 1):
+                self.position = index - 1
+                self.seeks += 1
+                skip = 0
+
+        while skip > 0:
+            if self.mode == 'read':
+                ok, _ = self.cap.read()
+                self.frames_decoded += 1
+            else:
+                ok = self.cap.grab()
+                self.frames_grabbed += 1
+            if not ok:
+                return None
+            self.position += 1
+            skip -= 1
+
+        ok, frame = self.cap.read()
+        if not ok:
+            return None
+        self.position += 1
+        self.frames_decoded += 1
+        return frame
+
+    def _use_seek(self, skip: int) -> bool:
+        if not self.seekable or skip == 0:
+            return False
+        if self.mode == 'seek':
+            return True
+        return self.mode == 'auto' and skip >= self.seek_threshold
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'position': self.position,
+            'frames_decoded': self.frames_decoded,
+            'frames_grabbed': self.frames_grabbed,
+            'seeks': self.seeks
+        }
@@ -0,0 +1,260 @@
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from utils.detection_results import Detections
+from utils.frame import Frame
+from utils.video_decode import SparseFrameReader
+
+# Marks the end of the stream on a stage queue
+_END_OF_STREAM = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, seconds: float):
+        """Record one processed item and the time spent on it"""
+        self.items += 1
+        self.busy_seconds += seconds
+
+    def to_dict(self) -> Dict:
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            'items': self.items,
+            'busy_seconds': self.busy_seconds,
+            # Items per wall-clock second while the stage was running
+            'throughput_fps': self.items / elapsed if elapsed > 0 else 0.0,
+            # Items per second of work, i.e. the rate the stage could sustain alone
+            'capacity_fps': self.items / self.busy_seconds if self.busy_seconds > 0 else 0.0,
+            'utilization': self.busy_seconds / elapsed if elapsed > 0 else 0.0
+        }
+
+
+class FrameResult:
+    """A sampled video frame after inference and annotation"""
+
+    def __init__(self, frame_index: int, frame: np.ndarray):
+        self.frame_index = frame_index
+        self.frame = frame
+        self.detections: Optional[Detections] = None
+        # Persistent object ids aligned with detections, when the pipeline has a tracker
+        self.track_ids: Optional[List[int]] = None
+        self.annotated_frame: Optional[np.ndarray] = None
+        # Seconds from capture to annotated result, for live sources
+        self.latency: Optional[float] = None
+
+
+class VideoPipeline:
+    """Decode, inference and annotation stages running on separate threads.
+
+    Stages are connected by bounded queues, so a slow stage blocks the ones
+    upstream of it instead of letting frames pile up in memory. The display
+    stage runs on the caller's thread (Streamlit elements can only be updated
+    from the script thread) by iterating over run().
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, detection_manager, frame_stride: int = 1,
+                 queue_size: int = 4, max_read_failures: int = 0, read_retry_delay: float = 0.1,
+                 scheduler=None, decode_mode: str = 'auto', annotate: bool = True, tracker=None):
+        self.cap = cap
+        # Headless callers that only need detections can skip drawing
+        self.annotate = annotate
+        # Skipped frames are grabbed without conversion, or seeked over for large gaps
+        self.reader = SparseFrameReader(cap, mode=decode_mode)
+        self.detection_manager = detection_manager
+        self.frame_stride = max(1, int(frame_stride))
+        # Optional AdaptiveFrameScheduler; overrides frame_stride when given
+        self.scheduler = scheduler
+        # Optional IoUTracker, updated in frame order on the inference thread
+        self.tracker = tracker
+        self.max_read_failures = max_read_failures
+        self.read_retry_delay = read_retry_delay
+
+        self.queues = {
+            'decode': queue.Queue(maxsize=queue_size),
+            'inference': queue.Queue(maxsize=queue_size),
+            'annotate': queue.Queue(maxsize=queue_size)
+        }
+        self.max_queue_depth = {name: 0 for name in self.queues}
+        self.stage_stats = {name: StageStats(name) for name in ('decode', 'inference', 'annotate', 'display')}
+
+        self.error: Optional[BaseException] = None
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the background stage threads"""
+        for target in (self._decode_stage, self._inference_stage, self._annotate_stage):
+            thread = threading.Thread(target=self._guard, args=(target,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run(self) -> Iterator[FrameResult]:
+        """Yield annotated frames in order; time spent by the caller counts as display time"""
+        if not self._threads:
+            self.start()
+
+        display = self.stage_stats['display']
+        display.started_at = time.time()
+        try:
+            while True:
+                item = self._get(self.queues['annotate'])
+                if item is _END_OF_STREAM or item is None:
+                    break
+                start = time.perf_counter()
+                yield item
+                display.record(time.perf_counter() - start)
+        finally:
+            display.finished_at = time.time()
+            self.stop()
+
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout: float = 2.0):
+        """Signal all stages to finish and wait for their threads"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Per-stage throughput, current/maximum queue depths and sampling policy"""
+        return {
+            'frames_read': self.reader.position,
+            'decode': self.reader.stats(),
+            'frame_stride': self._current_stride(),
+            'sampling': self.scheduler.stats() if self.scheduler is not None else None,
+            'stages': {name: s.to_dict() for name, s in self.stage_stats.items()},
+            'queues': {
+                name: {'depth': q.qsize(), 'max_depth': self.max_queue_depth[name], 'capacity': q.maxsize}
+                for name, q in self.queues.items()
+            }
+        }
+
+    def _current_stride(self) -> int:
+        if self.scheduler is not None:
+            return max(1, int(self.scheduler.next_stride()))
+        return self.frame_stride
+
+    def _guard(self, target):
+        """Run a stage, recording the first error and stopping the pipeline on failure"""
+        try:
+            target()
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+            self._stop_event.set()
+
+    def _put(self, name: str, item) -> bool:
+        """Put with backpressure, giving up if the pipeline is stopped"""
+        q = self.queues[name]
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                self.max_queue_depth[name] = max(self.max_queue_depth[name], q.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Get the next item, or None once the pipeline is stopped"""
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _decode_stage(self):
+        """Read the sampled frames from the capture, skipping the rest cheaply"""
+        stats = self.stage_stats['decode']
+        stats.started_at = time.time()
+        failures = 0
+        next_sample = self._current_stride()
+        try:
+            while not self._stop_event.is_set() and self.cap.isOpened():
+                start = time.perf_counter()
+                frame = self.reader.read_at(next_sample)
+                if frame is None:
+                    # Network streams can stall briefly; local files end here
+                    failures += 1
+                    if failures > self.max_read_failures:
+                        break
+                    time.sleep(self.read_retry_delay)
+                    continue
+                failures = 0
+                stats.record(time.perf_counter() - start)
+
+                item = FrameResult(next_sample, frame)
+                next_sample += self._current_stride()
+                if not self._put('decode', item):
+                    break
+        finally:
+            stats.finished_at = time.time()
+        self._put('decode', _END_OF_STREAM)
+
+    def _inference_stage(self):
+        """Run detection on sampled frames"""
+        stats = self.stage_stats['inference']
+        stats.started_at = time.time()
+        try:
+            while True:
+                item = self._get(self.queues['decode'])
+                if item is _END_OF_STREAM or item is None:
+                    break
+                start = time.perf_counter()
+                item.detections = self.detection_manager.detect_objects(item.frame)
+                latency = time.perf_counter() - start
+                stats.record(latency)
+                if self.scheduler is not None:
+                    # Reused detections (scene gate) say nothing about inference cost
+                    reused = getattr(self.detection_manager, 'last_reused', False)
+                    self.scheduler.observe(item.frame, item.detections, None if reused else latency,
+                                           item.frame_index)
+                if self.tracker is not None:
+                    item.track_ids = self.tracker.update(item.detections, item.frame_index)
+                if not self._put('inference', item):
+                    break
+        finally:
+            stats.finished_at = time.time()
+        self._put('inference', _END_OF_STREAM)
+
+    def _annotate_stage(self):
+        """Draw detections on the sampled frames"""
+        stats = self.stage_stats['annotate']
+        stats.started_at = time.time()
+        try:
+            while True:
+                item = self._get(self.queues['inference'])
+                if item is _END_OF_STREAM or item is None:
+                    break
+                start = time.perf_counter()
+                if self.annotate:
+                    # The decoded frame is not used after this stage, so draw on it directly
+                    frame = Frame(item.frame, 'BGR').annotated(self.detection_manager, item.detections,
+                                                               inplace=item.frame.flags.writeable)
+                    item.annotated_frame = frame.bgr()
+                # The raw frame is no longer needed downstream
+                item.frame = None
+                stats.record(time.perf_counter() - start)
+                if not self._put('annotate', item):
+                    break
+        finally:
+            stats.finished_at = time.time()
+        self._put('annotate', _END_OF_STREAM)
@@ -0,0 +1,139 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+# Marks the end of the write queue
+_CLOSE = object()
+
+# Served by Streamlit's static file serving (see .streamlit/config.toml) under app/static/
+STATIC_DIR = Path(__file__).parent.parent / "static"
+STATIC_VIDEO_DIR = STATIC_DIR / "videos"
+
+
+def static_video_path() -> str:
+    """New output path that Streamlit serves from disk; the random name keeps it unguessable"""
+    STATIC_VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+    return str(STATIC_VIDEO_DIR / f"{uuid.uuid4().hex}.mp4")
+
+
+def static_url(path: str) -> str:
+    """Link to a file under STATIC_DIR, relative to the page"""
+    return "app/static/" + Path(path).resolve().relative_to(STATIC_DIR.resolve()).as_posix()
+
+
+class StreamingVideoWriter:
+    """Encode annotated frames to an MP4 file while detection is running.
+
+    Frames are handed to a background encoder thread through a bounded
+    queue, so encoding overlaps with inference. Each frame is tagged with its
+    index in the source video. The writer repeats or drops frames so the
+    output keeps the source timeline, even when only every n-th frame is
+    analyzed.
+    """
+
+    def __init__(self, source_fps: float, frame_stride: int = 1, path: Optional[str] = None,
+                 fourcc: str = 'mp4v', queue_size: int = 8):
+        source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.source_fps = source_fps
+        # One output frame per analyzed frame at the nominal stride keeps playback at source speed
+        self.output_fps = source_fps / max(1, int(frame_stride))
+        self.fourcc = fourcc
+        if path is None:
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4', prefix='heritagelens_video_')
+            tmp.close()
+            path = tmp.name
+        self.path = path
+
+        self.frames_received = 0
+        self.frames_written = 0
+        self.encode_seconds = 0.0
+        self.error: Optional[BaseException] = None
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._frame_size = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+        self._closed = False
+
+    def write(self, frame: np.ndarray, source_index: Optional[int] = None):
+        """Queue a BGR frame; source_index is its 1-based frame number in the source video"""
+        if self._closed:
+            raise ValueError("write to a closed StreamingVideoWriter")
+        self.frames_received += 1
+        self._queue.put((frame, source_index))
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush queued frames and finalize the file"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join(timeout)
+
+    def discard(self):
+        """Close the writer and delete the output file"""
+        self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'output_fps': self.output_fps,
+            'frames_received': self.frames_received,
+            'frames_written': self.frames_written,
+            'encode_fps': self.frames_written / self.encode_seconds if self.encode_seconds > 0 else 0.0,
+            'size_bytes': self.size_bytes()
+        }
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _CLOSE:
+                    break
+                frame, source_index = item
+                start = time.perf_counter()
+                self._encode(frame, source_index)
+                self.encode_seconds += time.perf_counter() - start
+        except BaseException as e:
+            self.error = e
+            # Keep draining so producers never block on a dead writer
+            while self._queue.get() is not _CLOSE:
+                pass
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+
+    def _encode(self, frame: np.ndarray, source_index: Optional[int]):
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._frame_size = (width, height)
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                           self.output_fps, self._frame_size)
+        elif frame.shape[1::-1] != self._frame_size:
+            frame = cv2.resize(frame, self._frame_size)
+
+        if source_index is None:
+            repeats = 1
+        else:
+            # Output frames that should exist by the time this source frame is shown
+            target = int(round(source_index / self.source_fps * self.output_fps))
+            repeats = max(target - self.frames_written, 0)
+            if self.frames_written == 0:
+                repeats = max(repeats, 1)
+
+        for _ in range(repeats):
+            self._writer.write(frame)
+            self.frames_written += 1